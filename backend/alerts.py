@@ -0,0 +1,239 @@
+"""
+Alerts for signals, entries and exits, sent to webhooks, Telegram and email without blocking the strategy.
+
+notify() only hands the alert to the dispatcher's event loop (a few microseconds) and returns; the loop
+runs on its own thread and delivers to every configured sink concurrently:
+- each sink has its own bounded queue, so a slow or unreachable sink never delays the others, and when
+  its queue is full the oldest alerts are dropped (counted in GET /api/alerts);
+- an alert is sent as soon as it arrives; alerts that arrive while a send is in flight go out together
+  in the next one (up to MAX_BATCH per send);
+- failed sends are retried with exponential backoff (honouring a server's Retry-After), then given up.
+
+Sinks are configured with environment variables and enabled when set:
+    ALERT_WEBHOOK_URL                          JSON POST of {"alerts": [...]}
+    TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID       Bot API sendMessage (TELEGRAM_API_BASE_URL to override)
+    ALERT_EMAIL_TO, SMTP_HOST                  one email per batch (SMTP_PORT, SMTP_USER, SMTP_PASSWORD,
+                                               SMTP_STARTTLS, ALERT_EMAIL_FROM)
+Run backend.mock_alerts and point these at it to exercise the sinks offline.
+"""
+import asyncio
+import datetime
+import os
+import smtplib
+import threading
+import time
+from collections import deque
+from email.message import EmailMessage
+import numpy as np
+import requests
+
+QUEUE_SIZE = int(os.getenv("ALERT_QUEUE_SIZE", "1000"))    # Per sink
+MAX_BATCH = 20
+MAX_ATTEMPTS = 5
+RETRY_BASE_SECONDS = 0.5
+MAX_RETRY_SECONDS = 30
+SEND_TIMEOUT_SECONDS = float(os.getenv("ALERT_SEND_TIMEOUT_SECONDS", "5"))
+LATENCY_SAMPLES = 200
+
+class DeliveryError(Exception):
+    """A failed send. Permanent failures (e.g. a rejected request) aren't retried."""
+
+    def __init__(self, message: str, permanent: bool = False, retry_after: float | None = None):
+        super().__init__(message)
+        self.permanent = permanent
+        self.retry_after = retry_after
+
+# --- Sinks ---
+
+def _format(alert: dict) -> str:
+    at = datetime.datetime.fromtimestamp(alert["at"]).strftime("%H:%M:%S")
+    return f"[{at}] {alert['user']}: {alert['text']}"
+
+def _check_response(response: requests.Response):
+    if response.status_code < 300:
+        return
+    retry_after = response.headers.get("Retry-After")
+    permanent = 400 <= response.status_code < 500 and response.status_code not in (408, 429)
+    raise DeliveryError(f"HTTP {response.status_code}: {response.text[:200]}", permanent,
+                        float(retry_after) if retry_after and retry_after.isdigit() else None)
+
+class WebhookSink:
+    name = "webhook"
+
+    def __init__(self, url: str):
+        self.url = url
+        self.session = requests.Session()
+
+    async def send(self, alerts: list):
+        response = await asyncio.to_thread(self.session.post, self.url, json={"alerts": alerts}, timeout=SEND_TIMEOUT_SECONDS)
+        _check_response(response)
+
+class TelegramSink:
+    name = "telegram"
+    MAX_MESSAGE_LENGTH = 4096
+
+    def __init__(self, token: str, chat_id: str, base_url: str):
+        self.url = f"{base_url.rstrip('/')}/bot{token}/sendMessage"
+        self.chat_id = chat_id
+        self.session = requests.Session()
+
+    async def send(self, alerts: list):
+        text = "\n".join(_format(alert) for alert in alerts)[:self.MAX_MESSAGE_LENGTH]
+        response = await asyncio.to_thread(self.session.post, self.url, json={"chat_id": self.chat_id, "text": text},
+                                           timeout=SEND_TIMEOUT_SECONDS)
+        if response.status_code == 429:
+            # The Bot API says how long to wait in the body rather than a header
+            try:
+                retry_after = (response.json().get("parameters") or {}).get("retry_after")
+            except ValueError:
+                retry_after = None
+            raise DeliveryError("Telegram rate limit", retry_after=retry_after)
+        _check_response(response)
+
+class EmailSink:
+    name = "email"
+
+    def __init__(self, to: str, host: str, port: int, user: str | None, password: str | None, sender: str, starttls: bool):
+        self.to, self.host, self.port = to, host, port
+        self.user, self.password, self.sender, self.starttls = user, password, sender, starttls
+
+    def _send_blocking(self, alerts: list):
+        message = EmailMessage()
+        message["From"], message["To"] = self.sender, self.to
+        message["Subject"] = _format(alerts[0]) if len(alerts) == 1 else f"{len(alerts)} trading alerts"
+        message.set_content("\n".join(_format(alert) for alert in alerts))
+        try:
+            with smtplib.SMTP(self.host, self.port, timeout=SEND_TIMEOUT_SECONDS) as smtp:
+                if self.starttls:
+                    smtp.starttls()
+                if self.user:
+                    smtp.login(self.user, self.password or "")
+                smtp.send_message(message)
+        except smtplib.SMTPResponseException as e:
+            raise DeliveryError(f"SMTP {e.smtp_code}: {e.smtp_error!r}", permanent=500 <= e.smtp_code < 600)
+
+    async def send(self, alerts: list):
+        await asyncio.to_thread(self._send_blocking, alerts)
+
+def configured_sinks() -> list:
+    """The sinks enabled by the environment."""
+    sinks = []
+    if os.getenv("ALERT_WEBHOOK_URL"):
+        sinks.append(WebhookSink(os.getenv("ALERT_WEBHOOK_URL")))
+    if os.getenv("TELEGRAM_BOT_TOKEN") and os.getenv("TELEGRAM_CHAT_ID"):
+        sinks.append(TelegramSink(os.getenv("TELEGRAM_BOT_TOKEN"), os.getenv("TELEGRAM_CHAT_ID"),
+                                  os.getenv("TELEGRAM_API_BASE_URL", "https://api.telegram.org")))
+    if os.getenv("ALERT_EMAIL_TO") and os.getenv("SMTP_HOST"):
+        sinks.append(EmailSink(os.getenv("ALERT_EMAIL_TO"), os.getenv("SMTP_HOST"), int(os.getenv("SMTP_PORT", "587")),
+                               os.getenv("SMTP_USER"), os.getenv("SMTP_PASSWORD"),
+                               os.getenv("ALERT_EMAIL_FROM", os.getenv("SMTP_USER") or "alerts@localhost"),
+                               os.getenv("SMTP_STARTTLS", "1") == "1"))
+    return sinks
+
+# --- Dispatcher ---
+
+class _SinkQueue:
+    """One sink's pending alerts and delivery counters. Only touched from the dispatcher's loop."""
+
+    def __init__(self, sink):
+        self.sink = sink
+        self.pending = deque()
+        self.wakeup = asyncio.Event()
+        self.sent = self.failed = self.dropped = self.retries = 0
+        self.latency_ms = deque(maxlen=LATENCY_SAMPLES)   # From notify() to the sink's acknowledgement
+        self.last_error = None
+
+    def put(self, alert: dict):
+        if len(self.pending) >= QUEUE_SIZE:
+            self.pending.popleft()  # The newest alerts matter most
+            self.dropped += 1
+        self.pending.append(alert)
+        self.wakeup.set()
+
+    async def run(self):
+        while True:
+            await self.wakeup.wait()
+            self.wakeup.clear()
+            while self.pending:
+                batch = [self.pending.popleft() for _ in range(min(MAX_BATCH, len(self.pending)))]
+                await self._deliver(batch)
+
+    async def _deliver(self, batch: list):
+        name = self.sink.name
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            try:
+                await self.sink.send([{key: value for key, value in alert.items() if key != "queued_at"} for alert in batch])
+            except Exception as e:  # Any failure of a sink is contained here
+                self.last_error = f"{type(e).__name__}: {e}"
+                permanent = isinstance(e, DeliveryError) and e.permanent
+                if permanent or attempt == MAX_ATTEMPTS:
+                    self.failed += len(batch)
+                    print(f"Alert {name} sink gave up on {len(batch)} alerts after {attempt} attempts: {self.last_error}")
+                    return
+                retry_after = e.retry_after if isinstance(e, DeliveryError) else None
+                self.retries += 1
+                await asyncio.sleep(min(retry_after or RETRY_BASE_SECONDS * 2 ** (attempt - 1), MAX_RETRY_SECONDS))
+                continue
+            now = time.perf_counter()
+            self.sent += len(batch)
+            self.latency_ms.extend((now - alert["queued_at"]) * 1000 for alert in batch)
+            return
+
+    def describe(self) -> dict:
+        samples = np.fromiter(self.latency_ms, dtype=float)
+        return {
+            "queued": len(self.pending), "sent": self.sent, "failed": self.failed, "dropped": self.dropped,
+            "retries": self.retries, "last_error": self.last_error,
+            "latency_p50_ms": round(float(np.percentile(samples, 50)), 2) if len(samples) else None,
+            "latency_p95_ms": round(float(np.percentile(samples, 95)), 2) if len(samples) else None,
+        }
+
+_loop = None
+_queues = []
+_configured = False   # The environment was checked for sinks
+_start_lock = threading.Lock()
+
+def _fan_out(alert: dict):
+    for sink_queue in _queues:
+        sink_queue.put(alert)
+
+def start(sinks: list | None = None) -> bool:
+    """Starts the dispatcher thread with the given (default: configured) sinks. Returns False if there are none."""
+    global _loop, _configured
+    with _start_lock:
+        if _loop is not None:
+            return True
+        _configured = True
+        sinks = configured_sinks() if sinks is None else sinks
+        if not sinks:
+            return False
+        loop = asyncio.new_event_loop()
+        ready = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(loop)
+            _queues.extend(_SinkQueue(sink) for sink in sinks)
+            for sink_queue in _queues:
+                loop.create_task(sink_queue.run())
+            loop.call_soon(ready.set)
+            loop.run_forever()
+
+        threading.Thread(target=run, daemon=True, name="alert_dispatcher").start()
+        ready.wait()
+        _loop = loop
+    print(f"Alert dispatcher started with sinks: {', '.join(sink.name for sink in sinks)}")
+    return True
+
+def notify(kind: str, user_name: str, text: str, **details):
+    """
+    Queues an alert (kind: signal, entry or exit) for every sink and returns at once. Safe to call from
+    any thread; does nothing when no sink is configured.
+    """
+    if _loop is None and (_configured or not start()):
+        return
+    alert = {"kind": kind, "user": user_name, "text": text, "at": time.time(), "queued_at": time.perf_counter(), **details}
+    _loop.call_soon_threadsafe(_fan_out, alert)
+
+def get_status() -> dict:
+    """Per sink: queued, sent, failed and dropped alerts, retries, the last error and notify-to-delivery latency."""
+    return {"running": _loop is not None, "sinks": {sink_queue.sink.name: sink_queue.describe() for sink_queue in _queues}}
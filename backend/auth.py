@@ -7,6 +7,8 @@ from fastapi import APIRouter, Request, HTTPException
 from fastapi.responses import RedirectResponse
 from dotenv import load_dotenv
 from .state import get_user_state
+from . import upstox_api
+from . import shared_state
 
 # Build a path to the .env file relative to this file's location
 # This ensures the backend can find its .env file reliably.
@@ -19,11 +21,6 @@ router = APIRouter(
     tags=["authentication"]
 )
 
-# --- Load credentials from .env file ---
-samarth_client_id = os.getenv("SAMARTH_UPSTOX_CLIENT_ID")
-samarth_client_secret = os.getenv("SAMARTH_UPSTOX_CLIENT_SECRET")
-prajwal_client_id = os.getenv("PRAJWAL_UPSTOX_CLIENT_ID")
-prajwal_client_secret = os.getenv("PRAJWAL_UPSTOX_CLIENT_SECRET")
 
 # Determine the redirect URI based on the environment
 if os.getenv("RENDER"): # RENDER is an environment variable set by Render.com
@@ -38,12 +35,17 @@ frontend_base_url = "http://localhost:3000" # Default for local dev
 
 user_credentials = {} # Keyed by user name ('samarth', 'prajwal')
 
-# Safely add users to the credentials dictionary if their details exist
-if samarth_client_id and samarth_client_secret:
-    user_credentials["samarth"] = {"client_id": samarth_client_id, "secret": samarth_client_secret}
-
-if prajwal_client_id and prajwal_client_secret:
-    user_credentials["prajwal"] = {"client_id": prajwal_client_id, "secret": prajwal_client_secret}
+# --- Load credentials from .env file ---
+# Any <NAME>_UPSTOX_CLIENT_ID / <NAME>_UPSTOX_CLIENT_SECRET pair adds a user called '<name>',
+# e.g. SAMARTH_UPSTOX_CLIENT_ID -> 'samarth'. Extra users are handy for load tests against the mock server.
+for env_key, client_id in os.environ.items():
+    if not env_key.endswith("_UPSTOX_CLIENT_ID"):
+        continue
+    prefix = env_key[:-len("_UPSTOX_CLIENT_ID")]
+    client_secret = os.getenv(f"{prefix}_UPSTOX_CLIENT_SECRET")
+    # Safely add users to the credentials dictionary if their details exist
+    if client_id and client_secret:
+        user_credentials[prefix.lower()] = {"client_id": client_id, "secret": client_secret}
 
 if not redirect_uri or not user_credentials:
     # We need at least one user and a redirect URI to function
@@ -55,11 +57,6 @@ async def upstox_callback(code: str, state: str, request: Request):
     Handles the callback from Upstox after user authentication.
     Exchanges the authorization code for an access token.
     """
-    token_url = "https://api-v2.upstox.com/login/authorization/token"
-    headers = {
-        "accept": "application/json"
-    }
-
     # The 'state' parameter identifies the user.
     user_name = state
     if user_name not in user_credentials:
@@ -75,7 +72,7 @@ async def upstox_callback(code: str, state: str, request: Request):
     }
 
     try:
-        response = requests.post(token_url, headers=headers, data=data)
+        response = upstox_api.post('/login/authorization/token', data=data)
         
         # Check for a non-successful status code from Upstox
         if response.status_code != 200:
@@ -89,14 +86,19 @@ async def upstox_callback(code: str, state: str, request: Request):
         if not access_token:
             raise HTTPException(status_code=400, detail="Access token not found in response from Upstox.")
         
-        # Get or create the state for this user and store their token
-        user_state = get_user_state(user_name)
-        user_state["access_token"] = access_token
-        print(f"Successfully authenticated as {user_name} and access token stored.")
-
-        # Start the background jobs specifically for this user
-        from .main import start_user_scheduler
-        start_user_scheduler(user_name)
+        if shared_state.ENGINE_ROLE == "consumer":
+            # The producer process owns the schedulers; hand the token over to it.
+            shared_state.post_command("login", user_name=user_name, access_token=access_token)
+            print(f"Successfully authenticated as {user_name}; login forwarded to the engine producer.")
+        else:
+            # Get or create the state for this user and store their token
+            user_state = get_user_state(user_name)
+            user_state["access_token"] = access_token
+            print(f"Successfully authenticated as {user_name} and access token stored.")
+
+            # Start the background jobs specifically for this user
+            from .main import start_user_scheduler
+            start_user_scheduler(user_name)
 
         # Redirect to the frontend with the access token and user identifier
         # In production, derive the frontend URL from the redirect URI.
@@ -1,143 +1,101 @@
 from collections import deque
+from typing import NamedTuple
 import numpy as np
-import pandas as pd
 
-# --- New Smoothed Greek Calculation Functions ---
-
-def calculate_smoothed_slope(buffer: deque, window_seconds: int) -> float:
-    """
-    Generic function to calculate the slope of a value in a buffer over a time window.
-    Assumes data is captured every 10 seconds.
-    """
-    num_updates = window_seconds // 10
-    if len(buffer) < num_updates:
-        return 0.0
-
-    recent_values = list(buffer)[-num_updates:]
-    if any(v is None for v in recent_values):
-        return 0.0
-
-    latest_val = recent_values[-1]
-    earliest_val = recent_values[0]
-
-    slope = (latest_val - earliest_val) / num_updates
-    return slope
-
-def calculate_smoothed_percent_change(buffer: deque, window_seconds: int) -> float:
-    """
-    Generic function to calculate the percentage change of a value in a buffer over a time window.
-    Assumes data is captured every 10 seconds.
-    """
-    num_updates = window_seconds // 10
-    if len(buffer) < num_updates:
-        return 0.0
-
-    recent_values = list(buffer)[-num_updates:]
-    if any(v is None for v in recent_values):
-        return 0.0
-
-    latest_val = recent_values[-1]
-    earliest_val = recent_values[0]
-
-    if earliest_val == 0:
-        return 0.0
-
-    change_percent = ((latest_val - earliest_val) / earliest_val) * 100
-    return change_percent
-
-
-def calculate_delta_slope(delta_buffer: deque, num_updates: int = 5) -> float:
-    """
-    Calculates the slope of delta over the last few updates.
-    Formula: DeltaSlope = (D_latest - D_earliest) / number_of_updates
-    """
-    # Ensure we have enough data points and no None values in the slice
-    if len(delta_buffer) < num_updates:
-        return 0.0
-
-    recent_deltas = list(delta_buffer)[-num_updates:]
-    if any(d is None for d in recent_deltas):
-        return 0.0
-
-    # D5 is the latest, D1 is the earliest in the window
-    d5 = recent_deltas[-1]
-    d1 = recent_deltas[0]
-
-    slope = (d5 - d1) / num_updates
-    return slope
-
-def calculate_gamma_change_percent(gamma_buffer: deque, num_updates: int = 5) -> float:
-    """
-    Calculates the percentage change in gamma over the last few updates.
-    Formula: GammaChange = ((Gamma_latest - Gamma_previous) / Gamma_previous) * 100
-    """
-    if len(gamma_buffer) < num_updates:
-        return 0.0
-
-    recent_gammas = list(gamma_buffer)[-num_updates:]
-    if any(g is None for g in recent_gammas):
-        return 0.0
-
-    gamma_latest = recent_gammas[-1]
-    gamma_previous = recent_gammas[0]
-
-    if gamma_previous == 0: # Avoid division by zero
-        return 0.0
-
-    change_percent = ((gamma_latest - gamma_previous) / gamma_previous) * 100
-    return change_percent
-
-def calculate_iv_trend(iv_buffer: deque, num_updates: int = 3) -> float:
-    """
-    Calculates the trend of IV over the last few updates.
-    Formula: IVTrend = IV_latest - IV_earliest
-    """
-    if len(iv_buffer) < num_updates:
-        return 0.0
-
-    recent_ivs = list(iv_buffer)[-num_updates:]
-    if any(iv is None for iv in recent_ivs):
-        return 0.0
-
-    iv_latest = recent_ivs[-1]
-    iv_earliest = recent_ivs[0]
-
-    trend = iv_latest - iv_earliest
-    return trend
-
-def calculate_delta_stability(delta_buffer: deque, num_updates: int = 5) -> float:
-    """
-    Measures the stability (volatility) of delta using standard deviation.
-    """
-    if len(delta_buffer) < num_updates:
-        return 0.0
-
-    recent_deltas = list(delta_buffer)[-num_updates:]
-    if any(d is None for d in recent_deltas):
-        return 0.0
-
-    stability = np.std(recent_deltas)
-    return stability
-
-def calculate_theta_change_percent(theta_buffer: deque, num_updates: int = 5) -> float:
-    """
-    Calculates the percentage change in theta.
-    """
-    if len(theta_buffer) < num_updates:
-        return 0.0
-    
-    recent_thetas = list(theta_buffer)[-num_updates:]
-    if any(t is None for t in recent_thetas):
-        return 0.0
-
-    theta_now = recent_thetas[-1]
-    theta_prev = recent_thetas[0]
-
-    if theta_prev == 0:
-        return 0.0
-
-    change_percent = ((theta_now - theta_prev) / theta_prev) * 100
-    return change_percent
+# --- Smoothed Greek Trends ---
+
+# Trends keep the units the entry/exit thresholds were tuned in, under the original fixed 10-second polling:
+# a W-second window held W/10 updates spanning W - 10 seconds, the slope was the change across that span
+# divided by W/10, and the percent change was across that span. They no longer depend on the actual interval.
+REFERENCE_POLL_SECONDS = 10
+# Samples assumed apart when a series comes without timestamps.
+DEFAULT_SAMPLE_SECONDS = REFERENCE_POLL_SECONDS
+# A window's trend needs at least two samples spanning this fraction of the window.
+MIN_WINDOW_COVERAGE = 0.5
+
+class Trends(NamedTuple):
+    """Least-squares trend statistics, each a (series, window) array; NaN where a window lacks data."""
+    names: tuple
+    windows: tuple
+    slope: np.ndarray           # Fitted change over W - 10 seconds, per W/10 updates (see REFERENCE_POLL_SECONDS)
+    percent_change: np.ndarray  # Fitted change over W - 10 seconds, in % of the line's value at its start
+    dispersion: np.ndarray      # Standard deviation of the samples around the fitted line
+
+    def get(self, stat: str, name: str, window: int) -> float:
+        return float(getattr(self, stat)[self.names.index(name), self.windows.index(window)])
+
+def rolling_trends(series: dict, timestamps=None, windows: tuple = (30,)) -> Trends:
+    """
+    Fits a least-squares line to each series over the last `window` seconds (t_last - window < t <= t_last),
+    for every window at once, using the samples' real timestamps (epoch seconds, parallel to the series).
+    Gaps, None values and uneven polling are handled by the fit instead of distorting a first-to-last difference.
+    Series may be shorter than the timestamps (they are aligned on the newest sample). Without timestamps,
+    samples are assumed DEFAULT_SAMPLE_SECONDS apart.
+    """
+    names = tuple(series)
+    length = max((len(values) for values in series.values()), default=0)
+    values = np.full((len(names), length), np.nan)
+    for i, buffer in enumerate(series.values()):
+        if len(buffer):
+            values[i, length - len(buffer):] = np.array(list(buffer), dtype=float)
+    if timestamps is not None and len(timestamps) >= length:
+        times = np.array(list(timestamps)[len(timestamps) - length:], dtype=float)
+    else:
+        times = np.arange(-length + 1, 1, dtype=float) * DEFAULT_SAMPLE_SECONDS
+    # Relative to the newest sample, so squares of epoch seconds don't eat the precision
+    times = times - times[-1] if length else times
+    window_lengths = np.array(windows, dtype=float)
+
+    # (series, window, sample): which samples each fit uses
+    in_window = times[None, :] > -window_lengths[:, None]
+    used = in_window[None, :, :] & np.isfinite(values)[:, None, :]
+    y = np.where(np.isfinite(values), values, 0.0)[:, None, :]
+    t = times[None, None, :]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        n = used.sum(axis=2)
+        mean_t = (used * t).sum(axis=2) / n
+        mean_y = (used * y).sum(axis=2) / n
+        dt = np.where(used, t - mean_t[..., None], 0.0)
+        dy = np.where(used, y - mean_y[..., None], 0.0)
+        var_t = (dt * dt).sum(axis=2)
+        slope = (dt * dy).sum(axis=2) / var_t
+        residual = dy - slope[..., None] * dt
+        dispersion = np.sqrt((residual * residual).sum(axis=2) / n)
+
+        first_t = np.where(used, t, np.inf).min(axis=2, initial=np.inf)
+        last_t = np.where(used, t, -np.inf).max(axis=2, initial=-np.inf)
+        # The reference span and update count of each window (see REFERENCE_POLL_SECONDS)
+        span = np.maximum(window_lengths - REFERENCE_POLL_SECONDS, REFERENCE_POLL_SECONDS)[None, :]
+        updates = (window_lengths / REFERENCE_POLL_SECONDS)[None, :]
+        change = slope * span
+        start = mean_y + slope * (last_t - span - mean_t)
+        percent_change = np.where(start != 0, change / start * 100, np.nan)
+
+    enough = (n >= 2) & (last_t - first_t >= window_lengths[None, :] * MIN_WINDOW_COVERAGE)
+    return Trends(names, tuple(windows),
+                  np.where(enough, change / updates, np.nan),
+                  np.where(enough, percent_change, np.nan),
+                  np.where(enough, dispersion, np.nan))
+
+# The smoothed features the strategy uses: name -> (contract buffer, trend statistic).
+GREEK_FEATURES = {
+    "delta_slope": ("delta_buffer", "slope"),
+    "gamma_change": ("gamma_buffer", "percent_change"),
+    "iv_trend": ("iv_buffer", "slope"),
+    "theta_change": ("theta_buffer", "percent_change"),
+    "premium_change": ("premium_buffer", "percent_change"),
+}
+
+def smoothed_greeks(history: dict, windows: tuple = (30,)) -> dict:
+    """
+    Returns {window: {feature: value}} of the GREEK_FEATURES from a contract's buffers (as returned by
+    greek_series.contract_history), computed for all windows in one pass. Missing data gives NaN,
+    which fails every threshold check.
+    """
+    buffers = {buffer_name: history.get(buffer_name, ()) for buffer_name, _ in GREEK_FEATURES.values()}
+    trends = rolling_trends(buffers, history.get("tick_time_buffer"), windows)
+    return {window: {feature: trends.get(stat, buffer_name, window) for feature, (buffer_name, stat) in GREEK_FEATURES.items()}
+            for window in windows}
 
 def calculate_ema(candles_5min: deque, period: int = 20) -> float:
     """
@@ -146,14 +104,13 @@ def calculate_ema(candles_5min: deque, period: int = 20) -> float:
     if len(candles_5min) < period:
         return 0.0
 
-    # Create a pandas DataFrame from the candle data
-    df = pd.DataFrame(list(candles_5min), columns=['timestamp', 'open', 'high', 'low', 'close'])
-    
-    # Calculate EMA on the 'close' price series
-    ema = df['close'].ewm(span=period, adjust=False).mean()
-    
-    # Return the latest EMA value
-    return ema.iloc[-1]
+    # Recursive EMA over the close prices, seeded with the first close (pandas' ewm(span, adjust=False))
+    alpha = 2 / (period + 1)
+    candles = list(candles_5min)
+    ema = candles[0][4]
+    for candle in candles[1:]:
+        ema = alpha * candle[4] + (1 - alpha) * ema
+    return ema
 
 def calculate_atr(candles_5min: deque, period: int = 14) -> float:
     """
@@ -162,22 +119,21 @@ def calculate_atr(candles_5min: deque, period: int = 14) -> float:
     if len(candles_5min) < period:
         return 0.0
 
-    df = pd.DataFrame(list(candles_5min), columns=['timestamp', 'open', 'high', 'low', 'close'])
-    
-    # Calculate True Range (TR)
-    high_low = df['high'] - df['low']
-    high_prev_close = abs(df['high'] - df['close'].shift(1))
-    low_prev_close = abs(df['low'] - df['close'].shift(1))
-    
-    tr = pd.concat([high_low, high_prev_close, low_prev_close], axis=1).max(axis=1)
-    
-    # Calculate ATR as the simple moving average of TR for the specified period
-    atr = tr.rolling(window=period).mean()
+    # Only the last `period` True Ranges (and the close before them) are needed
+    recent_candles = list(candles_5min)[-(period + 1):]
+
+    # Calculate True Range (TR); the very first candle has no previous close
+    true_ranges = []
+    prev_close = None
+    for _timestamp, _open, candle_high, candle_low, candle_close in recent_candles:
+        tr = candle_high - candle_low
+        if prev_close is not None:
+            tr = max(tr, abs(candle_high - prev_close), abs(candle_low - prev_close))
+        true_ranges.append(tr)
+        prev_close = candle_close
 
-    # Return the latest ATR value
-    if not atr.empty and not pd.isna(atr.iloc[-1]):
-        return atr.iloc[-1]
-    return 0.0
+    # ATR is the simple moving average of TR over the period
+    return sum(true_ranges[-period:]) / period
 
 def find_swing_points(candles_5min: deque) -> list:
     """
@@ -188,20 +144,21 @@ def find_swing_points(candles_5min: deque) -> list:
     if len(candles_5min) < 3:
         return []
 
-    df = pd.DataFrame(list(candles_5min), columns=['timestamp', 'open', 'high', 'low', 'close'])
+    candles = list(candles_5min)
     swing_points = []
 
     # Iterate from the second to the second-to-last candle
-    for i in range(1, len(df) - 1):
+    for i in range(1, len(candles) - 1):
+        timestamp, _, high, low, _ = candles[i]
         # Check for Swing High
-        if df['high'].iloc[i] > df['high'].iloc[i-1] and df['high'].iloc[i] > df['high'].iloc[i+1]:
+        if high > candles[i-1][2] and high > candles[i+1][2]:
             swing_points.append({
-                "type": "high", "price": df['high'].iloc[i], "timestamp": df['timestamp'].iloc[i]
+                "type": "high", "price": high, "timestamp": timestamp
             })
         # Check for Swing Low
-        if df['low'].iloc[i] < df['low'].iloc[i-1] and df['low'].iloc[i] < df['low'].iloc[i+1]:
+        if low < candles[i-1][3] and low < candles[i+1][3]:
             swing_points.append({
-                "type": "low", "price": df['low'].iloc[i], "timestamp": df['timestamp'].iloc[i]
+                "type": "low", "price": low, "timestamp": timestamp
             })
             
     return swing_points
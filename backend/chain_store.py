@@ -0,0 +1,133 @@
+import threading
+import time
+import numpy as np
+
+# Per-side fields kept for every strike: (record field suffix, Upstox section, Upstox key).
+SIDE_FIELDS = (
+    ("ltp", "market_data", "ltp"),
+    ("bid", "market_data", "bid_price"),
+    ("ask", "market_data", "ask_price"),
+    ("bid_qty", "market_data", "bid_qty"),
+    ("ask_qty", "market_data", "ask_qty"),
+    ("oi", "market_data", "oi"),
+    ("volume", "market_data", "volume"),
+    ("delta", "option_greeks", "delta"),
+    ("gamma", "option_greeks", "gamma"),
+    ("theta", "option_greeks", "theta"),
+    ("vega", "option_greeks", "vega"),
+    ("iv", "option_greeks", "iv"),
+)
+SIDES = (("call", "call_options"), ("put", "put_options"))
+
+# One fixed-size record per strike; missing values are NaN.
+CHAIN_DTYPE = np.dtype(
+    [("strike", "f8"), ("underlying", "f8")]
+    + [(f"{side}_instrument_key", "S32") for side, _ in SIDES]  # ASCII, e.g. "NSE_FO|43885"
+    + [(f"{side}_{field}", "f8") for side, _ in SIDES for field, _, _ in SIDE_FIELDS]
+)
+
+def _number(value) -> float:
+    return np.nan if value is None else value
+
+def _python_value(value):
+    """Converts a record value back to what the Upstox JSON had: NaN becomes None, keys become str."""
+    if isinstance(value, bytes):
+        return value.decode() or None
+    return None if isinstance(value, float) and value != value else value
+
+class OptionChain:
+    """
+    One fetched option chain as a read-only NumPy record array, sorted by strike.
+    Instances are immutable and shared by every user and reader; the Upstox-shaped JSON the UI
+    needs is only built on first request, and then kept.
+    """
+    __slots__ = ("instrument_key", "expiry", "fetched_at", "records", "_json")
+
+    def __init__(self, instrument_key: str, expiry: str, fetched_at: float, records: np.ndarray):
+        records.flags.writeable = False
+        self.instrument_key = instrument_key
+        self.expiry = expiry
+        self.fetched_at = fetched_at
+        self.records = records
+        self._json = None
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getstate__(self):
+        # The cached JSON is derived data; don't carry it into snapshots
+        return (self.instrument_key, self.expiry, self.fetched_at, self.records)
+
+    def __setstate__(self, state):
+        self.instrument_key, self.expiry, self.fetched_at, records = state
+        records.flags.writeable = False  # Unpickled arrays come back writeable
+        self.records = records
+        self._json = None
+
+    def row(self, index: int) -> dict:
+        """Returns one strike as a flat dict of Python values (None where Upstox sent nothing)."""
+        return {name: _python_value(value) for name, value in zip(CHAIN_DTYPE.names, self.records[index].tolist())}
+
+    def find_strike(self, strike: float) -> int | None:
+        """Returns the index of a strike, or None if the chain doesn't have it."""
+        index = int(np.searchsorted(self.records["strike"], strike))
+        if index < len(self.records) and self.records["strike"][index] == strike:
+            return index
+        return None
+
+    def to_json(self) -> list:
+        """The chain in Upstox's nested JSON shape, as the UI expects it. Built once per chain."""
+        if self._json is None:
+            self._json = [self._strike_json(values) for values in self.records.tolist()]
+        return self._json
+
+    def _strike_json(self, values: tuple) -> dict:
+        record = dict(zip(CHAIN_DTYPE.names, values))
+        strike_json = {
+            "expiry": self.expiry,
+            "strike_price": record["strike"],
+            "underlying_spot_price": _python_value(record["underlying"]),
+        }
+        for side, key in SIDES:
+            side_json = {"instrument_key": _python_value(record[f"{side}_instrument_key"]), "market_data": {}, "option_greeks": {}}
+            for field, section, upstox_key in SIDE_FIELDS:
+                side_json[section][upstox_key] = _python_value(record[f"{side}_{field}"])
+            strike_json[key] = side_json
+        return strike_json
+
+def from_upstox(instrument_key: str, expiry: str, chain: list, fetched_at: float | None = None) -> OptionChain:
+    """Converts an Upstox option chain response ('data' list) into an OptionChain."""
+    rows = []
+    for strike_data in chain:
+        row = [_number(strike_data.get("strike_price")), _number(strike_data.get("underlying_spot_price"))]
+        sides = [strike_data.get(key) or {} for _, key in SIDES]
+        row += [(side.get("instrument_key") or "").encode() for side in sides]
+        for side in sides:
+            for _, section, upstox_key in SIDE_FIELDS:
+                row.append(_number((side.get(section) or {}).get(upstox_key)))
+        rows.append(tuple(row))
+    records = np.array(rows, dtype=CHAIN_DTYPE)
+    records.sort(order="strike")
+    return OptionChain(instrument_key, expiry, fetched_at or time.time(), records)
+
+# --- Shared store: the latest chain per instrument and expiry ---
+# Users polling the same instrument within this many seconds of each other share one fetch.
+SHARE_MAX_AGE_SECONDS = 1.0
+
+_latest = {}
+_lock = threading.Lock()
+
+def publish_chain(chain: OptionChain):
+    """Makes a chain the latest for its instrument, unless a newer one has already been published."""
+    key = (chain.instrument_key, chain.expiry)
+    with _lock:
+        current = _latest.get(key)
+        if current is None or current.fetched_at <= chain.fetched_at:
+            _latest[key] = chain
+
+def get_latest_chain(instrument_key: str, expiry: str, max_age: float | None = None) -> OptionChain | None:
+    """Returns the latest chain for an instrument, or None if there is none (at most `max_age` seconds old)."""
+    chain = _latest.get((instrument_key, expiry))
+    if chain is None or (max_age is not None and time.time() - chain.fetched_at > max_age):
+        return None
+    return chain
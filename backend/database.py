@@ -1,3 +1,5 @@
+import json
+import os
 import sqlite3
 import datetime
 
@@ -24,12 +26,40 @@ def init_db():
             result TEXT
         )
     ''')
+    # Simulated paper fills, added after the table was first created
+    trade_log_columns = {row['name'] for row in conn.execute('PRAGMA table_info(trade_logs)')}
+    for name, column_type in (('entry_fill_price', 'REAL'), ('exit_fill_price', 'REAL'), ('fill_quantity', 'INTEGER'),
+                              ('entry_fill_at', 'TEXT'), ('exit_fill_at', 'TEXT')):
+        if name not in trade_log_columns:
+            conn.execute(f'ALTER TABLE trade_logs ADD COLUMN {name} {column_type}')
     conn.execute('''
         CREATE TABLE IF NOT EXISTS settings (
             key TEXT PRIMARY KEY,
             value TEXT
         )
     ''')
+    # --- Shadow mode: named setting overrides and their paper ledgers ---
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS shadow_configs (
+            name TEXT PRIMARY KEY,
+            overrides TEXT NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS shadow_trades (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            config_name TEXT NOT NULL,
+            user_name TEXT,
+            timestamp TEXT NOT NULL,
+            signal_type TEXT,
+            status TEXT,
+            strike_price REAL,
+            entry_price REAL,
+            exit_price REAL,
+            result TEXT,
+            closed_at TEXT
+        )
+    ''')
     # Insert default settings if they don't exist
     # --- Core Trade Management Settings ---
     conn.execute("INSERT OR IGNORE INTO settings (key, value) VALUES ('risk_reward_ratio', '2.0')")
@@ -48,6 +78,23 @@ def init_db():
     conn.execute("INSERT OR IGNORE INTO settings (key, value) VALUES ('entry_theta_max_spike', '5.0')")
     conn.execute("INSERT OR IGNORE INTO settings (key, value) VALUES ('exit_iv_crush_thresh', '-2.0')")
 
+    conn.execute("INSERT OR IGNORE INTO settings (key, value) VALUES ('max_tick_age_seconds', '30')")
+
+    # --- Paper Fill Settings ---
+    conn.execute("INSERT OR IGNORE INTO settings (key, value) VALUES ('paper_quantity', '75')")
+    conn.execute("INSERT OR IGNORE INTO settings (key, value) VALUES ('fill_latency_ms', '250')")
+    conn.execute("INSERT OR IGNORE INTO settings (key, value) VALUES ('fill_slippage_ticks', '1')")
+
+    # --- Order Execution Settings (off until accounts are linked; the first one leads) ---
+    conn.execute("INSERT OR IGNORE INTO settings (key, value) VALUES ('execution_accounts', '')")
+    conn.execute("INSERT OR IGNORE INTO settings (key, value) VALUES ('order_quantity', '75')")
+    conn.execute("INSERT OR IGNORE INTO settings (key, value) VALUES ('order_product', 'I')")
+
+    # --- Adaptive Polling Settings ---
+    conn.execute("INSERT OR IGNORE INTO settings (key, value) VALUES ('poll_interval_active_seconds', '3')")
+    conn.execute("INSERT OR IGNORE INTO settings (key, value) VALUES ('poll_interval_default_seconds', '10')")
+    conn.execute("INSERT OR IGNORE INTO settings (key, value) VALUES ('poll_interval_quiet_seconds', '20')")
+
     conn.commit()
     conn.close()
     print("Database initialized.")
@@ -58,7 +105,7 @@ def log_signal(signal_data):
         return
 
     conn = get_db_connection()
-    conn.execute(
+    cursor = conn.execute(
         'INSERT INTO trade_logs (timestamp, signal_type, status, strike_price) VALUES (?, ?, ?, ?)',
         (
             datetime.datetime.now().isoformat(),
@@ -67,9 +114,10 @@ def log_signal(signal_data):
             signal_data.get('strike_price')
         )
     )
+    # Read the new row id before the connection is closed
+    log_id = cursor.lastrowid
     conn.commit()
     conn.close()
-    log_id = conn.execute('SELECT last_insert_rowid()').fetchone()[0]
     print(f"Logged new signal (ID: {log_id}): {signal_data.get('type')} - {signal_data.get('status')}")
     return log_id
 
@@ -96,6 +144,45 @@ def get_all_logs():
     conn.close()
     return [dict(log) for log in logs]
 
+def get_log_columns() -> list:
+    """Returns [(name, declared type)] of the trade_logs columns, in table order."""
+    conn = get_db_connection()
+    columns = [(row['name'], row['type']) for row in conn.execute('PRAGMA table_info(trade_logs)')]
+    conn.close()
+    return columns
+
+def iter_logs(since: str | None = None, until: str | None = None, chunk_rows: int = 1000):
+    """
+    Yields trade logs with since <= timestamp < until (ISO strings; either may be None) in chunks of tuples,
+    in id order. Each chunk is its own short query, so an export never holds a read lock that would make
+    the engine's log writes wait.
+    """
+    last_id = 0
+    while True:
+        conn = get_db_connection()
+        rows = conn.execute(
+            'SELECT * FROM trade_logs WHERE id > ? AND timestamp >= ? AND (? IS NULL OR timestamp < ?) ORDER BY id LIMIT ?',
+            (last_id, since or '', until, until, chunk_rows),
+        ).fetchall()
+        conn.close()
+        if not rows:
+            return
+        yield [tuple(row) for row in rows]
+        last_id = rows[-1]['id']
+
+def get_data_version() -> tuple:
+    """
+    Changes whenever the database is written (settings or trade logs), in any process.
+    Reads the file's mtime and SQLite's file change counter (header bytes 24-27, bumped on every commit),
+    which is far cheaper than querying, so it can be checked on every request.
+    """
+    try:
+        with open(DATABASE_FILE, "rb") as f:
+            header = f.read(28)
+            return (os.fstat(f.fileno()).st_mtime_ns, int.from_bytes(header[24:28], "big"))
+    except FileNotFoundError:
+        return (0, 0)
+
 def get_settings():
     """Retrieves all settings from the database."""
     conn = get_db_connection()
@@ -113,4 +200,80 @@ def update_setting(key, value):
     )
     conn.commit()
     conn.close()
-    print(f"Updated setting: {key} = {value}")
\ No newline at end of file
+    print(f"Updated setting: {key} = {value}")
+
+# --- Shadow configs and paper ledgers ---
+
+def get_shadow_configs() -> dict:
+    """Returns {name: settings overrides} of every shadow config."""
+    conn = get_db_connection()
+    rows = conn.execute('SELECT name, overrides FROM shadow_configs ORDER BY name').fetchall()
+    conn.close()
+    return {row['name']: json.loads(row['overrides']) for row in rows}
+
+def save_shadow_config(name: str, overrides: dict):
+    """Creates or replaces a shadow config."""
+    conn = get_db_connection()
+    conn.execute('INSERT OR REPLACE INTO shadow_configs (name, overrides) VALUES (?, ?)', (name, json.dumps(overrides)))
+    conn.commit()
+    conn.close()
+    print(f"Saved shadow config: {name} = {overrides}")
+
+def delete_shadow_config(name: str):
+    """Deletes a shadow config; its ledger is kept."""
+    conn = get_db_connection()
+    conn.execute('DELETE FROM shadow_configs WHERE name = ?', (name,))
+    conn.commit()
+    conn.close()
+    print(f"Deleted shadow config: {name}")
+
+def open_shadow_trades(trades: list) -> list:
+    """
+    Records paper entries, given as dicts with config_name, user_name, signal_type, strike_price and entry_price.
+    Returns their ledger ids, in order. All are written in one transaction.
+    """
+    conn = get_db_connection()
+    timestamp = datetime.datetime.now().isoformat()
+    ids = [conn.execute(
+        'INSERT INTO shadow_trades (config_name, user_name, timestamp, signal_type, status, strike_price, entry_price) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?)',
+        (t['config_name'], t['user_name'], timestamp, t['signal_type'], 'OPEN', t['strike_price'], t['entry_price'])
+    ).lastrowid for t in trades]
+    conn.commit()
+    conn.close()
+    return ids
+
+def close_shadow_trades(exits: list):
+    """Records paper exits, given as (ledger id, exit price, result) tuples, in one transaction."""
+    conn = get_db_connection()
+    closed_at = datetime.datetime.now().isoformat()
+    conn.executemany(
+        "UPDATE shadow_trades SET status = 'CLOSED', exit_price = ?, result = ?, closed_at = ? WHERE id = ?",
+        [(exit_price, result, closed_at, trade_id) for trade_id, exit_price, result in exits]
+    )
+    conn.commit()
+    conn.close()
+
+def get_shadow_trades(config_name: str | None = None) -> list:
+    """Retrieves paper trades, most recent first, optionally for one shadow config."""
+    conn = get_db_connection()
+    if config_name is None:
+        trades = conn.execute('SELECT * FROM shadow_trades ORDER BY id DESC').fetchall()
+    else:
+        trades = conn.execute('SELECT * FROM shadow_trades WHERE config_name = ? ORDER BY id DESC', (config_name,)).fetchall()
+    conn.close()
+    return [dict(trade) for trade in trades]
+
+def summarize_shadow_trades() -> list:
+    """Per shadow config: number of paper trades, how many are closed, wins and total points."""
+    conn = get_db_connection()
+    rows = conn.execute('''
+        SELECT config_name,
+               COUNT(*) AS trades,
+               SUM(status = 'CLOSED') AS closed,
+               SUM(status = 'CLOSED' AND exit_price > entry_price) AS wins,
+               ROUND(SUM(CASE WHEN status = 'CLOSED' THEN exit_price - entry_price ELSE 0 END), 2) AS points
+        FROM shadow_trades GROUP BY config_name ORDER BY points DESC
+    ''').fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
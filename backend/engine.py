@@ -0,0 +1,55 @@
+"""
+The producer process for multi-worker deployments.
+
+    python -m backend.engine
+    ENGINE_ROLE=consumer uvicorn backend.main:app --workers 4
+
+The engine owns the schedulers (fetch, logic, exits) for every user and publishes state snapshots
+through backend.shared_state. The uvicorn workers only read those snapshots and forward logins and
+logouts back here as commands.
+"""
+import os
+import time
+
+# The engine is always the producer, whatever the environment says.
+os.environ["ENGINE_ROLE"] = "producer"
+
+from . import database
+from . import main as engine_main
+from . import recovery
+from . import shared_state
+from .state import app_state, get_user_state
+
+# How often snapshots are published and commands picked up.
+PUBLISH_INTERVAL_SECONDS = 0.5
+
+def apply_command(command: dict):
+    action = command.get("action")
+    user_name = command.get("user_name")
+    if action == "login":
+        user_state = get_user_state(user_name)
+        user_state["access_token"] = command.get("access_token")
+        engine_main.start_user_scheduler(user_name)
+    elif action == "logout":
+        engine_main.stop_user_session(user_name)
+    elif action == "profile":
+        try:
+            engine_main.start_job_profile(command.get("target"), command.get("mode"), command.get("runs"))
+        except ValueError as e:
+            print(f"Ignoring profile command: {e}")
+    else:
+        print(f"Ignoring unknown engine command: {command}")
+
+def run():
+    database.init_db()
+    engine_main.resume_user_sessions(recovery.restore_snapshot())
+    recovery.start_snapshot_writer()
+    print(f"Engine producer started; publishing snapshots to {shared_state.SNAPSHOT_FILE}")
+    while True:
+        for command in shared_state.drain_commands():
+            apply_command(command)
+        shared_state.publish_users(app_state["users"])
+        time.sleep(PUBLISH_INTERVAL_SECONDS)
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,227 @@
+"""
+Order execution for linked accounts.
+
+When the strategy approves an entry (or exits a trade), market orders are sent for every linked account
+at once. The linked accounts are the comma-separated user names in the `execution_accounts` setting;
+only signals from the first of them (the lead) are executed, so the other accounts' own pipelines don't
+send duplicates. Execution is off while the setting is empty.
+
+To keep the signal-to-ack time short:
+- each account has its own requests.Session, kept warm (connected and authenticated) while a candidate
+  is pending or a trade is open;
+- order requests are built and prepared while the candidate is still pending, so firing is one send;
+- the sends for all accounts go out concurrently from a dedicated pool, never blocking the tick pipeline.
+An exit is only sent for the accounts whose entry order was accepted.
+
+Signal-to-ack latency per account is kept for GET /api/execution. Point UPSTOX_API_BASE_URL at
+backend.mock_upstox, which accepts orders, to exercise the path offline.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+from . import upstox_api
+from .state import app_state
+
+ORDER_PATH = "/order/place"
+# A session idle for longer than this is pinged before it's needed; servers close idle connections after ~60s.
+KEEP_WARM_SECONDS = 20
+ORDER_TIMEOUT_SECONDS = float(os.getenv("ORDER_TIMEOUT_SECONDS", "3"))
+# Orders may wait this long for the account's rate limit (they share it with data fetches).
+ORDER_MAX_RATE_WAIT_SECONDS = 0.5
+LATENCY_SAMPLES = 200
+
+_pool = ThreadPoolExecutor(max_workers=int(os.getenv("ORDER_WORKERS", "16")), thread_name_prefix="order")
+_sessions = {}       # account -> {"token", "session", "last_used"}
+_prepared = {}       # (log_id, side) -> {account: requests.PreparedRequest}
+_entered = {}        # log_id -> accounts whose entry BUY was accepted (returned an order id)
+_entry_sends = {}    # log_id -> {account: Future} of the entry BUYs, for exits fired while one is in flight
+_ack_latency = {}    # account -> deque of signal-to-ack ms
+_recent_orders = deque(maxlen=50)
+_lock = threading.Lock()
+
+# --- Accounts and sessions ---
+
+def linked_accounts(settings: dict) -> list:
+    return [name.strip().lower() for name in settings.get('execution_accounts', '').split(",") if name.strip()]
+
+def is_lead(user_name: str, settings: dict) -> bool:
+    """True if this user's signals are executed (it is the first linked account)."""
+    accounts = linked_accounts(settings)
+    return bool(accounts) and accounts[0] == user_name
+
+def _session(account: str) -> dict | None:
+    """Returns the account's session, recreating it if the account has logged in again. None if logged out."""
+    user_state = app_state["users"].get(account)
+    token = user_state.get("access_token") if user_state else None
+    if not token:
+        return None
+    with _lock:
+        entry = _sessions.get(account)
+        if entry is None or entry["token"] != token:
+            session = requests.Session()
+            session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+            session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+            session.headers.update(upstox_api.auth_headers(token))
+            session.headers["Content-Type"] = "application/json"
+            entry = _sessions[account] = {"token": token, "session": session, "last_used": 0.0}
+        return entry
+
+def _ping(account: str, entry: dict):
+    try:
+        if upstox_api.get_bucket(entry["token"]).acquire(max_wait=0):
+            entry["session"].get(f"{upstox_api.base_url()}/user/profile", timeout=ORDER_TIMEOUT_SECONDS)
+            entry["last_used"] = time.monotonic()
+    except requests.exceptions.RequestException as e:
+        print(f"[{account}] Keep-warm request failed: {e}")
+
+def keep_warm(settings: dict):
+    """Pings the linked accounts' sessions that have been idle too long (in the background)."""
+    now = time.monotonic()
+    for account in linked_accounts(settings):
+        entry = _session(account)
+        if entry and now - entry["last_used"] > KEEP_WARM_SECONDS:
+            entry["last_used"] = now  # Don't queue another ping while this one is out
+            _pool.submit(_ping, account, entry)
+
+# --- Payloads ---
+
+def _payload(candidate: dict, side: str, settings: dict) -> bytes:
+    return json.dumps({
+        "quantity": int(settings.get('order_quantity', 75)),
+        "product": settings.get('order_product', 'I'),
+        "validity": "DAY",
+        "price": 0,
+        "tag": f"goo-{candidate.get('log_id')}",
+        "instrument_token": candidate["instrument_key"],
+        "order_type": "MARKET",
+        "transaction_type": side,
+        "disclosed_quantity": 0,
+        "trigger_price": 0,
+        "is_amo": False,
+    }).encode()
+
+def _build_requests(accounts, candidate: dict, side: str, settings: dict) -> dict:
+    body = _payload(candidate, side, settings)
+    url = f"{upstox_api.base_url()}{ORDER_PATH}"
+    prepared = {}
+    for account in accounts:
+        entry = _session(account)
+        if entry:
+            prepared[account] = entry["session"].prepare_request(requests.Request("POST", url, data=body))
+    return prepared
+
+def prepare(candidate: dict, side: str, settings: dict):
+    """Builds the order requests of every linked account for this trade, ahead of the signal, and warms the sessions."""
+    if not candidate.get("instrument_key"):
+        return
+    _prepared[(candidate.get("log_id"), side)] = _build_requests(linked_accounts(settings), candidate, side, settings)
+    keep_warm(settings)
+
+# --- Firing ---
+
+def _send(account: str, request: requests.PreparedRequest, signal_at: float, label: str, entry_of: int | None = None) -> bool:
+    """Sends one order. Returns True if it was accepted; an accepted entry is recorded under `entry_of` (its log id)."""
+    entry = _session(account)
+    if entry is None:
+        print(f"[{account}] {label} not sent: account is logged out.")
+        return False
+    if not upstox_api.get_bucket(entry["token"]).acquire(ORDER_MAX_RATE_WAIT_SECONDS):
+        print(f"[{account}] {label} not sent: rate limit reached.")
+        return False
+    try:
+        response = entry["session"].send(request, timeout=ORDER_TIMEOUT_SECONDS)
+    except requests.exceptions.RequestException as e:
+        print(f"[{account}] {label} failed: {e}")
+        _recent_orders.append({"account": account, "order": label, "status": "error", "error": str(e)})
+        return False
+    entry["last_used"] = time.monotonic()
+    ack_ms = (time.perf_counter() - signal_at) * 1000
+    _ack_latency.setdefault(account, deque(maxlen=LATENCY_SAMPLES)).append(ack_ms)
+    try:
+        data = response.json()
+    except ValueError:
+        data = {}
+    order_id = (data.get("data") or {}).get("order_id") if response.status_code == 200 else None
+    _recent_orders.append({"account": account, "order": label, "status": response.status_code,
+                           "order_id": order_id, "ack_ms": round(ack_ms, 2)})
+    print(f"[{account}] {label}: HTTP {response.status_code}, order {order_id}, {ack_ms:.1f} ms after the signal.")
+    if order_id and entry_of is not None:
+        with _lock:
+            _entered.setdefault(entry_of, set()).add(account)
+    return bool(order_id)
+
+def _send_after_entry(account: str, request: requests.PreparedRequest, signal_at: float, label: str, entry) -> bool:
+    # The entry was submitted to this pool before the exit, so it is already running (FIFO); wait for its answer
+    if not entry.result():
+        print(f"[{account}] {label} not sent: the entry order was not accepted.")
+        return False
+    return _send(account, request, signal_at, label)
+
+def fire(candidate: dict, side: str, settings: dict, signal_at: float | None = None) -> dict:
+    """
+    Submits the trade's orders, to be sent concurrently in the background. An entry (BUY) goes to the linked
+    accounts; an exit (SELL) only to the accounts whose entry of this trade was accepted, so an account whose
+    entry failed, or that was linked after the entry, never ends up short.
+    Returns {account: Future} of the submitted sends, each resolving to True if the order was accepted.
+    `signal_at` is the time.perf_counter() of the decision, for the signal-to-ack latency.
+    Uses the requests prepared while the candidate was pending, preparing them now if there are none.
+    """
+    if not candidate.get("instrument_key"):
+        return {}
+    signal_at = signal_at or time.perf_counter()
+    log_id = candidate.get("log_id")
+    label = f"{side} {candidate['instrument_key']}"
+    if side == "SELL":
+        # Snapshot the entries still in flight before the accepted ones: an entry that finishes in between is in both
+        in_flight = {account: future for account, future in _entry_sends.pop(log_id, {}).items() if not future.done()}
+        with _lock:
+            entered = _entered.pop(log_id, set()) | set(in_flight)
+        prepared = _prepared.pop((log_id, side), {})
+        if not entered:
+            return {}
+        for account in sorted(set(prepared) - entered):
+            print(f"[{account}] {label} not sent: this account has no accepted entry for the trade.")
+        prepared = {account: request for account, request in prepared.items() if account in entered}
+        # Including accounts unlinked since the entry: they still hold the position
+        prepared.update(_build_requests(entered - set(prepared), candidate, side, settings))
+        for account in sorted(entered - set(prepared)):
+            print(f"[{account}] {label} not sent: account is logged out.")
+        # A prepared request may only be sent once; copies keep the prebuilt body and headers
+        return {account: _pool.submit(_send_after_entry, account, request.copy(), signal_at, label, in_flight[account])
+                if account in in_flight else _pool.submit(_send, account, request.copy(), signal_at, label)
+                for account, request in prepared.items()}
+    if not linked_accounts(settings):
+        return {}
+    if (log_id, side) not in _prepared:
+        prepare(candidate, side, settings)
+    futures = {account: _pool.submit(_send, account, request.copy(), signal_at, label, log_id)
+               for account, request in _prepared.pop((log_id, side), {}).items()}
+    _entry_sends[log_id] = futures
+    return futures
+
+def discard(candidate: dict):
+    """Drops the prepared requests of a candidate that was replaced or expired."""
+    for side in ("BUY", "SELL"):
+        _prepared.pop((candidate.get("log_id"), side), None)
+
+def get_status(settings: dict) -> dict:
+    """Linked accounts, their session state and signal-to-ack latency (p50/p95 ms), and the latest orders."""
+    now = time.monotonic()
+    accounts = {}
+    for account in linked_accounts(settings):
+        entry = _sessions.get(account)
+        samples = np.fromiter(_ack_latency.get(account, ()), dtype=float)
+        accounts[account] = {
+            "logged_in": bool((app_state["users"].get(account) or {}).get("access_token")),
+            "session_idle_seconds": round(now - entry["last_used"], 1) if entry and entry["last_used"] else None,
+            "orders": len(samples),
+            "ack_p50_ms": round(float(np.percentile(samples, 50)), 2) if len(samples) else None,
+            "ack_p95_ms": round(float(np.percentile(samples, 95)), 2) if len(samples) else None,
+        }
+    return {"accounts": accounts, "recent_orders": list(_recent_orders)}
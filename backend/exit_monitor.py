@@ -0,0 +1,122 @@
+import threading
+import time
+from . import database
+from . import logic
+from . import market_data
+from . import pipeline
+
+# If the stream has been silent for this long it is treated as dropped and REST polling takes over.
+STREAM_STALE_SECONDS = 3
+# How often the fallback poller fetches the contract's LTP while the stream is down.
+POLL_INTERVAL_SECONDS = 1
+# How often the cached strategy settings are refreshed from the database.
+SETTINGS_REFRESH_SECONDS = 5
+
+class ExitMonitor:
+    """
+    Watches a single active trade and evaluates logic.check_exit_conditions on every price update.
+    Updates come from the streaming feed for the traded contract only; while the stream is down
+    the contract's LTP is polled over REST instead.
+    """
+
+    def __init__(self, user_name: str, user_state: dict, candidate: dict, on_exit):
+        self.user_name = user_name
+        self.user_state = user_state
+        self.candidate = candidate
+        self.instrument_key = candidate["instrument_key"]
+        self.on_exit = on_exit
+        self.settings = database.get_settings()
+        self.last_update = None
+        self._settings_refreshed = time.monotonic()
+        self._stop = threading.Event()
+        self._stop_lock = threading.Lock()
+        self._feed = market_data.get_feed(user_state.get("access_token"))
+        self._thread = threading.Thread(target=self._run, daemon=True, name=f"exit_monitor_{user_name}")
+
+    def start(self):
+        self._feed.subscribe(self.instrument_key, self._on_update, initial_price=self.candidate.get("signal_premium"))
+        self._thread.start()
+        print(f"[{self.user_name}] Exit monitor started for {self.instrument_key}.")
+
+    def stop(self) -> bool:
+        """Stops the monitor. Returns True for the call that stopped it (the stream and poller may race)."""
+        with self._stop_lock:
+            if self._stop.is_set():
+                return False
+            self._stop.set()
+        self._feed.unsubscribe(self.instrument_key)
+        print(f"[{self.user_name}] Exit monitor stopped for {self.instrument_key}.")
+        return True
+
+    def is_streaming(self) -> bool:
+        """True while the feed is connected and has delivered an update recently."""
+        return (
+            self._feed.is_connected()
+            and self.last_update is not None
+            and time.monotonic() - self.last_update < STREAM_STALE_SECONDS
+        )
+
+    def _on_update(self, instrument_key: str, ltp: float):
+        if instrument_key != self.instrument_key:
+            return
+        self.last_update = time.monotonic()
+        self._evaluate(ltp)
+
+    def _evaluate(self, ltp: float):
+        if self._stop.is_set():
+            return
+        candidate = self.user_state.get("candidate_setup")
+        if candidate is not self.candidate or candidate.get("status") != "ENTRY_APPROVED":
+            # The trade was closed elsewhere (or replaced); nothing left to watch.
+            self.stop()
+            return
+
+        started = time.perf_counter()
+        # The LTP is live, but the smoothed Greeks come from the chain poll; ignore them once those ticks are stale.
+        max_age = float(self.settings.get("max_tick_age_seconds", pipeline.DEFAULT_MAX_TICK_AGE_SECONDS))
+        greeks = {} if pipeline.is_tick_stale(self.user_state, time.time(), max_age) else self.user_state.get("exit_greeks", {})
+        exit_reason = logic.check_exit_conditions(candidate, ltp, greeks, self.settings)
+        pipeline.record_stage(self.user_state, "exit_check_ms", started)
+        # Only the evaluation that stops the monitor reports the exit
+        if exit_reason and self.stop():
+            self.on_exit(self.user_name, candidate, exit_reason)
+
+    def _run(self):
+        while not self._stop.wait(POLL_INTERVAL_SECONDS):
+            if time.monotonic() - self._settings_refreshed >= SETTINGS_REFRESH_SECONDS:
+                self.settings = database.get_settings()
+                self._settings_refreshed = time.monotonic()
+
+            if self.is_streaming():
+                continue
+
+            # --- Fallback: the stream dropped, poll the contract directly ---
+            ltp = market_data.fetch_ltp(self.user_state.get("access_token"), self.instrument_key)
+            if ltp is not None:
+                self._evaluate(ltp)
+
+def start_exit_monitor(user_name: str, user_state: dict, on_exit):
+    """
+    Starts an exit monitor for the user's ENTRY_APPROVED candidate, replacing any previous one.
+    `on_exit(user_name, candidate, exit_reason)` is called once when an exit condition is met.
+    """
+    stop_exit_monitor(user_state)
+    candidate = user_state.get("candidate_setup")
+    if not candidate or not candidate.get("instrument_key"):
+        print(f"[{user_name}] No instrument key on the active trade; exits will use chain polling only.")
+        return
+    monitor = ExitMonitor(user_name, user_state, candidate, on_exit)
+    user_state["exit_monitor"] = monitor
+    monitor.start()
+
+def stop_exit_monitor(user_state: dict):
+    """Stops the user's exit monitor, if one is running."""
+    monitor = user_state.get("exit_monitor")
+    if monitor:
+        monitor.stop()
+    user_state["exit_monitor"] = None
+
+def is_streaming(user_state: dict) -> bool:
+    """True if the user's active trade is currently covered by a live stream."""
+    monitor = user_state.get("exit_monitor")
+    return bool(monitor and monitor.is_streaming())
@@ -0,0 +1,90 @@
+"""
+Streaming export of trade logs and recorded ticks as CSV or Parquet.
+
+Rows are read in chunks (see database.iter_logs and tick_store.iter_tick_rows) and encoded chunk by chunk,
+so memory use is the same for a day or a month. Parquet needs pyarrow (optional: pip install pyarrow),
+imported on the first Parquet export so starting the app doesn't pay for it; each chunk becomes a
+row group that is sent as soon as it's written. Between chunks the export yields the CPU for a moment,
+so a long export on the API thread pool doesn't slow down the tick pipeline.
+"""
+import csv
+import importlib.util
+import io
+import time
+
+FORMATS = ("csv", "parquet")
+MEDIA_TYPES = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+# Pause after every chunk, so an export never holds the GIL for long stretches.
+CHUNK_PAUSE_SECONDS = 0.002
+
+def check_format(fmt: str):
+    """Raises ValueError for a format that can't be exported here."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r}; use one of {', '.join(FORMATS)}")
+    if fmt == "parquet" and importlib.util.find_spec("pyarrow") is None:
+        raise ValueError("Parquet export needs pyarrow (pip install pyarrow); use format=csv")
+
+def _csv_chunks(columns: list, chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([name for name, _ in columns])
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+        time.sleep(CHUNK_PAUSE_SECONDS)
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+class _ChunkSink(io.RawIOBase):
+    """A write-only file that keeps what was written until it is drained, for streaming Parquet."""
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self) -> bytes:
+        data = b"".join(self.parts)
+        self.parts = []
+        return data
+
+def _arrow_type(declared: str):
+    import pyarrow
+    declared = (declared or "").upper()
+    if "INT" in declared:
+        return pyarrow.int64()
+    if "REAL" in declared or "FLOA" in declared or "DOUB" in declared:
+        return pyarrow.float64()
+    return pyarrow.string()
+
+def _parquet_chunks(columns: list, chunks):
+    import pyarrow
+    import pyarrow.parquet
+    schema = pyarrow.schema([(name, _arrow_type(declared)) for name, declared in columns])
+    sink = _ChunkSink()
+    with pyarrow.parquet.ParquetWriter(sink, schema, compression="zstd") as writer:
+        for rows in chunks:
+            arrays = [pyarrow.array(values, type=field.type) for values, field in zip(zip(*rows), schema)]
+            writer.write_table(pyarrow.Table.from_arrays(arrays, schema=schema))
+            yield sink.drain()
+            time.sleep(CHUNK_PAUSE_SECONDS)
+    yield sink.drain()  # The footer
+
+def encode(fmt: str, columns: list, chunks):
+    """
+    Encodes chunks of row tuples as a stream of bytes. `columns` is [(name, declared SQLite type)].
+    Call check_format first.
+    """
+    return _csv_chunks(columns, chunks) if fmt == "csv" else _parquet_chunks(columns, chunks)
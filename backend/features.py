@@ -0,0 +1,125 @@
+"""
+Per-tick feature store.
+
+Every value the strategy derives from the buffers is computed once per tick, right after the fetch, into
+an immutable FeatureVector:
+- the latest readings;
+- the smoothed Greek trends (30s and 60s) of the monitored contract and of the candidate's contract;
+- the candle ATR and body ratio used for the market type.
+
+The Greek confirmation, the logic controller, the shadow configs and the API read the vector instead of
+recomputing from the buffers. Every vector has a unique, increasing version. A vector for a new candle
+(computed after the candle stage) is a copy with the candle features refreshed and a new version.
+"""
+import itertools
+import time
+from typing import NamedTuple
+from . import calculations
+from . import greek_series
+
+# Smoothing windows of the Greek trends: entry confirmation uses the first, exit checks the second.
+ENTRY_WINDOW_SECONDS = 30
+EXIT_WINDOW_SECONDS = 60
+WINDOWS = (ENTRY_WINDOW_SECONDS, EXIT_WINDOW_SECONDS)
+
+class FeatureVector(NamedTuple):
+    version: int = 0
+    computed_at: float = 0.0
+    tick_time: float | None = None     # Epoch time of the tick the vector was computed from
+    candle_time: str | None = None     # Timestamp of the newest 5-min candle included
+    price: float | None = None
+    premium: float | None = None
+    delta: float | None = None
+    gamma: float | None = None
+    theta: float | None = None
+    iv: float | None = None
+    monitored_strike: float | None = None
+    greeks: dict = {}                  # strike -> {window: calculations.smoothed_greeks features}
+    market_type_window_size: int = 3
+    atr: float = 0.0
+    body_ratio_avg: float = 0.0
+
+    def contract_greeks(self, strike: float | None, window: int) -> dict | None:
+        """Smoothed Greeks of a contract (None: the monitored one), or None if it wasn't in play this tick."""
+        by_window = self.greeks.get(self.monitored_strike if strike is None else strike)
+        return by_window[window] if by_window else None
+
+    def to_dict(self) -> dict:
+        """JSON-ready form, with NaN (not enough data) as None."""
+        features = self._asdict()
+        features["greeks"] = {
+            str(strike): {window: {name: None if value != value else value for name, value in values.items()}
+                          for window, values in by_window.items()}
+            for strike, by_window in self.greeks.items()
+        }
+        return features
+
+EMPTY_FEATURES = FeatureVector()
+
+# Versions are unique across users, threads and restarts (they start from the clock), like snapshot versions.
+_versions = itertools.count(int(time.time() * 1000))
+
+def _latest(buffer):
+    return buffer[-1] if buffer else None
+
+def _candle_features(candles, window_size: int) -> dict:
+    return {
+        "candle_time": candles[-1][0] if candles else None,
+        "market_type_window_size": window_size,
+        "atr": calculations.calculate_atr(candles, period=window_size),
+        "body_ratio_avg": calculations.calculate_average_body_ratio(candles, window_size=window_size),
+    }
+
+def compute_features(user_state: dict, settings: dict, now: float | None = None) -> FeatureVector:
+    """Computes and stores the features of the user's latest tick. Must run in the thread that writes the buffers."""
+    now = now or time.time()
+    monitored_strike = user_state.get("monitored_strike")
+    strikes = {monitored_strike}
+    candidate = user_state.get("candidate_setup")
+    if candidate and candidate.get("strike_price") is not None:
+        strikes.add(candidate["strike_price"])
+    greeks = {strike: calculations.smoothed_greeks(greek_series.contract_history(user_state, strike, now), WINDOWS)
+              for strike in strikes}
+    vector = FeatureVector(
+        version=next(_versions),
+        computed_at=now,
+        tick_time=_latest(user_state["tick_time_buffer"]),
+        price=_latest(user_state["price_buffer"]),
+        premium=_latest(user_state["premium_buffer"]),
+        delta=_latest(user_state["delta_buffer"]),
+        gamma=_latest(user_state["gamma_buffer"]),
+        theta=_latest(user_state["theta_buffer"]),
+        iv=_latest(user_state["iv_buffer"]),
+        monitored_strike=monitored_strike,
+        greeks=greeks,
+        **_candle_features(user_state["candles_5min_buffer"], int(settings.get("market_type_window_size", 3))),
+    )
+    user_state["features"] = vector
+    return vector
+
+def refresh_candle_features(user_state: dict, settings: dict) -> FeatureVector:
+    """Publishes a new version of the features with the candle features recomputed (after a candle closes)."""
+    vector = (user_state.get("features") or EMPTY_FEATURES)._replace(
+        version=next(_versions),
+        computed_at=time.time(),
+        **_candle_features(user_state["candles_5min_buffer"], int(settings.get("market_type_window_size", 3))),
+    )
+    user_state["features"] = vector
+    return vector
+
+def current_features(user_state: dict, settings: dict) -> FeatureVector:
+    """
+    Returns the features of the user's latest tick and candle, computing them only if the stored vector
+    is behind (e.g. a job run outside the tick pipeline, or the candidate moved to another contract).
+    """
+    vector = user_state.get("features")
+    candidate = user_state.get("candidate_setup") or {}
+    if (vector is None or vector.tick_time != _latest(user_state["tick_time_buffer"])
+            or vector.monitored_strike != user_state.get("monitored_strike")
+            or (candidate.get("strike_price") is not None and candidate["strike_price"] not in vector.greeks)):
+        return compute_features(user_state, settings)
+    candles = user_state["candles_5min_buffer"]
+    if (vector.candle_time != (candles[-1][0] if candles else None)
+            or vector.market_type_window_size != int(settings.get("market_type_window_size", 3))):
+        return refresh_candle_features(user_state, settings)
+    return vector
@@ -0,0 +1,182 @@
+"""
+Paper-trading fill simulator.
+
+Orders are marketable (they take liquidity): a BUY lifts the ask, a SELL hits the bid. The chain only
+shows the top of the book, so quantity beyond the displayed size is assumed to sit in further levels of
+the same size, one tick apart. On top of that, a configurable number of ticks of slippage is charged.
+An order reaches the market `latency_ms` after the decision and fills against the first quote observed
+at or after that moment, so a fill never uses prices the strategy couldn't have seen in time.
+
+The same PaperBroker fills live paper orders (fed every fetched chain) and replays recorded ticks:
+
+    python -m backend.fills --replay-shadow [--latency-ms 250] [--slippage-ticks 1] [--quantity 75]
+"""
+import datetime
+import threading
+from typing import NamedTuple
+import numpy as np
+
+# NSE option prices move in steps of 5 paise.
+TICK_SIZE = 0.05
+# Orders that still can't be filled this long after reaching the market (e.g. the strike left the chain) are dropped.
+MAX_PENDING_SECONDS = 300
+
+class Fill(NamedTuple):
+    order_id: object
+    side: str
+    quantity: int
+    price: float          # Average fill price, slippage included
+    reference_price: float  # LTP of the contract in the quote it filled against
+    quote_ts: float       # fetched_at of that quote
+    source: str           # "book" (bid/ask and depth) or "ltp" (no quote on that side; LTP plus slippage)
+
+def fill_prices(buy: np.ndarray, quantity: np.ndarray, bid: np.ndarray, ask: np.ndarray, bid_qty: np.ndarray,
+                ask_qty: np.ndarray, ltp: np.ndarray, slippage_ticks: np.ndarray) -> tuple:
+    """
+    Average prices of marketable orders, vectorized over orders.
+    Returns (prices, sources), where sources is True for fills priced from the book.
+    A price is NaN if neither the book side nor an LTP is available.
+    """
+    touch = np.where(buy, ask, bid)
+    depth = np.where(buy, ask_qty, bid_qty)
+    from_book = (touch > 0) & (depth > 0)
+    depth = np.where(from_book, depth, quantity)
+    touch = np.where(from_book, touch, np.where(ltp > 0, ltp, np.nan))
+
+    # Walk the (extrapolated) book: full levels of `depth` at touch, touch + 1 tick, ..., then the remainder
+    full_levels = np.floor(quantity / depth)
+    remainder = quantity - full_levels * depth
+    ticks_walked = (depth * full_levels * (full_levels - 1) / 2 + remainder * full_levels) / quantity
+    direction = np.where(buy, 1.0, -1.0)
+    prices = touch + direction * (ticks_walked + slippage_ticks) * TICK_SIZE
+    # Round to the tick against the trader, and never below one tick
+    prices = np.where(buy, np.ceil(prices / TICK_SIZE - 1e-9), np.floor(prices / TICK_SIZE + 1e-9)) * TICK_SIZE
+    return np.maximum(np.round(prices, 2), TICK_SIZE), from_book
+
+class PaperBroker:
+    """
+    Holds submitted paper orders until a quote at or after their arrival time comes in, then fills
+    all of them against it in one vectorized pass. Feed it chains in time order (live or replayed).
+    Orders may be submitted from another thread (the streaming exit monitor) while chains are fed.
+    """
+
+    def __init__(self):
+        self.pending = []
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        return {"pending": self.pending}
+
+    def __setstate__(self, state):
+        self.pending = state["pending"]
+        self._lock = threading.Lock()
+
+    def submit(self, order_id, strike: float, side: str, quantity: int, decided_at: float,
+               latency_ms: float = 0, slippage_ticks: float = 0):
+        order = {
+            "order_id": order_id, "strike": strike, "side": side, "quantity": quantity,
+            "arrives_at": decided_at + latency_ms / 1000, "slippage_ticks": slippage_ticks,
+        }
+        with self._lock:
+            self.pending.append(order)
+
+    def on_chain(self, chain) -> list:
+        """Fills the orders that have reached the market by this chain (a chain_store.OptionChain). Returns the fills."""
+        if not self.pending:
+            return []
+        with self._lock:
+            due = [order for order in self.pending if order["arrives_at"] <= chain.fetched_at]
+            self.pending = [order for order in self.pending if order["arrives_at"] > chain.fetched_at]
+        if not due:
+            return []
+        records = chain.records
+        strikes = np.array([order["strike"] for order in due], dtype=float)
+        index = np.searchsorted(records["strike"], strikes)
+        in_chain = index < len(records)
+        in_chain[in_chain] = records["strike"][index[in_chain]] == strikes[in_chain]
+        index = np.where(in_chain, index, 0)
+        quote = {name: np.where(in_chain, records[name][index] if len(records) else np.nan, np.nan)
+                 for name in ("call_bid", "call_ask", "call_bid_qty", "call_ask_qty", "call_ltp")}
+
+        buy = np.array([order["side"] == "BUY" for order in due])
+        quantity = np.array([order["quantity"] for order in due], dtype=float)
+        slippage = np.array([order["slippage_ticks"] for order in due], dtype=float)
+        prices, from_book = fill_prices(buy, quantity, quote["call_bid"], quote["call_ask"], quote["call_bid_qty"],
+                                        quote["call_ask_qty"], quote["call_ltp"], slippage)
+
+        fills, unfilled = [], []
+        for order, price, book, ltp in zip(due, prices.tolist(), from_book.tolist(), quote["call_ltp"].tolist()):
+            if price == price:
+                fills.append(Fill(order["order_id"], order["side"], order["quantity"], price,
+                                  None if ltp != ltp else ltp, chain.fetched_at, "book" if book else "ltp"))
+            elif chain.fetched_at - order["arrives_at"] < MAX_PENDING_SECONDS:
+                unfilled.append(order)
+            else:
+                print(f"Paper order {order['order_id']} ({order['side']} {order['strike']}) could not be filled; dropped.")
+        if unfilled:
+            with self._lock:
+                self.pending = unfilled + self.pending
+        return fills
+
+def replay(orders: list, chains, latency_ms: float, slippage_ticks: float) -> list:
+    """
+    Fills historical orders against recorded chains (oldest first). Each order is a dict with order_id,
+    strike, side, quantity and decided_at. Returns the fills.
+    """
+    broker = PaperBroker()
+    orders = sorted(orders, key=lambda order: order["decided_at"])
+    fills = []
+    next_order = 0
+    for chain in chains:
+        while next_order < len(orders) and orders[next_order]["decided_at"] <= chain.fetched_at:
+            order = orders[next_order]
+            broker.submit(order["order_id"], order["strike"], order["side"], order["quantity"], order["decided_at"],
+                          latency_ms, slippage_ticks)
+            next_order += 1
+        fills.extend(broker.on_chain(chain))
+        if next_order == len(orders) and not broker.pending:
+            break
+    return fills
+
+def _replay_shadow_ledger(latency_ms: float, slippage_ticks: float, quantity: int):
+    """Re-prices the closed shadow paper trades with simulated fills and compares them with LTP prices."""
+    from . import database, tick_store, upstox_api
+    trades = [t for t in database.get_shadow_trades() if t["status"] == "CLOSED" and t["strike_price"] is not None]
+    if not trades:
+        print("No closed shadow trades with a strike to replay.")
+        return
+    orders = []
+    for trade in trades:
+        for side, field in (("BUY", "timestamp"), ("SELL", "closed_at")):
+            orders.append({"order_id": (trade["id"], side), "strike": trade["strike_price"], "side": side,
+                           "quantity": quantity, "decided_at": datetime.datetime.fromisoformat(trade[field]).timestamp()})
+    since = min(order["decided_at"] for order in orders)
+    chains = tick_store.iter_chains(upstox_api.NIFTY_INSTRUMENT_KEY, since)
+    fill_price = {fill.order_id: fill.price for fill in replay(orders, chains, latency_ms, slippage_ticks)}
+
+    summary = {}
+    for trade in trades:
+        entry, exit_ = fill_price.get((trade["id"], "BUY")), fill_price.get((trade["id"], "SELL"))
+        totals = summary.setdefault(trade["config_name"], {"trades": 0, "ltp_points": 0.0, "fill_points": 0.0, "unfilled": 0})
+        totals["trades"] += 1
+        totals["ltp_points"] += trade["exit_price"] - trade["entry_price"]
+        if entry is None or exit_ is None:
+            totals["unfilled"] += 1
+        else:
+            totals["fill_points"] += exit_ - entry
+    for config_name, totals in sorted(summary.items(), key=lambda item: -item[1]["fill_points"]):
+        print(f"{config_name}: {totals['trades']} trades, {totals['ltp_points']:.2f} points at LTP, "
+              f"{totals['fill_points']:.2f} with fills ({totals['unfilled']} without ticks to fill against)")
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Replays paper trades against recorded ticks with simulated fills.")
+    parser.add_argument("--replay-shadow", action="store_true", help="re-price the closed shadow trades")
+    parser.add_argument("--latency-ms", type=float, default=250)
+    parser.add_argument("--slippage-ticks", type=float, default=1)
+    parser.add_argument("--quantity", type=int, default=75)
+    args = parser.parse_args()
+    if args.replay_shadow:
+        _replay_shadow_ledger(args.latency_ms, args.slippage_ticks, args.quantity)
+    else:
+        parser.print_help()
@@ -0,0 +1,135 @@
+import os
+import threading
+import numpy as np
+
+# Per-strike columns kept for the whole chain.
+FIELDS = (
+    "call_ltp", "call_delta", "call_gamma", "call_theta", "call_iv",
+    "put_ltp", "put_delta", "put_gamma", "put_theta", "put_iv",
+)
+# Samples kept per strike (a ring); 2048 covers a full session at the default 10s interval.
+CAPACITY = int(os.getenv("GREEK_SERIES_CAPACITY", "2048"))
+# Chains arriving closer together than this (several users polling) are recorded once.
+MIN_SAMPLE_INTERVAL_SECONDS = 2.5
+
+class StrikeSeries:
+    """
+    Time series of every strike's premium and Greeks for one instrument and expiry.
+    Values are float32 in a (field, sample, strike) ring, indexed by strike, so following one contract
+    is a column lookup. New strikes get a column the first time they appear.
+    Written by whichever tick pipeline fetched a chain; both writes and reads hold the lock (a read only copies a slice).
+    """
+
+    def __init__(self, capacity: int = CAPACITY):
+        self.capacity = capacity
+        self.strikes = np.empty(0)
+        self.data = np.full((len(FIELDS), capacity, 0), np.nan, dtype=np.float32)
+        self.times = np.zeros(capacity)
+        self.count = 0  # Samples appended so far; the newest is at (count - 1) % capacity
+        self._lock = threading.Lock()
+
+    def _columns(self, strikes: np.ndarray) -> np.ndarray:
+        missing = np.setdiff1d(strikes, self.strikes)
+        if missing.size:
+            new_strikes = np.union1d(self.strikes, missing)
+            new_data = np.full((len(FIELDS), self.capacity, len(new_strikes)), np.nan, dtype=np.float32)
+            new_data[:, :, np.searchsorted(new_strikes, self.strikes)] = self.data
+            self.data, self.strikes = new_data, new_strikes
+        return np.searchsorted(self.strikes, strikes)
+
+    def append(self, chain) -> bool:
+        """Records a chain_store.OptionChain as one sample. Returns False if it was too close to the last one."""
+        with self._lock:
+            if self.count and chain.fetched_at - self.times[(self.count - 1) % self.capacity] < MIN_SAMPLE_INTERVAL_SECONDS:
+                return False
+            columns = self._columns(chain.records["strike"])
+            row = self.count % self.capacity
+            self.data[:, row, :] = np.nan  # Strikes missing from this chain have no value at this time
+            for i, field in enumerate(FIELDS):
+                self.data[i, row, columns] = chain.records[field]
+            self.times[row] = chain.fetched_at
+            self.count += 1
+            return True
+
+    def has_strike(self, strike: float) -> bool:
+        index = np.searchsorted(self.strikes, strike)
+        return index < len(self.strikes) and self.strikes[index] == strike
+
+    def window(self, strike: float, since_ts: float, until_ts: float = float("inf")) -> dict | None:
+        """
+        Returns one strike's samples with since_ts <= ts < until_ts, oldest first, as
+        {"ts": [...], "call_delta": [...], ...} with None where the strike had no value.
+        Returns None if the strike has never been seen.
+        """
+        with self._lock:
+            column = np.searchsorted(self.strikes, strike)
+            if column >= len(self.strikes) or self.strikes[column] != strike:
+                return None
+            rows = np.arange(max(0, self.count - self.capacity), self.count) % self.capacity
+            times = self.times[rows]
+            rows = rows[(times >= since_ts) & (times < until_ts)]
+            times = self.times[rows]
+            values = self.data[:, rows, column]  # Fancy indexing copies, so the ring can move on
+        window = {"ts": times.tolist()}
+        for i, field in enumerate(FIELDS):
+            window[field] = [None if v != v else v for v in values[i].astype(float).tolist()]
+        return window
+
+# --- Store: one series per instrument, for the current expiry ---
+_series = {}
+_store_lock = threading.Lock()
+
+def get_series(instrument_key: str, expiry: str) -> StrikeSeries | None:
+    return _series.get((instrument_key, expiry))
+
+def record_chain(chain) -> StrikeSeries:
+    """Appends a freshly fetched chain to its instrument's series, starting a new one on a new expiry."""
+    key = (chain.instrument_key, chain.expiry)
+    with _store_lock:
+        series = _series.get(key)
+        if series is None:
+            # The previous expiry's series is no longer needed
+            for old_key in [k for k in _series if k[0] == chain.instrument_key]:
+                del _series[old_key]
+            series = _series[key] = StrikeSeries()
+    series.append(chain)
+    return series
+
+# --- Contract buffers ---
+# The user's buffers that follow the monitored contract, and the series field each one is filled from.
+CONTRACT_BUFFER_FIELDS = {
+    "premium_buffer": "call_ltp",
+    "delta_buffer": "call_delta",
+    "gamma_buffer": "call_gamma",
+    "theta_buffer": "call_theta",
+    "iv_buffer": "call_iv",
+    "tick_time_buffer": "ts",
+}
+# How far back a contract's history is looked up when the monitored strike rolls.
+HISTORY_SECONDS = 600
+
+def refill_contract_buffers(user_state: dict, chain, strike: float):
+    """
+    Replaces the contract buffers with `strike`'s recorded history from before this chain, so that after
+    the monitored strike rolls the buffers (and the smoothing on them) never mix two contracts.
+    """
+    series = get_series(chain.instrument_key, chain.expiry)
+    window = series.window(strike, chain.fetched_at - HISTORY_SECONDS, until_ts=chain.fetched_at) if series else None
+    for buffer_name, field in CONTRACT_BUFFER_FIELDS.items():
+        buffer = user_state[buffer_name]
+        buffer.clear()
+        if window:
+            buffer.extend(window[field])
+
+def contract_history(user_state: dict, strike: float | None, now: float) -> dict:
+    """
+    Returns {buffer name: values} of a contract's recent premium/Greek history, oldest first.
+    The user's buffers are used while they follow that contract; otherwise (the monitored strike has
+    rolled away from a candidate's or trade's strike) its history comes from the series store.
+    """
+    if strike is None or strike == user_state.get("monitored_strike"):
+        return {buffer_name: user_state[buffer_name] for buffer_name in CONTRACT_BUFFER_FIELDS}
+    chain = user_state.get("option_chain")
+    series = get_series(chain.instrument_key, chain.expiry) if chain is not None else None
+    window = series.window(strike, now - HISTORY_SECONDS) if series else None
+    return {buffer_name: window[field] if window else [] for buffer_name, field in CONTRACT_BUFFER_FIELDS.items()}
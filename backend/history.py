@@ -0,0 +1,157 @@
+"""
+Downsampled history of recorded ticks, for charts.
+
+A query asks for one series (e.g. call_delta) of an instrument over a time range, for one strike or all
+of them, at a number of points. It is answered from the coarsest tick_store rollup that still has enough
+buckets for that many points, or from the raw ticks for short ranges, and then downsampled with:
+    lttb    Largest-Triangle-Three-Buckets: keeps the points that carry the shape of the line
+    minmax  the min and max of each equal-width time bucket (a pixel column): never hides a spike
+A rollup bucket enters the downsampling as its first, min, max and last values (min and max ordered by
+whether the bucket rose or fell), so both methods still see the extremes of the raw ticks.
+All strikes are downsampled together, as the rows of one (strike, time) matrix.
+
+    python -m backend.history --rebuild-rollups   # after upgrading a store recorded without rollups
+"""
+import numpy as np
+from . import tick_store
+
+METHODS = ("lttb", "minmax")
+SERIES = tick_store.ROLLUP_SERIES
+MIN_POINTS = 10
+MAX_POINTS = 5000
+# Where a rollup bucket's first/min-or-max/max-or-min/last values are placed within the bucket.
+ROLLUP_OFFSETS = np.array([0.0, 0.3, 0.6, 0.9])
+
+def check_query(series: str, method: str, points: int):
+    """Raises ValueError for an unknown series or method, or an unreasonable number of points."""
+    if series not in SERIES:
+        raise ValueError(f"Unknown series {series!r}; use one of {', '.join(SERIES)}")
+    if method not in METHODS:
+        raise ValueError(f"Unknown method {method!r}; use one of {', '.join(METHODS)}")
+    if not MIN_POINTS <= points <= MAX_POINTS:
+        raise ValueError(f"points must be between {MIN_POINTS} and {MAX_POINTS}")
+
+def choose_resolution(span_seconds: float, points: int) -> int | None:
+    """The coarsest rollup resolution with at least points/4 buckets in the span (None: use the raw ticks)."""
+    chosen = None
+    for resolution in tick_store.ROLLUP_RESOLUTIONS:
+        if span_seconds / resolution >= points / 4:
+            chosen = resolution
+    return chosen
+
+# --- Loading into a (strike, time) matrix ---
+
+def _raw_matrix(rows: list) -> tuple:
+    ts, strikes, values = (np.array(column, dtype=float) for column in zip(*rows))
+    times, column = np.unique(ts, return_inverse=True)
+    strike_values, row = np.unique(strikes, return_inverse=True)
+    matrix = np.full((len(strike_values), len(times)), np.nan)
+    matrix[row, column] = values
+    return strike_values, times, matrix
+
+def _rollup_matrix(rows: list, resolution: int, strike: float | None) -> tuple:
+    buckets = np.array([row[0] for row in rows], dtype=float)
+    strikes, first, low, high, last = (np.concatenate(column) for column in list(zip(*rows))[1:])
+    column = np.repeat(np.arange(len(rows)), [len(row[1]) for row in rows])
+    if strike is not None:
+        keep = strikes == strike
+        strikes, first, low, high, last, column = (array[keep] for array in (strikes, first, low, high, last, column))
+    strike_values, row = np.unique(strikes, return_inverse=True)
+    falling = last < first
+    matrix = np.full((len(strike_values), len(buckets), len(ROLLUP_OFFSETS)), np.nan)
+    matrix[row, column] = np.column_stack([first, np.where(falling, high, low), np.where(falling, low, high), last])
+    times = (buckets[:, None] + ROLLUP_OFFSETS * resolution).ravel()
+    return strike_values, times, matrix.reshape(len(strike_values), -1)
+
+# --- Downsampling: each returns, per strike, the columns to keep (-1 for none) ---
+
+def _minmax(times: np.ndarray, matrix: np.ndarray, since_ts: float, until_ts: float, points: int) -> np.ndarray:
+    buckets = max(points // 2, 1)
+    width = (until_ts - since_ts) / buckets
+    index = np.minimum(((times - since_ts) // width).astype(int), buckets - 1)
+    starts = np.flatnonzero(np.r_[True, index[1:] != index[:-1]])  # Non-empty buckets (times are sorted)
+    counts = np.diff(np.r_[starts, len(times)])
+    columns = np.arange(len(times))
+    missing = np.isnan(matrix)
+    low = np.where(missing, np.inf, matrix)
+    high = np.where(missing, -np.inf, matrix)
+    # The first column holding each bucket's min (max); -1 where the bucket has no value
+    low_at = np.minimum.reduceat(np.where(low == np.repeat(np.minimum.reduceat(low, starts, axis=1), counts, axis=1), columns, len(times)), starts, axis=1)
+    high_at = np.minimum.reduceat(np.where(high == np.repeat(np.maximum.reduceat(high, starts, axis=1), counts, axis=1), columns, len(times)), starts, axis=1)
+    picks = np.sort(np.concatenate([low_at, high_at], axis=1), axis=1)
+    picks[(picks == len(times)) | missing[np.arange(len(matrix))[:, None], np.minimum(picks, len(times) - 1)]] = -1
+    return picks
+
+def _lttb(times: np.ndarray, matrix: np.ndarray, points: int) -> np.ndarray:
+    strikes, n = matrix.shape
+    present = ~np.isnan(matrix)
+    if n <= points:
+        return np.where(present, np.arange(n), -1)
+    rows = np.arange(strikes)
+    first = present.argmax(axis=1)
+    last = n - 1 - present[:, ::-1].argmax(axis=1)
+    picks = np.full((strikes, points), -1)
+    picks[:, 0], picks[:, -1] = first, last
+    # The point chosen last in each row (A); a strike's series may start later than others
+    a_t, a_y = times[first], matrix[rows, first]
+    edges = np.linspace(1, n - 1, points - 1).astype(int)  # points - 2 equal-count buckets between the ends
+    # C for each bucket: the average of the next bucket (the last point for the last bucket)
+    next_starts = np.r_[edges[1:-1], n - 1]
+    count = np.add.reduceat(present, next_starts, axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        c_ys = np.add.reduceat(np.where(present, matrix, 0.0), next_starts, axis=1) / count
+    c_ts = np.add.reduceat(times, next_starts) / np.diff(np.r_[next_starts, n])
+    for i in range(points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        c_y = np.where(count[:, i] > 0, c_ys[:, i], a_y)
+        area = np.abs((a_t - c_ts[i])[:, None] * (matrix[:, lo:hi] - a_y[:, None])
+                      - (a_t[:, None] - times[lo:hi]) * (c_y - a_y)[:, None])
+        pick = np.where(present[:, lo:hi], area, -1.0).argmax(axis=1) + lo
+        found = present[rows, pick] & (pick > first) & (pick < last)
+        picks[:, i + 1] = np.where(found, pick, -1)
+        a_t = np.where(found, times[pick], a_t)
+        a_y = np.where(found, matrix[rows, pick], a_y)
+    picks[~present.any(axis=1)] = -1
+    return picks
+
+# --- Queries ---
+
+def query(instrument_key: str, series: str, since_ts: float, until_ts: float, points: int = 500,
+          method: str = "lttb", strike: float | None = None) -> dict:
+    """
+    Returns about `points` points per strike of a recorded series with since_ts <= ts < until_ts:
+    {"resolution_seconds": rollup used (None: raw ticks), "strikes": {strike: {"ts": [...], "values": [...]}}, ...}
+    Raises ValueError for a bad series, method or point count.
+    """
+    check_query(series, method, points)
+    resolution = choose_resolution(until_ts - since_ts, points)
+    if resolution:
+        rows = tick_store.load_rollup(resolution, instrument_key, series, since_ts, until_ts)
+        strikes, times, matrix = _rollup_matrix(rows, resolution, strike) if rows else (np.empty(0), np.empty(0), None)
+    else:
+        rows = tick_store.load_series(instrument_key, series, since_ts, until_ts, strike)
+        strikes, times, matrix = _raw_matrix(rows) if rows else (np.empty(0), np.empty(0), None)
+
+    result = {"instrument_key": instrument_key, "series": series, "method": method, "since": since_ts,
+              "until": until_ts, "resolution_seconds": resolution, "strikes": {}}
+    if matrix is None or not len(strikes):
+        return result
+    if method == "lttb":
+        picks = _lttb(times, matrix, points)
+    else:
+        picks = _minmax(times, matrix, since_ts, until_ts, points)
+    for row, strike_value in enumerate(strikes.tolist()):
+        columns = np.unique(picks[row][picks[row] >= 0])
+        if columns.size:
+            result["strikes"][str(strike_value)] = {"ts": times[columns].tolist(), "values": matrix[row, columns].tolist()}
+    return result
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Maintains the tick store's history rollups.")
+    parser.add_argument("--rebuild-rollups", action="store_true", help="recompute the rollups from the recorded ticks")
+    args = parser.parse_args()
+    if args.rebuild_rollups:
+        tick_store.rebuild_rollups()
+    else:
+        parser.print_help()
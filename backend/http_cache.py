@@ -0,0 +1,53 @@
+import hashlib
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+# name -> (version_key, etag, last_modified epoch seconds, rendered JSON body). One entry per endpoint (and user).
+# HTTP dates have whole-second precision, so every version of an entry gets a distinct second (a version built
+# within the same second as the previous one is dated a second later), and If-Modified-Since must match exactly.
+_cache = {}
+
+def _etag(name: str, version_key) -> str:
+    digest = hashlib.sha1(repr((name, version_key)).encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+def _not_modified(request: Request, etag: str, last_modified: int) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return parsedate_to_datetime(if_modified_since).timestamp() == last_modified
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def versioned_json(request: Request, name: str, version_key, build) -> Response:
+    """
+    Serves a JSON response that only changes when `version_key` does (e.g. a snapshot version).
+    The body is built by `build()` at most once per version; a client that already has the
+    current version (If-None-Match / If-Modified-Since) gets 304 without anything being built.
+    """
+    entry = _cache.get(name)
+    if entry is None or entry[0] != version_key:
+        # Clients revalidate on every poll, so the first request of a new version pays for building it
+        body = JSONResponse(jsonable_encoder(build())).body
+        last_modified = int(time.time())
+        if entry is not None and last_modified <= entry[2]:
+            last_modified = entry[2] + 1
+        entry = (version_key, _etag(name, version_key), last_modified, body)
+        _cache[name] = entry
+    _, etag, last_modified, body = entry
+
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(last_modified, usegmt=True),
+        "Cache-Control": "no-cache",  # Always revalidate; a 304 is nearly free
+    }
+    if _not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
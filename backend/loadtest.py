@@ -0,0 +1,245 @@
+"""
+Load generator for the dashboard REST and WebSocket endpoints.
+
+Example (backend pointed at backend.mock_upstox, with LOAD0..LOAD4 credentials configured):
+    python -m backend.loadtest --base-url http://localhost:8000 --users load0,load1,load2,load3,load4 \
+        --login --ws-clients 300 --http-workers 32 --duration 60 --server-pid $(pgrep -f "uvicorn backend.main")
+
+It reports p50/p95/p99 latency per endpoint, WebSocket messages per second and the server's
+CPU/RSS, and saves the results as JSON under loadtest_results/ for comparison across versions
+(see --compare).
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import subprocess
+import threading
+import time
+from pathlib import Path
+import numpy as np
+import requests
+import websockets
+
+RESULTS_DIR = Path(__file__).resolve().parent.parent / "loadtest_results"
+
+def endpoint_paths(users: list) -> list:
+    """The (label, path) pairs hammered by the HTTP workers, round-robin."""
+    paths = [("status", "/api/status"), ("tradelogs", "/api/tradelogs")]
+    for user in users:
+        paths.append(("option-chain", f"/api/option-chain/{user}"))
+        paths.append(("signals", f"/api/signals?user_name={user}"))
+    return paths
+
+def percentiles(samples: list) -> dict:
+    if not samples:
+        return {"count": 0}
+    values = np.asarray(samples)
+    return {
+        "count": len(values),
+        "p50": round(float(np.percentile(values, 50)), 2),
+        "p95": round(float(np.percentile(values, 95)), 2),
+        "p99": round(float(np.percentile(values, 99)), 2),
+        "max": round(float(values.max()), 2),
+    }
+
+# --- HTTP workers ---
+
+def http_worker(base_url: str, paths: list, offset: int, stop: threading.Event, results: dict, lock: threading.Lock):
+    session = requests.Session()  # Keep-alive, like a browser tab polling the API
+    latencies, errors = {}, {}
+    i = offset
+    while not stop.is_set():
+        label, path = paths[i % len(paths)]
+        i += 1
+        started = time.perf_counter()
+        try:
+            response = session.get(f"{base_url}{path}", timeout=10)
+            ok = response.status_code in (200, 304)
+        except requests.exceptions.RequestException:
+            ok = False
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if ok:
+            latencies.setdefault(label, []).append(elapsed_ms)
+        else:
+            errors[label] = errors.get(label, 0) + 1
+    with lock:
+        for label, samples in latencies.items():
+            results["latencies"].setdefault(label, []).extend(samples)
+        for label, count in errors.items():
+            results["errors"][label] = results["errors"].get(label, 0) + count
+
+# --- WebSocket clients ---
+
+async def ws_client(url: str, deadline: float, stats: dict, protocol: str | None = None):
+    try:
+        started = time.perf_counter()
+        async with websockets.connect(url, open_timeout=10, subprotocols=[protocol] if protocol else None) as ws:
+            stats["connect_ms"].append((time.perf_counter() - started) * 1000)
+            last = None
+            while time.time() < deadline:
+                try:
+                    message = await asyncio.wait_for(ws.recv(), timeout=max(0.1, deadline - time.time()))
+                except asyncio.TimeoutError:
+                    break
+                now = time.perf_counter()
+                stats["messages"] += 1
+                stats["bytes"] += len(message)
+                if last is not None:
+                    stats["interval_ms"].append((now - last) * 1000)
+                last = now
+    except Exception as e:
+        stats["errors"] += 1
+        stats["last_error"] = repr(e)
+
+async def run_ws_clients(ws_base: str, users: list, count: int, duration: float, protocol: str | None = None) -> dict:
+    stats = {"messages": 0, "bytes": 0, "errors": 0, "connect_ms": [], "interval_ms": [], "last_error": None}
+    deadline = time.time() + duration
+    tasks = [ws_client(f"{ws_base}/api/ws/{users[i % len(users)]}", deadline, stats, protocol) for i in range(count)]
+    await asyncio.gather(*tasks)
+    return stats
+
+# --- Server resource sampling (Linux /proc) ---
+
+def sample_process(pid: int, stop: threading.Event, samples: list, interval: float = 1.0):
+    ticks_per_second = os.sysconf("SC_CLK_TCK")
+    last_cpu, last_time = None, None
+    while not stop.wait(interval):
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            cpu_seconds = (int(fields[11]) + int(fields[12])) / ticks_per_second  # utime + stime
+            with open(f"/proc/{pid}/status") as f:
+                rss_kb = next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+        except (OSError, StopIteration, IndexError):
+            return
+        now = time.monotonic()
+        if last_cpu is not None:
+            samples.append({"cpu_percent": (cpu_seconds - last_cpu) / (now - last_time) * 100, "rss_mb": rss_kb / 1024})
+        last_cpu, last_time = cpu_seconds, now
+
+def summarize_resources(samples: list) -> dict:
+    if not samples:
+        return {}
+    cpu = [s["cpu_percent"] for s in samples]
+    rss = [s["rss_mb"] for s in samples]
+    return {
+        "cpu_percent_avg": round(float(np.mean(cpu)), 1),
+        "cpu_percent_p95": round(float(np.percentile(cpu, 95)), 1),
+        "rss_mb_start": round(rss[0], 1),
+        "rss_mb_max": round(max(rss), 1),
+    }
+
+# --- Reporting ---
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_report(result: dict, baseline: dict | None = None):
+    print(f"\n=== Load test {result['label']} ({result['revision']}) — {result['config']['duration']}s ===")
+    print(f"{'endpoint':<14}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'errors':>8}")
+    for label, stats in sorted(result["http"].items()):
+        line = f"{label:<14}{stats['rps']:>9.1f}{stats.get('p50', 0):>9.1f}{stats.get('p95', 0):>9.1f}{stats.get('p99', 0):>9.1f}{stats['errors']:>8}"
+        if baseline and label in baseline.get("http", {}):
+            before = baseline["http"][label].get("p95")
+            if before:
+                line += f"   p95 {stats.get('p95', 0) - before:+.1f}ms vs baseline"
+        print(line)
+    ws = result["websocket"]
+    print(f"websocket: {ws['clients']} clients, {ws['messages_per_second']:.1f} msg/s, "
+          f"{ws['kilobytes_per_second']:.1f} KB/s, {ws['errors']} errors, interval p95 {ws['interval_ms'].get('p95', 0)} ms")
+    if result["server"]:
+        print(f"server: cpu avg {result['server']['cpu_percent_avg']}% (p95 {result['server']['cpu_percent_p95']}%), "
+              f"rss {result['server']['rss_mb_start']} -> {result['server']['rss_mb_max']} MB")
+
+def login_users(base_url: str, users: list):
+    """Triggers the OAuth callback for each user so their background jobs run during the test (mock Upstox only)."""
+    for user in users:
+        response = requests.get(f"{base_url}/auth/upstox/callback", params={"code": "loadtest", "state": user}, allow_redirects=False, timeout=30)
+        print(f"Login {user}: HTTP {response.status_code}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the dashboard REST and WebSocket endpoints.")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--users", default="samarth", help="Comma-separated user names to spread requests over")
+    parser.add_argument("--login", action="store_true", help="Log the users in first so their schedulers are running")
+    parser.add_argument("--ws-clients", type=int, default=100)
+    parser.add_argument("--ws-protocol", help="WebSocket subprotocol to negotiate, e.g. goo.msgpack-delta.v1 (default: legacy JSON)")
+    parser.add_argument("--http-workers", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--server-pid", type=int, help="PID of the uvicorn process, to sample its CPU and RSS")
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--results-dir", default=str(RESULTS_DIR))
+    parser.add_argument("--compare", help="A previous results JSON file to compare against")
+    args = parser.parse_args()
+
+    users = [u.strip() for u in args.users.split(",") if u.strip()]
+    base_url = args.base_url.rstrip("/")
+    if args.login:
+        login_users(base_url, users)
+
+    stop = threading.Event()
+    lock = threading.Lock()
+    http_results = {"latencies": {}, "errors": {}}
+    paths = endpoint_paths(users)
+    workers = [
+        threading.Thread(target=http_worker, args=(base_url, paths, i, stop, http_results, lock), daemon=True)
+        for i in range(args.http_workers)
+    ]
+    resource_samples = []
+    if args.server_pid:
+        workers.append(threading.Thread(target=sample_process, args=(args.server_pid, stop, resource_samples), daemon=True))
+
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    ws_stats = asyncio.run(run_ws_clients(base_url.replace("http", "ws", 1), users, args.ws_clients, args.duration, args.ws_protocol))
+    # Let the HTTP workers run for at least the full duration even if every WebSocket failed early
+    time.sleep(max(0.0, args.duration - (time.perf_counter() - started)))
+    stop.set()
+    for worker in workers:
+        worker.join(timeout=15)
+    elapsed = time.perf_counter() - started
+
+    http_summary = {}
+    for label in {label for label, _ in paths}:
+        samples = http_results["latencies"].get(label, [])
+        http_summary[label] = {
+            **percentiles(samples),
+            "rps": len(samples) / elapsed,
+            "errors": http_results["errors"].get(label, 0),
+        }
+    result = {
+        "label": args.label,
+        "revision": git_revision(),
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "config": {k: v for k, v in vars(args).items() if k not in ("compare", "results_dir")},
+        "http": http_summary,
+        "websocket": {
+            "clients": args.ws_clients,
+            "protocol": args.ws_protocol or "json",
+            "messages_per_second": ws_stats["messages"] / elapsed,
+            "kilobytes_per_second": ws_stats["bytes"] / 1024 / elapsed,
+            "errors": ws_stats["errors"],
+            "last_error": ws_stats["last_error"],
+            "connect_ms": percentiles(ws_stats["connect_ms"]),
+            "interval_ms": percentiles(ws_stats["interval_ms"]),
+        },
+        "server": summarize_resources(resource_samples),
+    }
+
+    baseline = json.loads(Path(args.compare).read_text()) if args.compare else None
+    print_report(result, baseline)
+
+    results_dir = Path(args.results_dir)
+    results_dir.mkdir(parents=True, exist_ok=True)
+    out_path = results_dir / f"{result['timestamp'].replace(':', '')}_{args.label}_{result['revision'] or 'norev'}.json"
+    out_path.write_text(json.dumps(result, indent=2))
+    print(f"Results saved to {out_path}")
+
+if __name__ == "__main__":
+    main()
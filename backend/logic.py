@@ -41,16 +41,29 @@ def determine_bias(current_price: float, current_delta: float, current_gamma: fl
     # --- Neutral Bias ---
     return "Neutral"
 
-def determine_market_type(candles_5min_buffer: list, market_type_window_size: int, settings: dict) -> str:
+# Market close is 10:00 AM UTC (3:30 PM IST)
+MARKET_CLOSE_UTC = datetime.time(10, 0)
+
+# --- Market type thresholds (ATR in points, body ratio 0..1) ---
+TRENDY_MIN_ATR = 15
+TRENDY_MIN_BODY_RATIO = 0.5
+VOLATILE_MIN_ATR = 25
+VOLATILE_MAX_BODY_RATIO = 0.4
+
+def determine_market_type(candles_5min_buffer: list, market_type_window_size: int, settings: dict,
+                          atr: float | None = None, body_ratio_avg: float | None = None) -> str:
     """
     Determines the market type based on a configurable lookback window.
+    ATR and average body ratio over the window can be passed in when already computed (the feature store).
     """
     if len(candles_5min_buffer) < market_type_window_size:
         return "Undetermined"
 
     # These will call new/updated functions in calculations.py
-    atr = calculations.calculate_atr(candles_5min_buffer, period=market_type_window_size)
-    body_ratio_avg = calculations.calculate_average_body_ratio(candles_5min_buffer, window_size=market_type_window_size)
+    if atr is None:
+        atr = calculations.calculate_atr(candles_5min_buffer, period=market_type_window_size)
+    if body_ratio_avg is None:
+        body_ratio_avg = calculations.calculate_average_body_ratio(candles_5min_buffer, window_size=market_type_window_size)
     # We'll need to add these calculations later
     # delta_stability = calculations.calculate_delta_stability(delta_buffer, window_size=market_type_window_size)
     # gamma_change = calculations.calculate_gamma_change_percent(gamma_buffer, num_updates=market_type_window_size * 30) # 30 updates per 5min candle
@@ -59,16 +72,16 @@ def determine_market_type(candles_5min_buffer: list, market_type_window_size: in
     # --- Trendy Market Check ---
     # Placeholder logic until all calculations are in place
     trendy_conditions = [
-        atr > 15, # Example: ATR is expanding
-        body_ratio_avg > 0.5, # Example: Candles have strong bodies
+        atr > TRENDY_MIN_ATR, # Example: ATR is expanding
+        body_ratio_avg > TRENDY_MIN_BODY_RATIO, # Example: Candles have strong bodies
     ]
     if sum(trendy_conditions) >= 2:
         return "Trendy"
 
     # --- Volatile Market Check ---
     volatile_conditions = [
-        atr > 25, # Example: ATR is very high
-        body_ratio_avg < 0.4, # Example: Candles are indecisive (long wicks)
+        atr > VOLATILE_MIN_ATR, # Example: ATR is very high
+        body_ratio_avg < VOLATILE_MAX_BODY_RATIO, # Example: Candles are indecisive (long wicks)
     ]
     if sum(volatile_conditions) >= 2:
         return "Volatile"
@@ -209,10 +222,8 @@ def check_exit_conditions(active_trade: dict, latest_premium: float, smoothed_gr
 
     # --- Time-Based Exit ---
     eod_exit_minutes = int(settings.get('eod_exit_minutes', 60))
-    # Market close is 10:00 AM UTC (3:30 PM IST)
-    market_close_time_utc = datetime.time(10, 0)
     # Calculate the time when the EOD exit should trigger
-    exit_trigger_time = (datetime.datetime.combine(datetime.date.today(), market_close_time_utc) - datetime.timedelta(minutes=eod_exit_minutes)).time()
+    exit_trigger_time = (datetime.datetime.combine(datetime.date.today(), MARKET_CLOSE_UTC) - datetime.timedelta(minutes=eod_exit_minutes)).time()
     
     now_utc_time = datetime.datetime.utcnow().time()
     if now_utc_time >= exit_trigger_time:
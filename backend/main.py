@@ -1,16 +1,40 @@
-from fastapi import FastAPI, WebSocket, APIRouter
+from fastapi import FastAPI, WebSocket, APIRouter, Request, HTTPException
 from pydantic import BaseModel
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
 from fastapi.middleware.cors import CORSMiddleware
-import requests
+from fastapi.responses import StreamingResponse
 import asyncio, functools
+import sys
 import datetime
+import time
+import requests
+import numpy as np
+from . import alerts
 from . import auth
 from .state import app_state
 from . import calculations
+from . import chain_store
 from . import database
+from . import greek_series
+from . import history
+from . import http_cache
 from . import logic
+from . import pipeline
+from . import profiling
+from . import tick_snapshot
+from . import execution
+from . import export
+from . import features
+from . import exit_monitor
+from . import fills
+from . import upstox_api
+from . import shared_state
+from . import static_files
+from . import recovery
+from . import shadow
+from . import tick_store
+from . import warmup
+from . import ws_protocol
+from .state import restore_user_state
 from apscheduler.schedulers.background import BackgroundScheduler
 
 app = FastAPI()
@@ -36,6 +60,7 @@ api_router = APIRouter(prefix="/api")
 def fetch_and_store_data(user_name: str):
     """
     Fetches option chain data, extracts relevant info, and stores it in buffers.
+    Returns True when a new tick was stored, so the pipeline knows to run the next stages.
     """
     # --- ADD THIS CHECK ---
     # Only run during market hours (e.g., Mon-Fri, 9:15 AM to 3:30 PM IST)
@@ -51,6 +76,9 @@ def fetch_and_store_data(user_name: str):
     if not access_token:
         print(f"Data fetch for {user_name} skipped: User not authenticated or state not found.")
         return
+    # Backing off after failed fetches
+    if not pipeline.fetch_allowed(user_state, time.time()):
+        return
 
     # For now, we use a fixed expiry. This will be made dynamic later.
     # TODO: Make expiry_date dynamic
@@ -59,64 +87,58 @@ def fetch_and_store_data(user_name: str):
     days_until_tuesday = (1 - today.weekday() + 7) % 7 # 1 = Tuesday
     expiry_date = today + datetime.timedelta(days=days_until_tuesday)
     
-    url = 'https://api-v2.upstox.com/option/chain'
     params = {
-        'instrument_key': 'NSE_INDEX|Nifty 50',
+        'instrument_key': upstox_api.NIFTY_INSTRUMENT_KEY,
         'expiry_date': expiry_date.strftime('%Y-%m-%d')
     }
-    headers = {
-        'Accept': 'application/json',
-        'Authorization': f'Bearer {access_token}'
-    }
-    
-    response = requests.get(url, params=params, headers=headers)
-    if response.status_code != 200:
-        print(f"Error fetching option chain: {response.text}")
-        return
 
-    data = response.json().get('data', [])
-    if not data:
-        print("No option chain data received.")
+    chain = fetch_option_chain(user_state, access_token, params)
+    if chain is None:
         return
-
-    # Store the full option chain for the UI
-    user_state["option_chain_data"] = data
+    # Keep a reference to the shared, read-only chain for the UI and the exit checks
+    user_state["option_chain"] = chain
+    # Paper orders that have reached the market fill against this chain's bid/ask
+    record_paper_fills(user_name, user_state, chain)
 
     # --- Extract and store data ---
-    underlying_price = data[0].get('underlying_spot_price')
+    strikes = chain.records["strike"]
+    underlying_price = float(chain.records["underlying"][0])
     user_state["price_buffer"].append(underlying_price)
 
-    # Find the ATM strike
-    atm_strike = min(data, key=lambda x: abs(x['strike_price'] - underlying_price))
-
-    # Find the index of the ATM strike in the sorted list
-    try:
-        atm_index = sorted(data, key=lambda x: x['strike_price']).index(atm_strike)
-    except ValueError:
-        print("Could not find ATM strike in the data list.")
-        return
+    # Find the ATM strike (the chain is sorted by strike)
+    atm_index = int(np.argmin(np.abs(strikes - underlying_price)))
 
     # Select the 2nd OTM call option as per the strategy
     target_strike_index = atm_index + 2
-    sorted_strikes = sorted(data, key=lambda x: x['strike_price'])
 
-    if target_strike_index < len(sorted_strikes):
-        target_strike_data = sorted_strikes[target_strike_index]
-        call_greeks = target_strike_data.get('call_options', {}).get('option_greeks', {})
-        call_market_data = target_strike_data.get('call_options', {}).get('market_data', {})
-        latest_premium = call_market_data.get('ltp')
+    if target_strike_index < len(chain):
+        target_strike_data = chain.row(target_strike_index)
+        latest_premium = target_strike_data['call_ltp']
+
+        # When ATM moves, the monitored contract changes; switch the buffers to the new contract's history
+        previous_strike = user_state.get("monitored_strike")
+        if previous_strike is not None and previous_strike != target_strike_data['strike']:
+            greek_series.refill_contract_buffers(user_state, chain, target_strike_data['strike'])
+            print(f"[{user_name}] Monitored strike rolled from {previous_strike} to {target_strike_data['strike']}; "
+                  f"loaded {len(user_state['delta_buffer'])} samples of its history.")
 
         # Populate the Greek buffers
-        user_state["delta_buffer"].append(call_greeks.get('delta'))
-        user_state["gamma_buffer"].append(call_greeks.get('gamma'))
-        user_state["theta_buffer"].append(call_greeks.get('theta'))
-        user_state["iv_buffer"].append(call_greeks.get('iv'))
+        user_state["delta_buffer"].append(target_strike_data['call_delta'])
+        user_state["gamma_buffer"].append(target_strike_data['call_gamma'])
+        user_state["theta_buffer"].append(target_strike_data['call_theta'])
+        user_state["iv_buffer"].append(target_strike_data['call_iv'])
         # Populate the premium buffer
         user_state["premium_buffer"].append(latest_premium)
+        # Timestamp the samples (with the chain's fetch time), since the polling interval adapts to market conditions
+        user_state["tick_time_buffer"].append(chain.fetched_at)
+        # Remember which contract is being monitored so a new setup can be tied to it
+        user_state["atm_strike"] = float(strikes[atm_index])
+        user_state["monitored_strike"] = target_strike_data['strike']
+        user_state["monitored_instrument_key"] = target_strike_data['call_instrument_key']
 
         print(f"[{user_name}] Fetched Price: {underlying_price:.2f} | "
-              f"Monitoring Strike: {target_strike_data['strike_price']} | "
-              f"Delta: {call_greeks.get('delta')}")
+              f"Monitoring Strike: {target_strike_data['strike']} | "
+              f"Delta: {target_strike_data['call_delta']}")
 
         # --- Delayed Baseline Capture Logic ---
         if not user_state.get("baseline_set") and user_state.get("login_timestamp"):
@@ -124,20 +146,58 @@ def fetch_and_store_data(user_name: str):
             if datetime.datetime.now() - user_state["login_timestamp"] >= datetime.timedelta(minutes=15):
                 user_state["baseline_values"] = {
                     "price": underlying_price,
-                    "delta": call_greeks.get('delta'),
-                    "gamma": call_greeks.get('gamma'),
-                    "iv": call_greeks.get('iv')
+                    "delta": target_strike_data['call_delta'],
+                    "gamma": target_strike_data['call_gamma'],
+                    "iv": target_strike_data['call_iv']
                 }
                 user_state["baseline_timestamp"] = datetime.datetime.now()
                 user_state["baseline_set"] = True
                 print(f"!!! [{user_name}] BASELINE CAPTURED at {user_state['baseline_timestamp']} !!!")
                 print(f"Baseline values: {user_state['baseline_values']}")
+        return True
     else:
         print(f"[{user_name}] Could not find 2nd OTM strike.")
 
+def fetch_option_chain(user_state: dict, access_token: str, params: dict) -> chain_store.OptionChain | None:
+    """
+    Returns the option chain for this tick, or None if the fetch failed.
+    A chain another user fetched for the same instrument moments ago is reused instead of fetched again.
+    """
+    chain = chain_store.get_latest_chain(params['instrument_key'], params['expiry_date'], max_age=chain_store.SHARE_MAX_AGE_SECONDS)
+    if chain is not None:
+        pipeline.record_fetch_success(user_state, time.time())
+        return chain
+
+    try:
+        response = upstox_api.get_hedged('/option/chain', access_token, params=params)
+    except requests.exceptions.RequestException as e:
+        print(f"Error fetching option chain: {e}")
+        pipeline.record_fetch_failure(user_state, time.time())
+        return None
+    if response.status_code != 200:
+        print(f"Error fetching option chain: {response.text}")
+        pipeline.record_fetch_failure(user_state, time.time())
+        return None
+
+    data = response.json().get('data', [])
+    if not data:
+        print("No option chain data received.")
+        pipeline.record_fetch_failure(user_state, time.time())
+        return None
+    pipeline.record_fetch_success(user_state, time.time())
+
+    # Store the chain once, compactly, for every user and reader; the raw JSON is dropped here
+    chain = chain_store.from_upstox(params['instrument_key'], params['expiry_date'], data)
+    chain_store.publish_chain(chain)
+    # Record the whole chain for warm-up, history and export (written on a background thread)
+    tick_store.record_chain(chain)
+    # And in memory, per strike, so any contract's Greeks can be followed
+    greek_series.record_chain(chain)
+    return chain
+
 def run_greek_confirmation(user_name: str):
     """
-    Runs every 10 seconds to check for Greek confirmation on a pending candidate.
+    Runs after every completed fetch to check for Greek confirmation on a pending candidate.
     """
     # --- ADD THIS CHECK ---
     # Only run during market hours
@@ -159,17 +219,17 @@ def run_greek_confirmation(user_name: str):
     if not candidate:
         return
 
+    settings = database.get_settings()
+    # Keep the linked accounts' order connections warm while they may be needed
+    if execution.is_lead(user_name, settings):
+        execution.keep_warm(settings)
+    tick_features = features.current_features(user_state, settings)
+
     # --- State 1: Monitor for Entry Confirmation ---
     if candidate.get("status") == "Pending_Greek_Confirmation":
-        # Calculate smoothed Greek values over a 30-second window for entry confirmation
-        smoothed_greeks = {
-            "delta_slope": calculations.calculate_smoothed_slope(user_state["delta_buffer"], 30),
-            "gamma_change": calculations.calculate_smoothed_percent_change(user_state["gamma_buffer"], 30),
-            "iv_trend": calculations.calculate_smoothed_slope(user_state["iv_buffer"], 30),
-            "theta_change": calculations.calculate_smoothed_percent_change(user_state["theta_buffer"], 30)
-        }
+        # Smoothed Greek values over a 30-second window for entry confirmation, on the candidate's own contract
+        smoothed_greeks = tick_features.contract_greeks(candidate.get("strike_price"), features.ENTRY_WINDOW_SECONDS)
 
-        settings = database.get_settings()
         # Run the confirmation logic
         confirmed_candidate = logic.confirm_with_greeks(
             candidate=candidate, 
@@ -177,8 +237,11 @@ def run_greek_confirmation(user_name: str):
             settings=settings
         )
 
-        # If the signal is approved, calculate SL/Target and update the log
+        # If the signal is approved, send the orders first, then calculate SL/Target and update the log
         if confirmed_candidate and confirmed_candidate.get("status") == "ENTRY_APPROVED":
+            if execution.is_lead(user_name, settings):
+                execution.fire(confirmed_candidate, "BUY", settings, signal_at=time.perf_counter())
+                execution.prepare(confirmed_candidate, "SELL", settings)
             risk_percent = float(settings.get('risk_percent', 1.0))
             rr_ratio = float(settings.get('risk_reward_ratio', 2.0))
 
@@ -190,47 +253,117 @@ def run_greek_confirmation(user_name: str):
 
             confirmed_candidate['stop_loss'] = round(sl_price, 2)
             confirmed_candidate['target'] = round(target_price, 2)
+            alerts.notify("entry", user_name, f"ENTRY {confirmed_candidate.get('type')} strike {confirmed_candidate.get('strike_price')} "
+                          f"@ {entry_price:.2f}, SL {sl_price:.2f}, TGT {target_price:.2f}",
+                          log_id=confirmed_candidate.get("log_id"), strike=confirmed_candidate.get("strike_price"),
+                          premium=entry_price, stop_loss=confirmed_candidate['stop_loss'], target=confirmed_candidate['target'])
 
             # Update the database log with the final details
             db_updates = {"status": "ENTRY_APPROVED", "entry_price": entry_price, "result": f"SL: {sl_price:.2f}, TGT: {target_price:.2f}"}
             database.update_log_entry(confirmed_candidate.get("log_id"), db_updates)
             user_state["candidate_setup"] = confirmed_candidate
+            submit_paper_order(user_state, confirmed_candidate, "BUY", settings)
+            # Watch the traded contract on the streaming feed for sub-second SL/Target reaction
+            exit_monitor.start_exit_monitor(user_name, user_state, close_active_trade)
         return
 
     # --- State 2: Monitor Active Trade for Exit ---
     if candidate.get("status") == "ENTRY_APPROVED":
-        latest_premium = user_state["premium_buffer"][-1] if user_state["premium_buffer"] else 0
+        # Smoothed Greek values over a 60-second window for exit monitoring.
+        # These are shared with the streaming exit monitor, which evaluates them on every price update.
+        # Like entry, they follow the traded contract even after the monitored strike has rolled.
+        smoothed_greeks_for_exit = tick_features.contract_greeks(candidate.get("strike_price"), features.EXIT_WINDOW_SECONDS)
+        user_state["exit_greeks"] = smoothed_greeks_for_exit
 
-        # Calculate smoothed Greek values over a 60-second window for exit monitoring
-        smoothed_greeks_for_exit = {
-            "delta_slope": calculations.calculate_smoothed_slope(user_state["delta_buffer"], 60),
-            "gamma_change": calculations.calculate_smoothed_percent_change(user_state["gamma_buffer"], 60),
-            "iv_trend": calculations.calculate_smoothed_slope(user_state["iv_buffer"], 60),
-        }
+        # The streaming exit monitor already covers this trade; only poll from the chain if the stream is down.
+        if exit_monitor.is_streaming(user_state):
+            return
 
-        settings = database.get_settings()
+        latest_premium = get_contract_premium(user_state, candidate)
         exit_reason = logic.check_exit_conditions(candidate, latest_premium, smoothed_greeks_for_exit, settings)
 
         if exit_reason:
-            print(f"!!! [{user_name}] EXIT CONDITION MET: {exit_reason} !!!")
-            # Update the log with the exit reason
-            db_updates = {"status": "CLOSED", "result": exit_reason}
-            database.update_log_entry(candidate.get("log_id"), db_updates)
-
-            # Clear the active signal and enter cooldown
-            user_state["candidate_setup"] = None
-            settings = database.get_settings()
-            # Temporarily store the exit reason for the WebSocket to broadcast
-            user_state["last_exit_reason"] = exit_reason
+            close_active_trade(user_name, candidate, exit_reason)
 
-            cooldown_minutes = int(settings.get('cooldown_minutes', 15))
-            user_state["cooldown_until"] = now + datetime.timedelta(minutes=cooldown_minutes)
-            print(f"[{user_name}] Trade closed. Entering cooldown until {user_state['cooldown_until']}")
+def get_contract_premium(user_state: dict, candidate: dict) -> float:
+    """
+    Returns the latest premium of the traded contract from the last chain poll.
+    Falls back to the monitored strike's premium for trades without a recorded strike.
+    """
+    strike = candidate.get("strike_price")
+    chain = user_state.get("option_chain")
+    if strike is not None and chain is not None:
+        index = chain.find_strike(strike)
+        if index is not None:
+            return chain.row(index)['call_ltp'] or 0
+    return user_state["premium_buffer"][-1] if user_state["premium_buffer"] else 0
+
+def close_active_trade(user_name: str, candidate: dict, exit_reason: str):
+    """
+    Closes the active trade, logs the exit and starts the cooldown.
+    Called from both the chain-polling path and the streaming exit monitor, so it only acts once per trade.
+    """
+    user_state = app_state["users"].get(user_name)
+    if not user_state: return
+    with user_state["trade_lock"]:
+        if user_state.get("candidate_setup") is not candidate:
+            return
 
+        settings = database.get_settings()
+        # Exits follow the trade's accepted entries, even if the linked accounts changed since
+        execution.fire(candidate, "SELL", settings)
+        print(f"!!! [{user_name}] EXIT CONDITION MET: {exit_reason} !!!")
+        alerts.notify("exit", user_name, f"EXIT strike {candidate.get('strike_price')}: {exit_reason}",
+                      log_id=candidate.get("log_id"), strike=candidate.get("strike_price"), reason=exit_reason)
+        # Update the log with the exit reason
+        db_updates = {"status": "CLOSED", "result": exit_reason}
+        database.update_log_entry(candidate.get("log_id"), db_updates)
+
+        # Clear the active signal and enter cooldown
+        user_state["candidate_setup"] = None
+        exit_monitor.stop_exit_monitor(user_state)
+        submit_paper_order(user_state, candidate, "SELL", settings)
+        # Temporarily store the exit reason for the WebSocket to broadcast
+        user_state["last_exit_reason"] = exit_reason
+
+        cooldown_minutes = int(settings.get('cooldown_minutes', 15))
+        user_state["cooldown_until"] = datetime.datetime.now() + datetime.timedelta(minutes=cooldown_minutes)
+        print(f"[{user_name}] Trade closed. Entering cooldown until {user_state['cooldown_until']}")
+        # Readers shouldn't have to wait for the next tick to see the trade closed
+        tick_snapshot.publish_trade_update(user_state)
+
+
+# --- Paper fills ---
+
+def submit_paper_order(user_state: dict, candidate: dict, side: str, settings: dict):
+    """
+    Sends the trade's entry (BUY) or exit (SELL) to the user's paper broker, to be filled against the
+    bid/ask of a later chain. The fill is recorded in the trade's log entry.
+    """
+    if candidate.get("log_id") is None or candidate.get("strike_price") is None:
+        return
+    broker = user_state.get("paper_broker")
+    if broker is None:
+        broker = user_state["paper_broker"] = fills.PaperBroker()
+    broker.submit((candidate["log_id"], side), candidate["strike_price"], side,
+                  int(settings.get('paper_quantity', 75)), time.time(),
+                  latency_ms=float(settings.get('fill_latency_ms', 250)),
+                  slippage_ticks=float(settings.get('fill_slippage_ticks', 1)))
+
+def record_paper_fills(user_name: str, user_state: dict, chain: chain_store.OptionChain):
+    broker = user_state.get("paper_broker")
+    if broker is None:
+        return
+    for fill in broker.on_chain(chain):
+        log_id, side = fill.order_id
+        prefix = "entry" if side == "BUY" else "exit"
+        filled_at = datetime.datetime.fromtimestamp(fill.quote_ts).isoformat()
+        database.update_log_entry(log_id, {f"{prefix}_fill_price": fill.price, f"{prefix}_fill_at": filled_at, "fill_quantity": fill.quantity})
+        print(f"[{user_name}] Paper {side} filled: {fill.quantity} @ {fill.price} (LTP {fill.reference_price}, from {fill.source})")
 
 def process_5min_candle(user_name: str):
     """
-    Forms a 5-minute candle from the price_buffer and stores it.
+    Closes the 5-minute candle formed from this bucket's ticks and stores it.
     """
     # --- ADD THIS CHECK ---
     # Only run during market hours
@@ -241,30 +374,22 @@ def process_5min_candle(user_name: str):
     user_state = app_state["users"].get(user_name)
     if not user_state: return
 
-    price_buffer = user_state["price_buffer"]
-    if len(price_buffer) < 30:
+    # A candle that only saw the tail end of its 5 minutes (e.g. right after login) would be misleading
+    candle = user_state.get("forming_candle")
+    if not pipeline.is_candle_complete(candle):
         print("Not enough data for 5-min candle, skipping.")
         return
 
-    # Take the last 30 data points for the 5-min candle
-    prices = list(price_buffer)[-30:]
-    
-    candle_open = prices[0]
-    candle_high = max(prices)
-    candle_low = min(prices)
-    candle_close = prices[-1]
-    
-    # Align timestamp to the start of the 5-minute interval
-    now = datetime.datetime.now()
-    timestamp = now.replace(minute=now.minute - (now.minute % 5), second=0, microsecond=0)
-    
-    new_candle = [timestamp.isoformat(), candle_open, candle_high, candle_low, candle_close]
+    # Label the candle with the 5-minute mark at which it closed
+    timestamp = datetime.datetime.fromtimestamp((candle["bucket"] + 1) * pipeline.CANDLE_SECONDS)
+
+    new_candle = [timestamp.isoformat(), candle["open"], candle["high"], candle["low"], candle["close"]]
     user_state["candles_5min_buffer"].append(new_candle)
     print(f"[{user_name}] New 5-min Candle created: {new_candle}")
 
 def run_logic_controller(user_name: str):
     """
-    Runs every 5 minutes to determine Bias and Market Type.
+    Runs on every 5-minute candle close to determine Bias and Market Type.
     """
     # --- ADD THIS CHECK ---
     # Only run during market hours
@@ -285,11 +410,13 @@ def run_logic_controller(user_name: str):
         user_state["bias"], user_state["market_type"] = "Neutral", "Undetermined"
         return
     # 1. Get all calculated features
-    latest_price = user_state["price_buffer"][-1] if user_state["price_buffer"] else 0
-    latest_delta = user_state["delta_buffer"][-1] if user_state["delta_buffer"] else None
-    latest_gamma = user_state["gamma_buffer"][-1] if user_state["gamma_buffer"] else None
-    latest_iv = user_state["iv_buffer"][-1] if user_state["iv_buffer"] else None
-    latest_premium = user_state["premium_buffer"][-1] if user_state["premium_buffer"] else 0
+    settings = database.get_settings()
+    tick_features = features.current_features(user_state, settings)
+    latest_price = tick_features.price or 0
+    latest_delta = tick_features.delta
+    latest_gamma = tick_features.gamma
+    latest_iv = tick_features.iv
+    latest_premium = tick_features.premium or 0
 
     # 2. Determine Bias
     bias = logic.determine_bias(
@@ -302,14 +429,15 @@ def run_logic_controller(user_name: str):
     user_state["bias"] = bias
 
     # 3. Determine Market Type
-    settings = database.get_settings()
     # Update market_type_window_size from settings if it has changed
     user_state["market_type_window_size"] = int(settings.get("market_type_window_size", 3))
 
     market_type = logic.determine_market_type(
         candles_5min_buffer=user_state["candles_5min_buffer"],
         market_type_window_size=user_state["market_type_window_size"],
-        settings=settings
+        settings=settings,
+        atr=tick_features.atr,
+        body_ratio_avg=tick_features.body_ratio_avg
     )
     user_state["market_type"] = market_type
 
@@ -329,12 +457,26 @@ def run_logic_controller(user_name: str):
         action = result.get("action")
         if action == "trade_setup":
             candidate = result.get("setup")
+            if candidate:
+                # Tie the setup to the contract being monitored when the signal fired
+                candidate["strike_price"] = user_state.get("monitored_strike")
+                candidate["atm_strike"] = user_state.get("atm_strike")
+                candidate["instrument_key"] = user_state.get("monitored_instrument_key")
+            if user_state.get("candidate_setup"):
+                execution.discard(user_state["candidate_setup"])
             user_state["candidate_setup"] = candidate
             if candidate and candidate.get("status") == "Pending_Greek_Confirmation":
                 log_id = database.log_signal(candidate)
                 if log_id:
                     candidate["log_id"] = log_id
                     user_state["candidate_setup"] = candidate
+                # Build the entry orders now, so approval only has to send them
+                if execution.is_lead(user_name, settings):
+                    execution.prepare(candidate, "BUY", settings)
+                alerts.notify("signal", user_name, f"{candidate['type']} setup at {latest_price:.2f}, strike {candidate.get('strike_price')}; "
+                              "waiting for Greek confirmation",
+                              log_id=candidate.get("log_id"), strike=candidate.get("strike_price"), price=latest_price,
+                              premium=latest_premium)
         elif action == "update_state":
             user_state["price_action_state"].update(result.get("new_state", {}))
             print(f"[{user_name}] Price action state updated: {user_state['price_action_state']}")
@@ -345,6 +487,79 @@ def run_logic_controller(user_name: str):
 
     print(f"[{user_name}] Logic Controller Update: Bias={bias}, MarketType={market_type}, PA_Status={user_state['price_action_state']['status']}")
 
+def run_tick_pipeline(user_name: str):
+    """
+    The event-driven tick pipeline: fetch -> Greek features/confirmation -> (on candle close) candle -> logic.
+    Each stage runs as soon as the previous one has finished, so decisions are never made on stale data.
+    """
+    fetch_started = time.perf_counter()
+    if not fetch_and_store_data(user_name):
+        return
+    user_state = app_state["users"].get(user_name)
+    if not user_state: return
+    pipeline.record_stage(user_state, "fetch_ms", fetch_started)
+
+    # --- Warm-up: on the first tick, bulk-load today's candles and recent Greek history ---
+    if not user_state.get("warmed_up"):
+        stage_started = time.perf_counter()
+        warmup.warm_up_user(user_name, user_state, upstox_api.NIFTY_INSTRUMENT_KEY)
+        pipeline.record_stage(user_state, "warmup_ms", stage_started)
+
+    # The tick is considered received once the fetch has completed.
+    tick_received = time.perf_counter()
+
+    # --- Stage 1: Features (computed once for every consumer below) and Greek confirmation on every tick ---
+    stage_started = time.perf_counter()
+    features.compute_features(user_state, database.get_settings())
+    pipeline.record_stage(user_state, "features_ms", stage_started)
+    stage_started = time.perf_counter()
+    run_greek_confirmation(user_name)
+    pipeline.record_stage(user_state, "greeks_ms", stage_started)
+
+    # --- Stage 2: Candle close triggers the candle and the logic controller ---
+    tick_time = user_state["tick_time_buffer"][-1]
+    candle_closed = pipeline.is_candle_close(user_state, tick_time)
+    if candle_closed:
+        stage_started = time.perf_counter()
+        process_5min_candle(user_name)
+        features.refresh_candle_features(user_state, database.get_settings())
+        pipeline.record_stage(user_state, "candle_ms", stage_started)
+    # This tick's price belongs to the candle that is now forming
+    pipeline.update_forming_candle(user_state, user_state["price_buffer"][-1], tick_time)
+    if candle_closed:
+        stage_started = time.perf_counter()
+        run_logic_controller(user_name)
+        pipeline.record_stage(user_state, "logic_ms", stage_started)
+
+    # --- Stage 3: Shadow configs, on the same features (paper trades only) ---
+    stage_started = time.perf_counter()
+    try:
+        if candle_closed:
+            shadow.on_candle(user_state)
+        shadow.on_tick(user_name, user_state)
+    except Exception as e:  # Experimental configs must never hold up the live pipeline
+        print(f"[{user_name}] Shadow evaluation failed: {type(e).__name__}: {e}")
+    pipeline.record_stage(user_state, "shadow_ms", stage_started)
+
+    pipeline.record_stage(user_state, "tick_to_decision_ms", tick_received)
+    # Publish this tick's results to the API and WebSockets in one reference swap
+    tick_snapshot.publish_tick_snapshot(user_state)
+    adapt_poll_interval(user_name, user_state)
+
+def adapt_poll_interval(user_name: str, user_state: dict):
+    """
+    Speeds the fetch job up while a candidate is pending or a trade is open and slows it down when
+    the market is quiet. All fetches still draw from the shared per-token rate limit in upstox_api.
+    """
+    interval = pipeline.choose_poll_interval(user_state, database.get_settings())
+    if interval == user_state.get("poll_interval"):
+        return
+    scheduler = user_state.get("scheduler")
+    if scheduler:
+        scheduler.reschedule_job(f'data_fetch_{user_name}', trigger='interval', seconds=interval)
+    user_state["poll_interval"] = interval
+    print(f"[{user_name}] Poll interval set to {interval}s.")
+
 def get_user_profile():
     """
     Fetches the user's profile from Upstox to test the access token.
@@ -355,12 +570,7 @@ def get_user_profile():
     if not access_token:
         return {"error": "User not authenticated. Please login first via /auth/login"}
 
-    url = "https://api-v2.upstox.com/user/profile"
-    headers = {
-        "accept": "application/json",
-        "Authorization": f"Bearer {access_token}"
-    }
-    response = requests.get(url, headers=headers)
+    response = upstox_api.get('/user/profile', access_token)
     return response.json()
 
 def start_user_scheduler(user_name: str):
@@ -372,15 +582,14 @@ def start_user_scheduler(user_name: str):
         print(f"Scheduler for {user_name} already running or user state not found.")
         return
 
-    # Set the login timestamp when the scheduler starts
-    user_state["login_timestamp"] = datetime.datetime.now()
+    # Set the login timestamp when the scheduler starts (a session restored from a snapshot keeps its own)
+    if not user_state.get("login_timestamp"):
+        user_state["login_timestamp"] = datetime.datetime.now()
 
     scheduler = BackgroundScheduler()
-    # Use functools.partial to pass the user_name to the job functions
-    scheduler.add_job(functools.partial(fetch_and_store_data, user_name), 'interval', seconds=10, id=f'data_fetch_{user_name}')
-    scheduler.add_job(functools.partial(run_greek_confirmation, user_name), 'interval', seconds=10, start_date=datetime.datetime.now() + datetime.timedelta(seconds=10), id=f'greek_confirm_{user_name}')
-    scheduler.add_job(functools.partial(process_5min_candle, user_name), 'cron', minute='*/5', second='5', id=f'candle_{user_name}')
-    scheduler.add_job(functools.partial(run_logic_controller, user_name), 'cron', minute='*/5', second='10', id=f'logic_{user_name}')
+    # Use functools.partial to pass the user_name to the job functions.
+    # A single job drives the whole pipeline; later stages are triggered by the fetch and candle close events.
+    scheduler.add_job(functools.partial(run_tick_pipeline, user_name), 'interval', seconds=user_state["poll_interval"], id=f'data_fetch_{user_name}')
     scheduler.start()
     user_state["scheduler"] = scheduler
     print(f"Background scheduler started for user: {user_name} at {user_state['login_timestamp']}")
@@ -393,26 +602,73 @@ def startup_event():
     database.init_db() # Initialize the database
     # We no longer start a global scheduler on startup.
     print("Database initialized. Schedulers will start upon user login.")
+    if shared_state.ENGINE_ROLE != "consumer":
+        alerts.start()
+    if shared_state.ENGINE_ROLE == "standalone":
+        # Warm restart: pick up where a crashed or redeployed process left off
+        resume_user_sessions(recovery.restore_snapshot())
+        recovery.start_snapshot_writer()
+
+def resume_user_sessions(user_names: list):
+    """
+    Restarts the background jobs, and the exit monitor of any active trade, for users restored from a snapshot.
+    """
+    for user_name in user_names:
+        user_state = app_state["users"].get(user_name)
+        if not user_state or not user_state.get("access_token"):
+            continue
+        start_user_scheduler(user_name)
+        candidate = user_state.get("candidate_setup")
+        if candidate and candidate.get("status") == "ENTRY_APPROVED":
+            exit_monitor.start_exit_monitor(user_name, user_state, close_active_trade)
+
+@app.on_event("startup")
+async def start_shared_state_consumer():
+    """
+    In consumer mode this worker runs no schedulers; it mirrors the producer's published snapshots instead.
+    """
+    if shared_state.ENGINE_ROLE != "consumer":
+        return
+    asyncio.get_running_loop().create_task(refresh_from_shared_state())
+    print(f"Running as a read-only consumer of {shared_state.SNAPSHOT_FILE}")
+
+async def refresh_from_shared_state():
+    last_version = None
+    while True:
+        try:
+            snapshot = shared_state.load_snapshot()
+            if snapshot and snapshot["version"] != last_version:
+                app_state["users"] = {name: restore_user_state(exported) for name, exported in snapshot["users"].items()}
+                last_version = snapshot["version"]
+        except Exception as e:
+            print(f"Error reading shared state snapshot: {e}")
+        await asyncio.sleep(0.25)
 
 @api_router.get("/latest-data")
-def get_latest_data():
+def get_latest_data(request: Request):
     """
     An endpoint to inspect the current content of our data buffers.
     """
+    snapshots = {user: tick_snapshot.get_tick_snapshot(state) for user, state in list(app_state["users"].items())}
+    version_key = tuple((user, snapshot.version) for user, snapshot in snapshots.items())
+    return http_cache.versioned_json(request, "latest-data", version_key, lambda: build_latest_data(snapshots))
+
+def build_latest_data(snapshots: dict) -> dict:
     return {
         "users": {
             user: {
-                "prices": list(state["price_buffer"]),
-                "deltas": list(state["delta_buffer"]),
-                "gammas": list(state["gamma_buffer"]),
-            } for user, state in app_state["users"].items()
+                "prices": snapshot.prices,
+                "deltas": snapshot.deltas,
+                "gammas": snapshot.gammas,
+            } for user, snapshot in snapshots.items()
         }
     }
 
 @api_router.get("/signals")
-def get_signals(user_name: str = None):
+def get_signals(request: Request, user_name: str = None):
     """
     An endpoint to calculate and display the current signals from the data.
+    Signals only change with a new tick, so they are computed once per snapshot version.
     """
     # If no user is specified, try to get the first one.
     if not user_name:
@@ -421,16 +677,35 @@ def get_signals(user_name: str = None):
     user_state = app_state["users"].get(user_name)
     if not user_state:
         return {"error": f"No data for user: {user_name}"}
+    snapshot = tick_snapshot.get_tick_snapshot(user_state)
+    return http_cache.versioned_json(request, f"signals:{user_name}", snapshot.version, lambda: build_signals(user_state, snapshot))
+
+@api_router.get("/features")
+def get_features(request: Request, user_name: str = None):
+    """
+    The feature vector of the user's latest tick. It is served by version: a client that already has
+    the current one (If-None-Match) gets 304.
+    """
+    if not user_name:
+        user_name = next(iter(app_state["users"]), None)
+    user_state = app_state["users"].get(user_name)
+    if not user_state:
+        return {"error": f"No data for user: {user_name}"}
+    tick_features = tick_snapshot.get_tick_snapshot(user_state).features or features.EMPTY_FEATURES
+    return http_cache.versioned_json(request, f"features:{user_name}", tick_features.version, tick_features.to_dict)
+
+def build_signals(user_state: dict, snapshot: tick_snapshot.TickSnapshot) -> dict:
+    # Everything below comes from one tick's snapshot, so prices, Greeks and candles always agree
 
     # --- New structured signals object ---
     signals_data = {}
     settings = database.get_settings()
 
     # --- 1. Bias Details ---
-    if user_state.get("baseline_set"):
-        baseline_values = user_state["baseline_values"]
-        current_price = user_state["price_buffer"][-1] if user_state["price_buffer"] else None
-        current_delta = user_state["delta_buffer"][-1] if user_state["delta_buffer"] else None
+    if snapshot.baseline_set:
+        baseline_values = snapshot.baseline_values
+        current_price = snapshot.latest("prices")
+        current_delta = snapshot.latest("deltas")
         
         price_from_baseline = current_price - baseline_values.get("price", current_price) if current_price else 0
         delta_from_baseline = current_delta - baseline_values.get("delta", current_delta) if current_delta else 0
@@ -449,9 +724,11 @@ def get_signals(user_name: str = None):
         }
 
     # --- 2. Market Type Details ---
-    window_size = int(user_state.get("market_type_window_size", 3))
-    atr = calculations.calculate_atr(user_state["candles_5min_buffer"], period=window_size)
-    body_ratio_avg = calculations.calculate_average_body_ratio(user_state["candles_5min_buffer"], window_size=window_size)
+    # Derived values come precomputed with the tick's features, so building the response does no numeric work
+    tick_features = snapshot.features or features.EMPTY_FEATURES
+    window_size = tick_features.market_type_window_size
+    atr = tick_features.atr
+    body_ratio_avg = tick_features.body_ratio_avg
     signals_data["market_type_details"] = {
         "atr": f"{atr:.2f}",
         "body_ratio_avg": f"{body_ratio_avg:.2f}",
@@ -472,26 +749,61 @@ def get_signals(user_name: str = None):
     }
 
     # --- 4. Greek Confirmation Details ---
+    smoothed = tick_features.contract_greeks(None, features.ENTRY_WINDOW_SECONDS) or {}
+
+    def shown(name: str, spec: str, suffix: str = "") -> str:
+        value = smoothed.get(name, float("nan"))
+        return "--" if value != value else f"{value:{spec}}{suffix}"  # NaN: not enough history yet
+
     signals_data["greek_confirmation_details"] = {
-        "smoothed_delta_slope": f"{calculations.calculate_smoothed_slope(user_state['delta_buffer'], 30):.4f}",
-        "smoothed_gamma_change": f"{calculations.calculate_smoothed_percent_change(user_state['gamma_buffer'], 30):.2f}%",
-        "smoothed_iv_trend": f"{calculations.calculate_smoothed_slope(user_state['iv_buffer'], 30):.4f}",
-        "smoothed_theta_change": f"{calculations.calculate_smoothed_percent_change(user_state['theta_buffer'], 30):.2f}%",
+        "smoothed_delta_slope": shown("delta_slope", ".4f"),
+        "smoothed_gamma_change": shown("gamma_change", ".2f", "%"),
+        "smoothed_iv_trend": shown("iv_trend", ".4f"),
+        "smoothed_theta_change": shown("theta_change", ".2f", "%"),
     }
 
     return signals_data
 
 @api_router.get("/status")
-def get_system_status():
+def get_system_status(request: Request):
     """
     Returns the current system status (Bias and Market Type).
     """
     # Return status for all active users
+    now = time.time()
+    snapshots = {user: tick_snapshot.get_tick_snapshot(state) for user, state in list(app_state["users"].items())}
+    # Staleness changes with time alone, so it is part of the version
+    version_key = tuple((user, snapshot.version, snapshot.is_stale(now)) for user, snapshot in snapshots.items())
+    return http_cache.versioned_json(request, "status", version_key, lambda: build_system_status(snapshots, now))
+
+def build_system_status(snapshots: dict, now: float) -> dict:
     return {user: {
-        "bias": state.get("bias"),
-        "market_type": state.get("market_type"),
-        "candidate_setup": state.get("candidate_setup"),
-    } for user, state in app_state["users"].items()}
+        "bias": snapshot.bias,
+        "market_type": snapshot.market_type,
+        "candidate_setup": snapshot.candidate_setup,
+        "data_stale": snapshot.is_stale(now),
+    } for user, snapshot in snapshots.items()}
+
+@api_router.get("/latency")
+def get_pipeline_latency():
+    """
+    Returns per-stage and tick-to-decision latency (p50/p95/max in ms) for every active user.
+    """
+    return {user: pipeline.summarize_latency(state) for user, state in app_state["users"].items()}
+
+@api_router.get("/execution")
+def get_execution_status():
+    """
+    Returns the linked accounts' order sessions, signal-to-ack latency and latest orders.
+    """
+    return execution.get_status(database.get_settings())
+
+@api_router.get("/alerts")
+def get_alert_status():
+    """
+    Returns the alert sinks' queued, sent, failed and dropped alerts and notify-to-delivery latency.
+    """
+    return alerts.get_status()
 
 @api_router.get("/tradelogs")
 def get_trade_logs():
@@ -500,23 +812,87 @@ def get_trade_logs():
     """
     return database.get_all_logs()
 
+# --- Streaming exports and history ---
+
+def _parse_time_range(since: str | None, until: str | None) -> tuple:
+    """Parses ISO date/datetime range bounds into local naive datetimes (None when open-ended)."""
+    bounds = []
+    for name, value in (("since", since), ("until", until)):
+        if not value:
+            bounds.append(None)
+            continue
+        try:
+            parsed = datetime.datetime.fromisoformat(value)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"{name} must be an ISO date or datetime, got {value!r}")
+        bounds.append(parsed.astimezone().replace(tzinfo=None) if parsed.tzinfo else parsed)
+    return tuple(bounds)
+
+def _export_response(fmt: str, name: str, columns: list, chunks) -> StreamingResponse:
+    return StreamingResponse(export.encode(fmt, columns, chunks), media_type=export.MEDIA_TYPES[fmt],
+                             headers={"Content-Disposition": f'attachment; filename="{name}.{fmt}"'})
+
+@api_router.get("/export/tradelogs")
+def export_trade_logs(format: str = "csv", since: str = None, until: str = None):
+    """
+    Streams the trade logs with since <= timestamp < until as CSV or Parquet, in constant memory.
+    """
+    try:
+        export.check_format(format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    since_at, until_at = _parse_time_range(since, until)
+    chunks = database.iter_logs(since_at.isoformat() if since_at else None, until_at.isoformat() if until_at else None)
+    return _export_response(format, "trade_logs", database.get_log_columns(), chunks)
+
+@api_router.get("/export/ticks")
+def export_ticks(format: str = "csv", since: str = None, until: str = None, instrument_key: str = None, strike: float = None):
+    """
+    Streams the recorded ticks (one row per strike per recorded chain) with since <= time < until as CSV
+    or Parquet, optionally for one instrument and strike. Reads never block the tick store's writer.
+    """
+    try:
+        export.check_format(format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    since_at, until_at = _parse_time_range(since, until)
+    chunks = tick_store.iter_tick_rows(since_at.timestamp() if since_at else 0,
+                                       until_at.timestamp() if until_at else float("inf"),
+                                       instrument_key=instrument_key, strike=strike)
+    columns = [(name, tick_store.tick_column_type(name)) for name in tick_store.TICK_COLUMNS]
+    return _export_response(format, "ticks", columns, chunks)
+
+@api_router.get("/history")
+def get_history(series: str, since: str = None, until: str = None, strike: float = None, points: int = 500,
+                method: str = "lttb", instrument_key: str = upstox_api.NIFTY_INSTRUMENT_KEY):
+    """
+    Returns a recorded series (e.g. call_delta) of one strike, or all strikes, downsampled to about `points`
+    points per strike for charting. The range defaults to today so far.
+    """
+    since_at, until_at = _parse_time_range(since, until)
+    now = datetime.datetime.now()
+    since_at = since_at or now.replace(hour=0, minute=0, second=0, microsecond=0)
+    until_at = until_at or now
+    try:
+        return history.query(instrument_key, series, since_at.timestamp(), until_at.timestamp(), points, method, strike)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @api_router.get("/option-chain/{user_name}")
 def get_option_chain(user_name: str):
     """
     Returns the latest full option chain data.
     """
-    user_state = app_state["users"].get(user_name)
-    if not user_state:
-        return []
-    # Return a copy to avoid potential mutation issues
-    return list(user_state.get("option_chain_data", []))
+    # The snapshot's chain is immutable and shared; its JSON is only built when the UI asks for it
+    chain = tick_snapshot.get_tick_snapshot(app_state["users"].get(user_name)).option_chain
+    return chain.to_json() if chain is not None else []
 
 @api_router.get("/settings")
-def read_settings():
+def read_settings(request: Request):
     """
     Returns the current strategy settings from the database.
     """
-    return database.get_settings()
+    return http_cache.versioned_json(request, "settings", database.get_data_version(), database.get_settings)
 
 class SettingsUpdate(BaseModel):
     key: str
@@ -527,6 +903,93 @@ def write_settings(settings_update: SettingsUpdate):
     database.update_setting(settings_update.key, settings_update.value)
     return {"status": "success", "key": settings_update.key, "value": settings_update.value}
 
+@api_router.get("/shadow/configs")
+def read_shadow_configs():
+    """
+    Returns the shadow configs (setting overrides evaluated alongside the live strategy).
+    """
+    return database.get_shadow_configs()
+
+class ShadowConfig(BaseModel):
+    name: str
+    overrides: dict
+
+@api_router.post("/shadow/configs")
+def write_shadow_config(config: ShadowConfig):
+    try:
+        shadow.check_overrides(config.overrides)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    database.save_shadow_config(config.name, config.overrides)
+    return {"status": "success", "name": config.name, "overrides": config.overrides}
+
+@api_router.delete("/shadow/configs/{name}")
+def remove_shadow_config(name: str):
+    database.delete_shadow_config(name)
+    return {"status": "success", "name": name}
+
+@api_router.get("/shadow/ledger")
+def get_shadow_ledger(config_name: str = None):
+    """
+    Returns the shadow configs' paper trades (optionally one config's) with a per-config summary.
+    """
+    return {"summary": database.summarize_shadow_trades(), "trades": database.get_shadow_trades(config_name)}
+
+# --- Profiling (admin) ---
+# Pipeline stages that can be profiled; they are looked up in this module on every call.
+PROFILABLE_JOBS = ("fetch_and_store_data", "run_greek_confirmation", "process_5min_candle", "run_logic_controller")
+
+def check_job_profile(target: str, mode: str, runs: int):
+    if target not in PROFILABLE_JOBS:
+        raise ValueError(f"Unknown job {target!r}; use one of {', '.join(PROFILABLE_JOBS)}")
+    profiling.check_options(mode, runs)
+
+def start_job_profile(target: str, mode: str, runs: int):
+    check_job_profile(target, mode, runs)
+    profiling.profile_function(sys.modules[__name__], target, mode, runs)
+
+class ProfileRequest(BaseModel):
+    target: str          # A job name or an API path, e.g. "fetch_and_store_data" or "/api/signals"
+    mode: str = "sampling"
+    runs: int = 10
+
+@api_router.post("/admin/profile")
+def start_profile(request: ProfileRequest):
+    """
+    Profiles the next N runs of a pipeline job or N requests to an endpoint, writing pstats or collapsed
+    stacks to the profiles directory. Jobs run in the engine, so in a multi-worker deployment they are
+    armed there; endpoints are profiled in the worker that receives this request.
+    """
+    try:
+        if not request.target.startswith("/"):
+            if shared_state.ENGINE_ROLE == "consumer":
+                check_job_profile(request.target, request.mode, request.runs)
+                shared_state.post_command("profile", target=request.target, mode=request.mode, runs=request.runs)
+                return {"status": "ok", "message": f"Asked the engine to profile {request.target}."}
+            start_job_profile(request.target, request.mode, request.runs)
+        else:
+            profiling.profile_route(app, request.target, request.mode, request.runs)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"status": "ok", "message": f"Profiling {request.target} for {request.runs} runs."}
+
+@api_router.get("/admin/profile")
+def get_profile_status():
+    """
+    Returns the targets being profiled and the output files of finished sessions.
+    """
+    return profiling.get_status()
+
+@api_router.post("/admin/profile/stop")
+def stop_profile(request: ProfileRequest):
+    """
+    Stops profiling a target early and writes what was collected.
+    """
+    result = profiling.finish(request.target)
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"{request.target} is not being profiled")
+    return result
+
 class LogoutRequest(BaseModel):
     user_name: str
 
@@ -541,35 +1004,79 @@ def logout_user(request: LogoutRequest):
     if not user_state:
         return {"status": "ok", "message": "User already logged out."}
 
+    if shared_state.ENGINE_ROLE == "consumer":
+        # The producer owns the schedulers; ask it to stop this user's session.
+        shared_state.post_command("logout", user_name=user_name)
+    else:
+        stop_user_session(user_name)
+    return {"status": "ok", "message": f"User {user_name} logged out successfully."}
+
+def stop_user_session(user_name: str):
+    """
+    Shuts down a user's background jobs and exit monitor and removes their state.
+    """
+    user_state = app_state["users"].get(user_name)
+    if not user_state:
+        return
+
     scheduler = user_state.get("scheduler")
     if scheduler and scheduler.running:
         scheduler.shutdown()
         print(f"Scheduler for user '{user_name}' has been shut down.")
+    exit_monitor.stop_exit_monitor(user_state)
+    upstox_api.forget_token(user_state.get("access_token"))
 
     del app_state["users"][user_name]
-    return {"status": "ok", "message": f"User {user_name} logged out successfully."}
 
 @api_router.websocket("/ws/{user_name}")
 async def websocket_endpoint(websocket: WebSocket, user_name: str):
     """
     WebSocket endpoint to stream live data and system status to the frontend.
+    Clients that negotiate a ws_protocol subprotocol get compact delta messages with native numbers;
+    others get the original JSON payload.
     """
-    await websocket.accept()
-    print(f"WebSocket connection established for user: {user_name}")
+    protocol = ws_protocol.choose_protocol(websocket.scope.get("subprotocols", []))
+    await websocket.accept(subprotocol=protocol)
+    encoder = ws_protocol.DeltaEncoder(protocol) if protocol else None
+    print(f"WebSocket connection established for user: {user_name} ({protocol or 'json'})")
+    # Each connection broadcasts an exit reason once. The shared state itself is never mutated here,
+    # because in consumer mode it is a read-only copy of the producer's.
+    snapshot = tick_snapshot.get_tick_snapshot(app_state["users"].get(user_name))
+    sent_exit = (snapshot.last_exit_reason, snapshot.cooldown_until)
     try:
         while True:
             user_state = app_state["users"].get(user_name)
             if not user_state:
                 # If user logs out or state is cleared, send an empty payload and wait
-                await websocket.send_json({})
+                if encoder:
+                    encoder.reset()
+                else:
+                    await websocket.send_json({})
+                await asyncio.sleep(2)
+                continue
+
+            # One consistent tick: the price and Greeks always come from the same fetch
+            snapshot = tick_snapshot.get_tick_snapshot(user_state)
+
+            # Send a new exit reason only once per connection (every exit also sets a new cooldown)
+            latest_exit = (snapshot.last_exit_reason, snapshot.cooldown_until)
+            exit_reason = latest_exit[0] if latest_exit[0] and latest_exit != sent_exit else None
+            sent_exit = latest_exit
+
+            if encoder:
+                message = encoder.encode(ws_protocol.live_fields(snapshot, exit_reason, time.time()), snapshot.version)
+                if isinstance(message, bytes):
+                    await websocket.send_bytes(message)
+                elif message is not None:
+                    await websocket.send_text(message)
                 await asyncio.sleep(2)
                 continue
 
-            nifty_price = user_state["price_buffer"][-1] if user_state["price_buffer"] else "Fetching..."
-            delta = user_state["delta_buffer"][-1] if user_state["delta_buffer"] else "--"
-            gamma = user_state["gamma_buffer"][-1] if user_state["gamma_buffer"] else "--"
-            theta = user_state["theta_buffer"][-1] if user_state["theta_buffer"] else "--"
-            iv = user_state["iv_buffer"][-1] if user_state["iv_buffer"] else "--"
+            nifty_price = snapshot.latest("prices", "Fetching...")
+            delta = snapshot.latest("deltas", "--")
+            gamma = snapshot.latest("gammas", "--")
+            theta = snapshot.latest("thetas", "--")
+            iv = snapshot.latest("ivs", "--")
 
             payload = {
                 "nifty_price": f"{nifty_price:.2f}" if isinstance(nifty_price, float) else nifty_price,
@@ -577,15 +1084,11 @@ async def websocket_endpoint(websocket: WebSocket, user_name: str):
                 "gamma": f"{gamma:.4f}" if isinstance(gamma, float) else gamma,
                 "theta": f"{theta:.4f}" if isinstance(theta, float) else theta,
                 "iv": f"{iv:.4f}" if isinstance(iv, float) else iv,
-                "bias": user_state.get("bias", "Neutral"),
-                "market_type": user_state.get("market_type", "Undetermined"),
-                "candidate_setup": user_state.get("candidate_setup"),
-                "last_exit_reason": user_state.get("last_exit_reason"),
+                "bias": snapshot.bias,
+                "market_type": snapshot.market_type,
+                "candidate_setup": snapshot.candidate_setup,
+                "last_exit_reason": exit_reason,
             }
-            
-            # Clear the one-time exit reason after adding it to the payload
-            if user_state.get("last_exit_reason"):
-                user_state["last_exit_reason"] = None
 
             await websocket.send_json(payload)
             await asyncio.sleep(2)  # Send updates every 2 seconds
@@ -596,26 +1099,27 @@ async def websocket_endpoint(websocket: WebSocket, user_name: str):
 
 app.include_router(api_router)
 
-# Serve specific root-level static files directly
+# Serve specific root-level static files directly (precompressed where possible, revalidated via ETag)
 @app.get("/manifest.json")
-async def serve_manifest():
-    return FileResponse("frontend/build/manifest.json")
+async def serve_manifest(request: Request):
+    return static_files.serve_build_file(request, "frontend/build/manifest.json")
 
 @app.get("/favicon.ico")
-async def serve_favicon():
-    return FileResponse("frontend/build/favicon.ico")
+async def serve_favicon(request: Request):
+    return static_files.serve_build_file(request, "frontend/build/favicon.ico")
 
 @app.get("/logo192.png")
-async def serve_logo192():
-    return FileResponse("frontend/build/logo192.png")
+async def serve_logo192(request: Request):
+    return static_files.serve_build_file(request, "frontend/build/logo192.png")
 
-# Mount the static files directory for assets like JS, CSS, images
-app.mount("/static", StaticFiles(directory="frontend/build/static"), name="static")
+# Mount the static files directory for assets like JS, CSS, images.
+# Their names are content-hashed, so they are served precompressed with immutable cache headers.
+app.mount("/static", static_files.PrecompressedStaticFiles(directory="frontend/build/static"), name="static")
 
 @app.get("/{full_path:path}")
-async def serve_react_app(full_path: str):
+async def serve_react_app(request: Request, full_path: str):
     """
     Catch-all endpoint to serve the React app's index.html for any non-API, non-static path.
     This allows React Router to handle the routing.
     """
-    return FileResponse("frontend/build/index.html")
\ No newline at end of file
+    return static_files.serve_build_file(request, "frontend/build/index.html")
\ No newline at end of file
@@ -0,0 +1,230 @@
+import os
+import random
+import threading
+import time
+import requests
+from . import upstox_api
+
+# Which streaming feed the exit monitor subscribes to: 'upstox' (live) or 'simulated' (offline testing).
+MARKET_DATA_FEED = os.getenv("MARKET_DATA_FEED", "upstox")
+# Backoff between attempts to reconnect a dropped stream.
+RECONNECT_MIN_SECONDS = 1
+RECONNECT_MAX_SECONDS = 30
+
+# --- REST fallback ---
+
+def fetch_ltp(access_token: str, instrument_key: str) -> float | None:
+    """
+    Fetches the last traded price of a single contract from the Upstox LTP quote endpoint.
+    Used by the exit monitor when the streaming feed is unavailable.
+    """
+    try:
+        response = upstox_api.get('/market-quote/ltp', access_token, params={"instrument_key": instrument_key}, timeout=2)
+    except requests.exceptions.RequestException as e:
+        print(f"Error fetching LTP for {instrument_key}: {e}")
+        return None
+    if response.status_code != 200:
+        print(f"Error fetching LTP for {instrument_key}: {response.text}")
+        return None
+
+    # The response is keyed by the exchange symbol, not the instrument key, so match on instrument_token.
+    quotes = response.json().get("data", {})
+    for quote in quotes.values():
+        if quote.get("instrument_token") == instrument_key or len(quotes) == 1:
+            return quote.get("last_price")
+    return None
+
+# --- Streaming feeds ---
+# A feed delivers (instrument_key, ltp) updates to a callback for every subscribed contract.
+# `is_connected()` lets the exit monitor notice a dropped stream and fall back to polling.
+
+class SimulatedFeed:
+    """
+    A local market-data feed that emits a random walk for each subscribed contract.
+    Prices can be forced with `set_price` and the stream can be dropped with `disconnect`,
+    so exit behaviour can be exercised offline.
+    """
+
+    def __init__(self, interval: float = 0.1, volatility: float = 0.002):
+        self.interval = interval
+        self.volatility = volatility
+        self._prices = {}
+        self._callbacks = {}
+        self._lock = threading.Lock()
+        self._connected = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def subscribe(self, instrument_key: str, callback, initial_price: float | None = None):
+        with self._lock:
+            self._callbacks[instrument_key] = callback
+            if initial_price:
+                self._prices[instrument_key] = initial_price
+            self._prices.setdefault(instrument_key, 100.0)
+
+    def unsubscribe(self, instrument_key: str):
+        with self._lock:
+            self._callbacks.pop(instrument_key, None)
+            self._prices.pop(instrument_key, None)
+
+    def set_price(self, instrument_key: str, price: float):
+        with self._lock:
+            self._prices[instrument_key] = price
+
+    def disconnect(self):
+        self._connected = False
+
+    def reconnect(self):
+        self._connected = True
+
+    def is_connected(self) -> bool:
+        return self._connected
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            if not self._connected:
+                continue
+            with self._lock:
+                updates = []
+                for key, price in self._prices.items():
+                    price = max(0.05, price * (1 + random.gauss(0, self.volatility)))
+                    self._prices[key] = price
+                    if key in self._callbacks:
+                        updates.append((self._callbacks[key], key, round(price, 2)))
+            for callback, key, price in updates:
+                callback(key, price)
+
+class UpstoxFeed:
+    """
+    Streams LTP updates for one access token from the Upstox market data websocket.
+    Requires the optional `upstox-python-sdk` package; without it the feed never connects
+    and the exit monitor stays on REST polling.
+    A dropped stream is reconnected with exponential backoff (reset once updates flow again), so after
+    a network blip the exit monitor switches back from polling to the stream.
+    """
+
+    def __init__(self, access_token: str):
+        self.access_token = access_token
+        self._callbacks = {}
+        self._streamer = None
+        self._connected = False
+        self._closing = False
+        self._reconnect_timer = None
+        self._reconnect_delay = RECONNECT_MIN_SECONDS
+        self._lock = threading.Lock()
+
+    def subscribe(self, instrument_key: str, callback, initial_price: float | None = None):
+        self._callbacks[instrument_key] = callback
+        if self._streamer is None and self._reconnect_timer is None:
+            self._connect()
+        elif self._connected:
+            self._streamer.subscribe([instrument_key], "ltpc")
+
+    def unsubscribe(self, instrument_key: str):
+        self._callbacks.pop(instrument_key, None)
+        if self._streamer is not None and self._connected:
+            try:
+                self._streamer.unsubscribe([instrument_key])
+            except Exception as e:
+                print(f"Error unsubscribing {instrument_key} from Upstox feed: {e}")
+        if not self._callbacks:
+            self.disconnect()
+
+    def disconnect(self):
+        with self._lock:
+            self._closing = True
+            if self._reconnect_timer is not None:
+                self._reconnect_timer.cancel()
+                self._reconnect_timer = None
+            streamer, self._streamer = self._streamer, None
+            self._connected = False
+        if streamer is not None:
+            try:
+                streamer.disconnect()
+            except Exception as e:
+                print(f"Error closing Upstox feed: {e}")
+
+    def is_connected(self) -> bool:
+        return self._connected
+
+    def _connect(self):
+        try:
+            import upstox_client
+        except ImportError:
+            print("upstox-python-sdk is not installed; streaming feed unavailable, using REST polling.")
+            return
+
+        self._closing = False
+        try:
+            configuration = upstox_client.Configuration()
+            configuration.access_token = self.access_token
+            streamer = upstox_client.MarketDataStreamer(
+                upstox_client.ApiClient(configuration), list(self._callbacks), "ltpc"
+            )
+            # Events of a replaced streamer are ignored
+            streamer.on("open", lambda *args: self._on_open(streamer))
+            streamer.on("message", self._on_message)
+            streamer.on("close", lambda *args: self._on_close(streamer, *args))
+            streamer.on("error", lambda *args: self._on_close(streamer, *args))
+        except Exception as e:
+            print(f"Error creating Upstox feed: {e}")
+            self._schedule_reconnect()
+            return
+        self._streamer = streamer
+        threading.Thread(target=streamer.connect, daemon=True).start()
+
+    def _schedule_reconnect(self):
+        with self._lock:
+            if self._closing or not self._callbacks or self._reconnect_timer is not None:
+                return
+            delay = self._reconnect_delay
+            self._reconnect_delay = min(delay * 2, RECONNECT_MAX_SECONDS)
+            self._reconnect_timer = threading.Timer(delay, self._reconnect)
+            self._reconnect_timer.daemon = True
+            self._reconnect_timer.start()
+        print(f"Reconnecting the Upstox market data feed in {delay:g}s.")
+
+    def _reconnect(self):
+        with self._lock:
+            self._reconnect_timer = None
+            if self._closing or not self._callbacks:
+                return
+        self._connect()
+
+    def _on_open(self, streamer):
+        if streamer is not self._streamer:
+            return
+        self._connected = True
+        print("Upstox market data feed connected.")
+
+    def _on_close(self, streamer, *args):
+        with self._lock:
+            if streamer is not self._streamer:
+                return  # Already handled (errors are followed by a close), or replaced
+            self._streamer = None
+            self._connected = False
+        print(f"Upstox market data feed closed: {args}")
+        self._schedule_reconnect()
+
+    def _on_message(self, message):
+        self._reconnect_delay = RECONNECT_MIN_SECONDS  # Updates are flowing: the connection is healthy
+        for instrument_key, feed in message.get("feeds", {}).items():
+            ltpc = feed.get("ltpc") or feed.get("ff", {}).get("marketFF", {}).get("ltpc", {})
+            callback = self._callbacks.get(instrument_key)
+            if callback and ltpc.get("ltp") is not None:
+                callback(instrument_key, ltpc["ltp"])
+
+_simulated_feed = None
+
+def get_feed(access_token: str):
+    """
+    Returns the feed configured by MARKET_DATA_FEED.
+    The simulated feed is shared by the whole process; the Upstox feed is per access token.
+    """
+    global _simulated_feed
+    if MARKET_DATA_FEED == "simulated":
+        if _simulated_feed is None:
+            _simulated_feed = SimulatedFeed()
+        return _simulated_feed
+    return UpstoxFeed(access_token)
@@ -0,0 +1,137 @@
+"""
+Local stand-ins for the alert sinks (a webhook receiver, the Telegram Bot API and an SMTP server), for
+exercising backend.alerts offline.
+
+Run it with:
+    python -m backend.mock_alerts --port 9100 --smtp-port 9125 --latency-ms 20 --error-rate 0.1
+and point the backend at it:
+    ALERT_WEBHOOK_URL=http://localhost:9100/webhook
+    TELEGRAM_BOT_TOKEN=test TELEGRAM_CHAT_ID=1 TELEGRAM_API_BASE_URL=http://localhost:9100
+    ALERT_EMAIL_TO=me@localhost SMTP_HOST=localhost SMTP_PORT=9125 SMTP_STARTTLS=0
+
+Everything received is kept in memory and listed by GET /received. A fraction of requests (and SMTP
+messages) fails with a retryable error, to exercise the dispatcher's retries.
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+config = {
+    "latency_ms": float(os.getenv("MOCK_ALERTS_LATENCY_MS", "20")),   # Mean added latency per request
+    "error_rate": float(os.getenv("MOCK_ALERTS_ERROR_RATE", "0.0")),  # Fraction answered with 429/503 (SMTP 451)
+    "host": "127.0.0.1",
+    "smtp_port": int(os.getenv("MOCK_ALERTS_SMTP_PORT", "9125")),
+}
+
+app = FastAPI(title="Mock alert sinks")
+
+_received = {"webhook": [], "telegram": [], "email": []}   # sink -> [(received_at, payload)]
+
+async def _simulate_network() -> bool:
+    """Waits for the simulated latency. Returns True if this request should fail."""
+    delay_ms = random.gauss(config["latency_ms"], config["latency_ms"] / 4)
+    if delay_ms > 0:
+        await asyncio.sleep(delay_ms / 1000)
+    return random.random() < config["error_rate"]
+
+# --- HTTP sinks ---
+
+@app.post("/webhook")
+async def webhook(request: Request):
+    if await _simulate_network():
+        return JSONResponse(status_code=503, content={"error": "unavailable"}, headers={"Retry-After": "1"})
+    _received["webhook"].append((time.time(), await request.json()))
+    return {"ok": True}
+
+@app.post("/bot{token}/sendMessage")
+async def telegram_send_message(token: str, request: Request):
+    """Answers like the Bot API, including its 429 with parameters.retry_after."""
+    if await _simulate_network():
+        return JSONResponse(status_code=429, content={"ok": False, "error_code": 429, "description": "Too Many Requests: retry after 1",
+                                                      "parameters": {"retry_after": 1}})
+    message = await request.json()
+    if not message.get("chat_id") or not message.get("text"):
+        return JSONResponse(status_code=400, content={"ok": False, "error_code": 400, "description": "Bad Request: message text is empty"})
+    _received["telegram"].append((time.time(), {**message, "token": token}))
+    return {"ok": True, "result": {"message_id": len(_received["telegram"]), "chat": {"id": message["chat_id"]}, "text": message["text"]}}
+
+@app.get("/received")
+async def received():
+    """Everything received so far, per sink."""
+    return {sink: [{"received_at": at, "payload": payload} for at, payload in items] for sink, items in _received.items()}
+
+@app.delete("/received")
+async def clear_received():
+    for items in _received.values():
+        items.clear()
+    return {"ok": True}
+
+# --- SMTP ---
+
+async def _smtp_session(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """Just enough SMTP for smtplib: EHLO/HELO, MAIL, RCPT, DATA, RSET, NOOP, QUIT (no TLS, any AUTH)."""
+    async def reply(line: str):
+        writer.write(f"{line}\r\n".encode())
+        await writer.drain()
+
+    await reply("220 mock_alerts ESMTP")
+    envelope = {"from": None, "to": []}
+    try:
+        while line := await reader.readline():
+            command = line.decode(errors="replace").strip()
+            verb = command[:4].upper()
+            if verb == "EHLO":
+                await reply("250-mock_alerts\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME")
+            elif verb == "HELO":
+                await reply("250 mock_alerts")
+            elif verb == "AUTH":
+                await reply("235 Authentication successful")
+            elif verb == "MAIL":
+                envelope = {"from": command[10:].strip("<> "), "to": []}
+                await reply("250 OK")
+            elif verb == "RCPT":
+                envelope["to"].append(command[8:].strip("<> "))
+                await reply("250 OK")
+            elif verb == "DATA":
+                await reply("354 End data with <CR><LF>.<CR><LF>")
+                lines = []
+                while (data := await reader.readline()) not in (b".\r\n", b""):
+                    lines.append(data[1:] if data.startswith(b"..") else data)
+                if await _simulate_network():
+                    await reply("451 Temporary failure, try again later")
+                else:
+                    _received["email"].append((time.time(), {**envelope, "message": b"".join(lines).decode(errors="replace")}))
+                    await reply("250 OK: queued")
+            elif verb in ("RSET", "NOOP"):
+                await reply("250 OK")
+            elif verb == "QUIT":
+                await reply("221 Bye")
+                break
+            else:
+                await reply("502 Command not implemented")
+    finally:
+        writer.close()
+
+@app.on_event("startup")
+async def start_smtp_server():
+    app.state.smtp_server = await asyncio.start_server(_smtp_session, config["host"], config["smtp_port"])
+
+def main():
+    parser = argparse.ArgumentParser(description="Run local stand-ins for the alert sinks.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--smtp-port", type=int, default=config["smtp_port"])
+    parser.add_argument("--latency-ms", type=float, default=config["latency_ms"])
+    parser.add_argument("--error-rate", type=float, default=config["error_rate"])
+    args = parser.parse_args()
+    config.update({"host": args.host, "latency_ms": args.latency_ms, "error_rate": args.error_rate, "smtp_port": args.smtp_port})
+
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
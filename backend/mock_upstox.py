@@ -0,0 +1,349 @@
+"""
+A local stand-in for the Upstox API, for offline integration and load testing.
+
+Run it with:
+    python -m backend.mock_upstox --port 9000 --latency-ms 40 --error-rate 0.01 --strikes 60
+and point the backend at it:
+    UPSTOX_API_BASE_URL=http://localhost:9000
+
+It implements the option chain, LTP quote, intraday candle, order placement, user profile and OAuth
+token/dialog endpoints.
+Option chains evolve continuously: the underlying follows a random walk in wall-clock time and
+every strike is priced with Black-Scholes off a simple volatility smile.
+"""
+import argparse
+import asyncio
+import datetime
+import math
+import os
+import random
+import threading
+import time
+import urllib.parse
+import uuid
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, RedirectResponse
+
+# --- Configuration (environment variables, overridable from the command line) ---
+config = {
+    "latency_ms": float(os.getenv("MOCK_UPSTOX_LATENCY_MS", "30")),         # Mean added latency per request
+    "latency_jitter_ms": float(os.getenv("MOCK_UPSTOX_LATENCY_JITTER_MS", "10")),
+    "error_rate": float(os.getenv("MOCK_UPSTOX_ERROR_RATE", "0.0")),        # Fraction of requests answered with 429/500
+    "strikes": int(os.getenv("MOCK_UPSTOX_STRIKES", "40")),                 # Strikes per chain
+    "annual_volatility": float(os.getenv("MOCK_UPSTOX_VOLATILITY", "0.15")),
+}
+
+# Starting spot and strike step for the instruments we know; anything else starts at 10000.
+KNOWN_UNDERLYINGS = {
+    "NSE_INDEX|Nifty 50": (25000.0, 50),
+    "NSE_INDEX|Nifty Bank": (55000.0, 100),
+    "BSE_INDEX|SENSEX": (82000.0, 100),
+}
+RISK_FREE_RATE = 0.065
+SECONDS_PER_YEAR = 365 * 24 * 3600
+
+app = FastAPI(title="Mock Upstox API")
+
+_lock = threading.Lock()
+_underlyings = {}      # instrument_key -> {"spot", "updated", "step", "open"}
+_contracts = {}        # option instrument_key -> (underlying_key, expiry, strike, 'CE'|'PE')
+_contract_ids = {}     # (underlying_key, expiry, strike, side) -> option instrument_key
+_tokens = {}           # access_token -> user name
+_orders = []           # Orders placed, as received (with the user and order id)
+
+# --- Market model ---
+
+def _norm_cdf(x: float) -> float:
+    return 0.5 * (1 + math.erf(x / math.sqrt(2)))
+
+def _norm_pdf(x: float) -> float:
+    return math.exp(-0.5 * x * x) / math.sqrt(2 * math.pi)
+
+def _black_scholes(spot: float, strike: float, years: float, vol: float, side: str) -> dict:
+    """Prices one option and returns its Greeks in Upstox units (theta per day, vega per 1 vol point, IV in %)."""
+    sqrt_t = math.sqrt(years)
+    d1 = (math.log(spot / strike) + (RISK_FREE_RATE + 0.5 * vol * vol) * years) / (vol * sqrt_t)
+    d2 = d1 - vol * sqrt_t
+    discount = math.exp(-RISK_FREE_RATE * years)
+    if side == "CE":
+        price = spot * _norm_cdf(d1) - strike * discount * _norm_cdf(d2)
+        delta = _norm_cdf(d1)
+        theta = -spot * _norm_pdf(d1) * vol / (2 * sqrt_t) - RISK_FREE_RATE * strike * discount * _norm_cdf(d2)
+        pop = _norm_cdf(d2) * 100
+    else:
+        price = strike * discount * _norm_cdf(-d2) - spot * _norm_cdf(-d1)
+        delta = _norm_cdf(d1) - 1
+        theta = -spot * _norm_pdf(d1) * vol / (2 * sqrt_t) + RISK_FREE_RATE * strike * discount * _norm_cdf(-d2)
+        pop = _norm_cdf(-d2) * 100
+    return {
+        "price": max(price, 0.05),
+        "delta": round(delta, 4),
+        "gamma": round(_norm_pdf(d1) / (spot * vol * sqrt_t), 6),
+        "theta": round(theta / 365, 4),
+        "vega": round(spot * _norm_pdf(d1) * sqrt_t / 100, 4),
+        "iv": round(vol * 100, 2),
+        "pop": round(pop, 2),
+    }
+
+def _advance_underlying(instrument_key: str) -> dict:
+    """Moves the underlying along a geometric random walk for the wall-clock time since its last update."""
+    now = time.time()
+    underlying = _underlyings.get(instrument_key)
+    if underlying is None:
+        spot, step = KNOWN_UNDERLYINGS.get(instrument_key, (10000.0, 50))
+        underlying = {"spot": spot, "open": spot, "step": step, "updated": now}
+        _underlyings[instrument_key] = underlying
+    elapsed = now - underlying["updated"]
+    if elapsed > 0:
+        sigma = config["annual_volatility"] * math.sqrt(elapsed / SECONDS_PER_YEAR) * 4  # Intraday moves a bit livelier than annualized vol
+        underlying["spot"] *= math.exp(random.gauss(0, sigma))
+        underlying["updated"] = now
+    return underlying
+
+def _contract_key(underlying_key: str, expiry: str, strike: float, side: str) -> str:
+    ident = (underlying_key, expiry, strike, side)
+    if ident not in _contract_ids:
+        key = f"NSE_FO|{40000 + len(_contract_ids)}"
+        _contract_ids[ident] = key
+        _contracts[key] = ident
+    return _contract_ids[ident]
+
+def _years_to_expiry(expiry: str) -> float:
+    try:
+        expiry_close = datetime.datetime.strptime(expiry, "%Y-%m-%d").replace(hour=10)  # 3:30 PM IST in UTC
+    except ValueError:
+        expiry_close = datetime.datetime.utcnow() + datetime.timedelta(days=3)
+    seconds = (expiry_close - datetime.datetime.utcnow()).total_seconds()
+    return max(seconds, 3600) / SECONDS_PER_YEAR
+
+def _option_side(underlying_key: str, expiry: str, strike: float, side: str, spot: float, years: float) -> dict:
+    moneyness = math.log(strike / spot)
+    vol = config["annual_volatility"] * (1 + 4 * moneyness * moneyness - 0.5 * moneyness)  # Mild smile with put skew
+    bs = _black_scholes(spot, strike, years, vol, side)
+    ltp = round(bs["price"] * (1 + random.gauss(0, 0.002)), 2)
+    spread = max(0.05, round(ltp * 0.004, 2))
+    depth = random.randint(1, 40) * 75
+    activity = math.exp(-abs(moneyness) * 40)  # Near-the-money strikes trade more
+    return {
+        "instrument_key": _contract_key(underlying_key, expiry, strike, side),
+        "market_data": {
+            "ltp": ltp,
+            "volume": int(activity * 5_000_000 * random.uniform(0.9, 1.1)),
+            "oi": int(activity * 8_000_000 * random.uniform(0.95, 1.05)),
+            "close_price": round(bs["price"], 2),
+            "bid_price": round(max(0.05, ltp - spread / 2), 2),
+            "bid_qty": depth,
+            "ask_price": round(ltp + spread / 2, 2),
+            "ask_qty": random.randint(1, 40) * 75,
+            "prev_oi": int(activity * 7_500_000),
+        },
+        "option_greeks": {k: bs[k] for k in ("vega", "theta", "gamma", "delta", "iv", "pop")},
+    }
+
+def build_option_chain(underlying_key: str, expiry: str, strikes: int) -> list:
+    """Builds an Upstox-shaped option chain around the current spot."""
+    with _lock:
+        underlying = _advance_underlying(underlying_key)
+        spot, step = underlying["spot"], underlying["step"]
+        years = _years_to_expiry(expiry)
+        atm = round(spot / step) * step
+        chain = []
+        for i in range(-(strikes // 2), strikes - strikes // 2):
+            strike = float(atm + i * step)
+            call = _option_side(underlying_key, expiry, strike, "CE", spot, years)
+            put = _option_side(underlying_key, expiry, strike, "PE", spot, years)
+            chain.append({
+                "expiry": expiry,
+                "pcr": round(put["market_data"]["oi"] / max(call["market_data"]["oi"], 1), 4),
+                "strike_price": strike,
+                "underlying_key": underlying_key,
+                "underlying_spot_price": round(spot, 2),
+                "call_options": call,
+                "put_options": put,
+            })
+        return chain
+
+# --- Request shaping: latency, errors and auth ---
+
+async def _simulate_network():
+    delay_ms = random.gauss(config["latency_ms"], config["latency_jitter_ms"])
+    if delay_ms > 0:
+        await asyncio.sleep(delay_ms / 1000)
+    if random.random() < config["error_rate"]:
+        if random.random() < 0.5:
+            return _error(429, "UDAPI10005", "Too many requests")
+        return _error(500, "UDAPI100500", "Something went wrong")
+    return None
+
+def _error(status_code: int, code: str, message: str) -> JSONResponse:
+    return JSONResponse(status_code=status_code, content={
+        "status": "error",
+        "errors": [{"errorCode": code, "message": message, "propertyPath": None, "invalidValue": None}],
+    })
+
+def _authorized_user(request: Request) -> str | None:
+    header = request.headers.get("authorization", "")
+    if not header.startswith("Bearer "):
+        return None
+    return _tokens.get(header[len("Bearer "):])
+
+# --- Endpoints ---
+
+@app.get("/login/authorization/dialog")
+async def authorization_dialog(client_id: str, redirect_uri: str, state: str = "", response_type: str = "code"):
+    """Skips the login page and redirects straight back with an authorization code."""
+    return RedirectResponse(url=f"{redirect_uri}?code=mock-{uuid.uuid4().hex[:8]}&state={state}")
+
+@app.post("/login/authorization/token")
+async def authorization_token(request: Request):
+    error = await _simulate_network()
+    if error:
+        return error
+    # Parse the urlencoded form by hand so the mock doesn't need python-multipart
+    form = {k: v[0] for k, v in urllib.parse.parse_qs((await request.body()).decode()).items()}
+    if not form.get("code") or not form.get("client_id"):
+        return _error(400, "UDAPI100069", "Invalid authorization code")
+    user_name = form["client_id"].lower()
+    access_token = f"mock-{uuid.uuid4().hex}"
+    _tokens[access_token] = user_name
+    return {
+        "email": f"{user_name}@example.com",
+        "exchanges": ["NSE", "NFO", "BSE", "BFO"],
+        "products": ["D", "I", "CO"],
+        "broker": "UPSTOX",
+        "user_id": user_name.upper()[:6],
+        "user_name": user_name,
+        "order_types": ["MARKET", "LIMIT", "SL", "SL-M"],
+        "user_type": "individual",
+        "poa": False,
+        "is_active": True,
+        "access_token": access_token,
+        "extended_token": None,
+    }
+
+@app.get("/user/profile")
+async def user_profile(request: Request):
+    error = await _simulate_network()
+    if error:
+        return error
+    user_name = _authorized_user(request)
+    if not user_name:
+        return _error(401, "UDAPI100050", "Invalid token used to access API")
+    return {"status": "success", "data": {
+        "email": f"{user_name}@example.com",
+        "exchanges": ["NSE", "NFO"],
+        "products": ["D", "I"],
+        "broker": "UPSTOX",
+        "user_id": user_name.upper()[:6],
+        "user_name": user_name,
+        "order_types": ["MARKET", "LIMIT", "SL", "SL-M"],
+        "user_type": "individual",
+        "poa": False,
+        "is_active": True,
+    }}
+
+@app.get("/option/chain")
+async def option_chain(request: Request, instrument_key: str, expiry_date: str):
+    error = await _simulate_network()
+    if error:
+        return error
+    if not _authorized_user(request):
+        return _error(401, "UDAPI100050", "Invalid token used to access API")
+    return {"status": "success", "data": build_option_chain(instrument_key, expiry_date, config["strikes"])}
+
+@app.get("/market-quote/ltp")
+async def market_quote_ltp(request: Request, instrument_key: str):
+    error = await _simulate_network()
+    if error:
+        return error
+    if not _authorized_user(request):
+        return _error(401, "UDAPI100050", "Invalid token used to access API")
+    data = {}
+    with _lock:
+        for key in instrument_key.split(","):
+            if key in _contracts:
+                underlying_key, expiry, strike, side = _contracts[key]
+                spot = _advance_underlying(underlying_key)["spot"]
+                option = _option_side(underlying_key, expiry, strike, side, spot, _years_to_expiry(expiry))
+                last_price = option["market_data"]["ltp"]
+            elif key in _underlyings or "_INDEX|" in key:
+                last_price = round(_advance_underlying(key)["spot"], 2)
+            else:
+                continue
+            data[key.replace("|", ":")] = {"last_price": last_price, "instrument_token": key}
+    return {"status": "success", "data": data}
+
+@app.post("/order/place")
+async def place_order(request: Request):
+    """Accepts any well-formed order; nothing is matched or filled."""
+    error = await _simulate_network()
+    if error:
+        return error
+    user_name = _authorized_user(request)
+    if not user_name:
+        return _error(401, "UDAPI100050", "Invalid token used to access API")
+    try:
+        order = await request.json()
+    except ValueError:
+        return _error(400, "UDAPI1004", "Invalid request body")
+    missing = [field for field in ("quantity", "product", "instrument_token", "order_type", "transaction_type") if field not in order]
+    if missing:
+        return _error(400, "UDAPI1004", f"Missing fields: {', '.join(missing)}")
+    order_id = f"{datetime.datetime.now():%y%m%d}{len(_orders) + 1:09d}"
+    _orders.append({**order, "user_name": user_name, "order_id": order_id})
+    return {"status": "success", "data": {"order_id": order_id}}
+
+@app.get("/historical-candle/intraday/{instrument_key:path}/{interval}")
+async def intraday_candles(request: Request, instrument_key: str, interval: str):
+    """Today's 1-minute candles from the 9:15 IST open until now, newest first, ending at the current spot."""
+    error = await _simulate_network()
+    if error:
+        return error
+    if not _authorized_user(request):
+        return _error(401, "UDAPI100050", "Invalid token used to access API")
+    ist = datetime.timezone(datetime.timedelta(hours=5, minutes=30))
+    now = datetime.datetime.now(ist).replace(second=0, microsecond=0)
+    now = min(now, now.replace(hour=15, minute=30))
+    session_open = now.replace(hour=9, minute=15)
+    minutes = max(0, int((now - session_open).total_seconds() // 60))
+    with _lock:
+        price = _advance_underlying(instrument_key)["spot"]
+    # Walk backwards from the current spot, seeded by date so repeated calls agree
+    rng = random.Random(f"{instrument_key}{now.date()}")
+    sigma = config["annual_volatility"] * math.sqrt(60 / SECONDS_PER_YEAR) * 4
+    candles = []
+    for i in range(1, minutes + 1):
+        close = price
+        candle_open = close * math.exp(rng.gauss(0, sigma))
+        wick = abs(rng.gauss(0, sigma)) * close
+        candles.append([
+            (now - datetime.timedelta(minutes=i)).isoformat(),
+            round(candle_open, 2), round(max(candle_open, close) + wick, 2), round(min(candle_open, close) - wick, 2),
+            round(close, 2), 0, 0,
+        ])
+        price = candle_open
+    return {"status": "success", "data": {"candles": candles}}
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local mock of the Upstox API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency-ms", type=float, default=config["latency_ms"])
+    parser.add_argument("--latency-jitter-ms", type=float, default=config["latency_jitter_ms"])
+    parser.add_argument("--error-rate", type=float, default=config["error_rate"])
+    parser.add_argument("--strikes", type=int, default=config["strikes"])
+    parser.add_argument("--volatility", type=float, default=config["annual_volatility"])
+    args = parser.parse_args()
+    config.update({
+        "latency_ms": args.latency_ms,
+        "latency_jitter_ms": args.latency_jitter_ms,
+        "error_rate": args.error_rate,
+        "strikes": args.strikes,
+        "annual_volatility": args.volatility,
+    })
+
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
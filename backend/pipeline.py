@@ -0,0 +1,143 @@
+import time
+from collections import deque
+import numpy as np
+
+# Number of latency samples kept per stage for each user.
+LATENCY_SAMPLES = 200
+
+# Candles are aligned to 5-minute marks, the same as process_5min_candle.
+CANDLE_SECONDS = 300
+# A candle whose first tick came later than this after its 5-minute mark only saw part of the move.
+MAX_CANDLE_START_GAP_SECONDS = 60
+
+# Poll interval used until the first adaptive decision (and by default).
+DEFAULT_POLL_INTERVAL_SECONDS = 10
+
+def get_default_latency_state():
+    """Returns a new latency tracking structure for a single user."""
+    return {
+        "fetch_ms": deque(maxlen=LATENCY_SAMPLES),
+        "greeks_ms": deque(maxlen=LATENCY_SAMPLES),
+        "candle_ms": deque(maxlen=LATENCY_SAMPLES),
+        "logic_ms": deque(maxlen=LATENCY_SAMPLES),
+        "tick_to_decision_ms": deque(maxlen=LATENCY_SAMPLES),
+    }
+
+def record_stage(user_state: dict, stage: str, started: float) -> float:
+    """
+    Records how long a pipeline stage took, measured from `started` (a time.perf_counter() value).
+    Returns the elapsed time in milliseconds.
+    """
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    latency = user_state.setdefault("latency", get_default_latency_state())
+    latency.setdefault(stage, deque(maxlen=LATENCY_SAMPLES)).append(elapsed_ms)
+    return elapsed_ms
+
+def candle_bucket(epoch_seconds: float) -> int:
+    """Returns the index of the 5-minute bucket a timestamp falls into."""
+    return int(epoch_seconds // CANDLE_SECONDS)
+
+def is_candle_close(user_state: dict, epoch_seconds: float) -> bool:
+    """
+    Returns True on the first tick after a 5-minute boundary.
+    The very first tick of a session only records its bucket, since no candle has been building yet.
+    """
+    bucket = candle_bucket(epoch_seconds)
+    last_bucket = user_state.get("last_candle_bucket")
+    user_state["last_candle_bucket"] = bucket
+    return last_bucket is not None and bucket != last_bucket
+
+def update_forming_candle(user_state: dict, price: float, epoch_seconds: float):
+    """
+    Folds a tick's price into the 5-minute candle currently forming.
+    Building the candle tick by tick keeps it correct whatever the polling interval is.
+    """
+    if price is None:
+        return
+    bucket = candle_bucket(epoch_seconds)
+    candle = user_state.get("forming_candle")
+    if candle is None or candle["bucket"] != bucket:
+        user_state["forming_candle"] = {
+            "bucket": bucket, "first_tick_at": epoch_seconds,
+            "open": price, "high": price, "low": price, "close": price,
+        }
+        return
+    candle["high"] = max(candle["high"], price)
+    candle["low"] = min(candle["low"], price)
+    candle["close"] = price
+
+def is_candle_complete(candle: dict | None) -> bool:
+    """True if the candle has been forming since (close to) its 5-minute mark."""
+    return bool(candle) and candle["first_tick_at"] - candle["bucket"] * CANDLE_SECONDS <= MAX_CANDLE_START_GAP_SECONDS
+
+def choose_poll_interval(user_state: dict, settings: dict) -> int:
+    """
+    Picks the fetch interval for the next tick:
+    fast while a candidate is pending or a trade is open, slow in quiet, range-bound periods.
+    """
+    if user_state.get("candidate_setup"):
+        return int(float(settings.get("poll_interval_active_seconds", 3)))
+    quiet = (
+        user_state.get("market_type") not in ("Trendy", "Volatile")
+        and user_state["price_action_state"].get("status") == "LOOKING_FOR_BOS"
+    )
+    if quiet:
+        return int(float(settings.get("poll_interval_quiet_seconds", 20)))
+    return int(float(settings.get("poll_interval_default_seconds", DEFAULT_POLL_INTERVAL_SECONDS)))
+
+# --- Fetch health: backoff, circuit breaker and staleness ---
+# After this many consecutive failed fetches the circuit opens and the user's data is marked stale.
+CIRCUIT_BREAKER_FAILURES = 3
+# Failed fetches are retried after 2s, 4s, 8s, ... up to this cap.
+BACKOFF_BASE_SECONDS = 2
+BACKOFF_MAX_SECONDS = 60
+# The exit monitor, which decides between fetches, ignores Greeks from ticks older than this.
+DEFAULT_MAX_TICK_AGE_SECONDS = 30
+
+def get_default_fetch_health() -> dict:
+    return {"consecutive_failures": 0, "retry_at": 0.0, "circuit_open": False, "last_tick_at": None}
+
+def fetch_allowed(user_state: dict, now: float) -> bool:
+    """False while a failed fetch is backing off. Once the backoff has passed, one trial fetch is let through."""
+    return now >= user_state["fetch_health"]["retry_at"]
+
+def record_fetch_success(user_state: dict, now: float):
+    health = user_state["fetch_health"]
+    if health["circuit_open"]:
+        print("Option chain fetch recovered; circuit closed.")
+    health.update(consecutive_failures=0, retry_at=0.0, circuit_open=False, last_tick_at=now)
+
+def record_fetch_failure(user_state: dict, now: float):
+    """Backs off exponentially and opens the circuit after repeated failures."""
+    health = user_state["fetch_health"]
+    health["consecutive_failures"] += 1
+    failures = health["consecutive_failures"]
+    health["retry_at"] = now + min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** (failures - 1))
+    if failures >= CIRCUIT_BREAKER_FAILURES and not health["circuit_open"]:
+        health["circuit_open"] = True
+        print(f"Option chain fetch failed {failures} times in a row; circuit open, data marked stale.")
+
+def is_tick_stale(user_state: dict, now: float, max_age: float = DEFAULT_MAX_TICK_AGE_SECONDS) -> bool:
+    """True if the buffers can't be trusted: the circuit is open or the last tick is too old."""
+    return is_health_stale(user_state["fetch_health"], now, max_age)
+
+def is_health_stale(health: dict, now: float, max_age: float = DEFAULT_MAX_TICK_AGE_SECONDS) -> bool:
+    return health["circuit_open"] or health["last_tick_at"] is None or now - health["last_tick_at"] > max_age
+
+def summarize_latency(user_state: dict) -> dict:
+    """
+    Summarizes the recorded stage latencies as p50/p95/max in milliseconds.
+    """
+    summary = {}
+    for stage, samples in user_state.get("latency", {}).items():
+        if not samples:
+            continue
+        values = np.fromiter(samples, dtype=float)
+        summary[stage] = {
+            "count": len(values),
+            "last": round(float(values[-1]), 2),
+            "p50": round(float(np.percentile(values, 50)), 2),
+            "p95": round(float(np.percentile(values, 95)), 2),
+            "max": round(float(values.max()), 2),
+        }
+    return summary
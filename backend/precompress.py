@@ -0,0 +1,59 @@
+"""
+Writes gzip (and, if the brotli package is installed, brotli) copies of the frontend build's text
+assets next to the originals, for backend.static_files to serve without compressing per request.
+
+    python -m backend.precompress [frontend/build]
+
+Runs automatically after `npm run build` (the frontend's postbuild script).
+"""
+import gzip
+import sys
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:  # Optional; gzip alone is still a large saving
+    brotli = None
+
+DEFAULT_BUILD_DIR = Path(__file__).resolve().parent.parent / "frontend" / "build"
+COMPRESSIBLE_SUFFIXES = {".js", ".css", ".html", ".json", ".map", ".svg", ".txt", ".ico"}
+# Below this, compression saves less than the extra header costs.
+MIN_SIZE_BYTES = 1024
+
+def compress_file(path: Path) -> list:
+    """Writes path.gz (and path.br) if missing or older than the file. Returns the encodings written."""
+    data = path.read_bytes()
+    written = []
+    targets = [(".gz", lambda: gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        targets.append((".br", lambda: brotli.compress(data, quality=11)))
+    for suffix, compress in targets:
+        target = path.with_name(path.name + suffix)
+        if target.exists() and target.stat().st_mtime >= path.stat().st_mtime:
+            continue
+        compressed = compress()
+        # Not worth serving if it barely shrinks (e.g. already-compressed formats)
+        if len(compressed) >= len(data) * 0.9:
+            continue
+        target.write_bytes(compressed)
+        written.append(suffix)
+    return written
+
+def precompress(build_dir: Path) -> int:
+    count = 0
+    original_bytes = 0
+    for path in sorted(build_dir.rglob("*")):
+        if not path.is_file() or path.suffix not in COMPRESSIBLE_SUFFIXES or path.stat().st_size < MIN_SIZE_BYTES:
+            continue
+        if compress_file(path):
+            count += 1
+            original_bytes += path.stat().st_size
+    print(f"Precompressed {count} files ({original_bytes / 1024:.0f} KB) in {build_dir}"
+          + ("" if brotli else " (gzip only; install brotli for .br copies)"))
+    return count
+
+if __name__ == "__main__":
+    build_dir = Path(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_BUILD_DIR
+    if not build_dir.is_dir():
+        sys.exit(f"Build directory {build_dir} does not exist; run `npm run build` first.")
+    precompress(build_dir)
@@ -0,0 +1,203 @@
+"""
+On-demand profiling of pipeline jobs and API endpoints, for the next N runs.
+
+A target is profiled by swapping it for a profiling wrapper (a module-level function, or a route's
+endpoint) and swapping the original back after N runs, so while profiling is off nothing extra runs at all.
+Output goes to PROFILE_DIR:
+    cprofile  <target>-<time>.pstats   deterministic, cumulative over the runs (python -m pstats, snakeviz)
+    sampling  <target>-<time>.folded   collapsed stacks sampled every few ms (flamegraph.pl, speedscope)
+Sampling costs far less than cProfile and suits finding where a slow tick spends its wall time.
+For async endpoints, everything the event loop runs during the request is included.
+"""
+import asyncio
+import cProfile
+import datetime
+import functools
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", "profiles"))
+MODES = ("cprofile", "sampling")
+SAMPLE_INTERVAL_SECONDS = 0.005
+MAX_RUNS = 1000
+
+_sessions = {}     # target -> ProfileSession
+_completed = []    # Finished sessions, newest last
+_lock = threading.Lock()
+
+class ProfileSession:
+    """Profiles the next `runs` calls of one target. Concurrent calls while one is being profiled run unprofiled."""
+
+    def __init__(self, target: str, mode: str, runs: int, restore):
+        self.target = target
+        self.mode = mode
+        self.runs = runs
+        self.runs_done = 0
+        self.started_at = time.time()
+        self.total_seconds = 0.0
+        self._restore = restore
+        self._busy = threading.Lock()
+        self._profiler = cProfile.Profile() if mode == "cprofile" else None
+        self._stacks = Counter()
+
+    def wrap(self, func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def profiled_async(*args, **kwargs):
+                if not self._begin():
+                    return await func(*args, **kwargs)
+                stop = self._start_run()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    self._end_run(stop)
+            return profiled_async
+
+        @functools.wraps(func)
+        def profiled(*args, **kwargs):
+            if not self._begin():
+                return func(*args, **kwargs)
+            stop = self._start_run()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._end_run(stop)
+        return profiled
+
+    def _begin(self) -> bool:
+        return self.runs_done < self.runs and self._busy.acquire(blocking=False)
+
+    def _start_run(self):
+        started = time.perf_counter()
+        if self._profiler is not None:
+            self._profiler.enable()
+            return started, None
+        sampler = _Sampler(threading.get_ident(), self._stacks)
+        sampler.start()
+        return started, sampler
+
+    def _end_run(self, stop):
+        started, sampler = stop
+        if self._profiler is not None:
+            self._profiler.disable()
+        else:
+            sampler.stop()
+        self.total_seconds += time.perf_counter() - started
+        self.runs_done += 1
+        self._busy.release()
+        if self.runs_done >= self.runs:
+            finish(self.target)
+
+    def write(self) -> Path | None:
+        """Writes the collected profile. Returns its path, or None if no run was profiled."""
+        if not self.runs_done:
+            return None
+        PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        name = self.target.strip("/").replace("/", "_") or "root"
+        if self._profiler is not None:
+            path = PROFILE_DIR / f"{name}-{stamp}.pstats"
+            self._profiler.dump_stats(path)
+        else:
+            path = PROFILE_DIR / f"{name}-{stamp}.folded"
+            path.write_text("".join(f"{stack} {count}\n" for stack, count in self._stacks.most_common()))
+        return path
+
+    def describe(self) -> dict:
+        return {"target": self.target, "mode": self.mode, "runs": self.runs, "runs_done": self.runs_done,
+                "mean_ms": round(self.total_seconds / self.runs_done * 1000, 2) if self.runs_done else None}
+
+class _Sampler(threading.Thread):
+    """Records the stack of one thread every SAMPLE_INTERVAL_SECONDS until stopped."""
+
+    def __init__(self, thread_id: int, stacks: Counter):
+        super().__init__(daemon=True, name="profile_sampler")
+        self.thread_id = thread_id
+        self.stacks = stacks
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.wait(SAMPLE_INTERVAL_SECONDS):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+# --- Arming targets ---
+
+def check_options(mode: str, runs: int):
+    """Raises ValueError for an unknown mode or an unreasonable number of runs."""
+    if mode not in MODES:
+        raise ValueError(f"Unknown profiling mode {mode!r}; use one of {', '.join(MODES)}")
+    if not 1 <= runs <= MAX_RUNS:
+        raise ValueError(f"runs must be between 1 and {MAX_RUNS}")
+
+def _validate(target: str, mode: str, runs: int):
+    check_options(mode, runs)
+    if target in _sessions:
+        raise ValueError(f"{target} is already being profiled")
+
+def profile_function(module, name: str, mode: str, runs: int) -> ProfileSession:
+    """
+    Profiles the next `runs` calls of a module-level function. Callers that look the function up in the
+    module at call time (like the tick pipeline calling its stages) go through the wrapper.
+    """
+    with _lock:
+        _validate(name, mode, runs)
+        original = getattr(module, name)
+        session = ProfileSession(name, mode, runs, lambda: setattr(module, name, original))
+        setattr(module, name, session.wrap(original))
+        _sessions[name] = session
+    print(f"Profiling {name} ({mode}) for {runs} runs.")
+    return session
+
+def profile_route(app, path: str, mode: str, runs: int) -> ProfileSession:
+    """Profiles the next `runs` requests to an API route (matched by its path template, e.g. /api/signals)."""
+    routes = [route for route in app.routes if getattr(route, "path", None) == path and hasattr(route, "dependant")]
+    if not routes:
+        raise ValueError(f"No API route {path}")
+    with _lock:
+        _validate(path, mode, runs)
+        originals = [(route.dependant, route.dependant.call) for route in routes]
+
+        def restore():
+            for dependant, call in originals:
+                dependant.call = call
+
+        session = ProfileSession(path, mode, runs, restore)
+        for dependant, call in originals:
+            dependant.call = session.wrap(call)
+        _sessions[path] = session
+    print(f"Profiling {path} ({mode}) for {runs} requests.")
+    return session
+
+def finish(target: str) -> dict | None:
+    """Stops profiling a target (after its runs, or early), restores it and writes the output."""
+    with _lock:
+        session = _sessions.pop(target, None)
+        if session is None:
+            return None
+        session._restore()
+    # Wait for a run still in progress (when stopped early), so the profile isn't written mid-run
+    with session._busy:
+        path = session.write()
+    result = {**session.describe(), "output": str(path) if path else None}
+    _completed.append(result)
+    del _completed[:-50]
+    print(f"Profiling of {target} finished: {result['runs_done']} runs, output {result['output']}")
+    return result
+
+def get_status() -> dict:
+    return {"active": [session.describe() for session in _sessions.values()], "completed": list(_completed)}
@@ -0,0 +1,79 @@
+import datetime
+import os
+import pickle
+import threading
+import time
+import zlib
+from pathlib import Path
+from . import shared_state
+from .state import app_state, export_user_state, restore_user_state
+
+# Where the warm-restart snapshot is written. It contains access tokens, so it is created with 0600 permissions.
+SNAPSHOT_PATH = Path(os.getenv("STATE_SNAPSHOT_FILE", Path(__file__).resolve().parent / "state_snapshot.bin"))
+# How often the snapshot writer runs.
+SNAPSHOT_INTERVAL_SECONDS = float(os.getenv("STATE_SNAPSHOT_INTERVAL_SECONDS", "5"))
+# Snapshots older than this are not restored; the buffers would have too large a gap in them.
+MAX_SNAPSHOT_AGE_SECONDS = float(os.getenv("STATE_SNAPSHOT_MAX_AGE_SECONDS", "1800"))
+
+# File header: magic bytes and a format version, so an old or foreign file is never unpickled.
+SNAPSHOT_MAGIC = b"GOOSNAP1"
+
+def write_snapshot():
+    """
+    Writes a compact binary snapshot (zlib-compressed pickle) of every user's state, including the
+    price/Greek/candle buffers, baseline, price action state and any active trade.
+    """
+    snapshot = {
+        "written_at": time.time(),
+        "trading_date": datetime.date.today().isoformat(),
+        "users": {
+            name: export_user_state(user_state, include_token=True)
+            for name, user_state in list(app_state["users"].items())
+        },
+    }
+    payload = zlib.compress(shared_state.pickle_state(snapshot), 1)  # Fastest level; the buffers compress well anyway
+    shared_state.atomic_write(SNAPSHOT_PATH, SNAPSHOT_MAGIC + payload, mode=0o600)
+
+def restore_snapshot() -> list:
+    """
+    Restores user states from the last snapshot if it belongs to today's session and is recent enough.
+    Returns the names of the restored users; their background jobs still need to be resumed.
+    """
+    if not SNAPSHOT_PATH.exists():
+        return []
+    started = time.perf_counter()
+    try:
+        data = SNAPSHOT_PATH.read_bytes()
+        if not data.startswith(SNAPSHOT_MAGIC):
+            print(f"Ignoring state snapshot {SNAPSHOT_PATH}: unrecognized format.")
+            return []
+        snapshot = pickle.loads(zlib.decompress(data[len(SNAPSHOT_MAGIC):]))
+    except (OSError, zlib.error, pickle.UnpicklingError, EOFError) as e:
+        print(f"Could not read state snapshot {SNAPSHOT_PATH}: {e}")
+        return []
+
+    age = time.time() - snapshot.get("written_at", 0)
+    if snapshot.get("trading_date") != datetime.date.today().isoformat() or age > MAX_SNAPSHOT_AGE_SECONDS:
+        print(f"State snapshot from {snapshot.get('trading_date')} ({age:.0f}s old) is stale; starting fresh.")
+        return []
+    if not snapshot.get("users"):
+        return []
+
+    for name, exported in snapshot["users"].items():
+        app_state["users"][name] = restore_user_state(exported)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    print(f"Restored state for {list(snapshot['users'])} from a {age:.0f}s old snapshot in {elapsed_ms:.1f} ms.")
+    return list(snapshot["users"])
+
+def _snapshot_loop():
+    while True:
+        time.sleep(SNAPSHOT_INTERVAL_SECONDS)
+        try:
+            write_snapshot()
+        except Exception as e:
+            print(f"Error writing state snapshot: {e}")
+
+def start_snapshot_writer():
+    """Starts the background thread that writes snapshots off the trading hot path."""
+    threading.Thread(target=_snapshot_loop, daemon=True, name="state_snapshot_writer").start()
+    print(f"State snapshots every {SNAPSHOT_INTERVAL_SECONDS:g}s to {SNAPSHOT_PATH}")
@@ -0,0 +1,404 @@
+"""
+Shadow mode: named strategy configurations evaluated on the same live features as the real one.
+
+A shadow config is a set of setting overrides (the shadow_configs table) on top of the live settings.
+Every config's price-action state, pending setup and paper trade are kept in NumPy arrays with one slot
+per config, so the rules of logic.determine_market_type, detect_entry_setup, confirm_with_greeks and
+check_exit_conditions run as one vectorized pass over all configs per candle / tick. Features that don't
+depend on settings (bias, swing points, smoothed Greeks) are computed once and shared.
+Would-be trades go to each config's paper ledger (the shadow_trades table); nothing reaches the broker.
+
+    python -m backend.shadow --bench 50     # per-tick overhead of 50 configs
+"""
+import datetime
+import math
+import time
+import numpy as np
+from . import calculations
+from . import database
+from . import greek_series
+from . import logic
+
+# Settings a shadow config can override, with logic.py's defaults.
+PARAMS = {
+    "market_type_window_size": 3,
+    "bos_buffer_points": 10.0,
+    "retest_min_percent": 30.0,
+    "retest_max_percent": 60.0,
+    "entry_delta_slope_thresh": 0.01,
+    "entry_gamma_change_thresh": 5.0,
+    "entry_iv_trend_thresh": 0.5,
+    "entry_theta_max_spike": 5.0,
+    "exit_iv_crush_thresh": -2.0,
+    "risk_percent": 1.0,
+    "risk_reward_ratio": 2.0,
+    "cooldown_minutes": 15,
+    "eod_exit_minutes": 60,
+}
+
+# Slot phases
+IDLE, PENDING, ACTIVE = 0, 1, 2
+BULLISH, BEARISH = 1, -1
+
+# --- Configs ---
+_configs = {"version": None, "names": (), "params": {}}
+
+def check_overrides(overrides: dict):
+    """Raises ValueError for an override of an unknown setting, or one that isn't a finite number."""
+    unknown = set(overrides) - set(PARAMS)
+    if unknown:
+        raise ValueError(f"Unknown settings: {', '.join(sorted(unknown))}")
+    for key, value in overrides.items():
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            number = math.nan
+        if isinstance(value, bool) or not math.isfinite(number):
+            raise ValueError(f"{key} must be a number, got {value!r}")
+
+def _param(value, fallback) -> float:
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return float(fallback)
+    return number if math.isfinite(number) else float(fallback)
+
+def load_configs() -> dict:
+    """
+    Returns {"names": (...), "params": {setting: array over configs}}, re-read only when the database has
+    changed (so configs added through the API, from any process, are picked up on the next tick).
+    """
+    version = database.get_data_version()
+    if version != _configs["version"]:
+        overrides = database.get_shadow_configs()
+        settings = database.get_settings()
+        names = tuple(overrides)
+        params = {}
+        for key, default in PARAMS.items():
+            # A bad stored value (saved before overrides were validated) falls back to the live one
+            live_value = _param(settings.get(key, default), default)
+            params[key] = np.array([_param(overrides[name].get(key, live_value), live_value) for name in names])
+        params["market_type_window_size"] = np.maximum(params["market_type_window_size"].astype(int), 1)
+        _configs.update(version=version, names=names, params=params)
+    return _configs
+
+# --- Per-user book: one slot per config ---
+
+class ShadowBook:
+    """One user's shadow state, as parallel arrays with one slot per config."""
+    SLOT_FIELDS = {
+        # Price-action state (detect_entry_setup)
+        "looking_for_retest": False, "bos_direction": 0, "breakout_high": np.nan, "breakout_low": np.nan,
+        "breakout_candle": np.nan,
+        # Pending setup / paper trade
+        "phase": IDLE, "direction": 0, "is_retest": False, "signal_premium": np.nan, "strike": np.nan,
+        "stop_loss": np.nan, "target": np.nan, "ledger_id": 0, "cooldown_until": 0.0,
+    }
+
+    def __init__(self, names: tuple):
+        self.names = names
+        for field, default in self.SLOT_FIELDS.items():
+            setattr(self, field, np.full(len(names), default))
+
+    def resized(self, names: tuple) -> "ShadowBook":
+        """Returns a book for a new set of configs, keeping the state of the configs in both."""
+        book = ShadowBook(names)
+        old_index = {name: i for i, name in enumerate(self.names)}
+        kept = [(i, old_index[name]) for i, name in enumerate(names) if name in old_index]
+        if kept:
+            new_slots, old_slots = map(list, zip(*kept))
+            for field in self.SLOT_FIELDS:
+                getattr(book, field)[new_slots] = getattr(self, field)[old_slots]
+        return book
+
+def _get_book(user_state: dict, configs: dict) -> ShadowBook | None:
+    if not configs["names"]:
+        return None
+    book = user_state.get("shadow")
+    if book is None:
+        book = ShadowBook(configs["names"])
+    elif book.names != configs["names"]:
+        book = book.resized(configs["names"])
+    user_state["shadow"] = book
+    return book
+
+# --- Candle close: market type and entry setups ---
+
+def _market_types(candles: list, window_sizes: np.ndarray) -> tuple:
+    """
+    determine_market_type for every window size at once. ATR and body ratio over the last w candles
+    are differences of running sums, so all configs cost one pass over the candles.
+    Returns (trendy, volatile) masks.
+    """
+    if not candles:
+        none = np.zeros(len(window_sizes), dtype=bool)
+        return none, none
+    opens, highs, lows, closes = np.array([candle[1:] for candle in candles], dtype=float).T
+    true_ranges = highs - lows
+    true_ranges[1:] = np.maximum.reduce([true_ranges[1:], np.abs(highs[1:] - closes[:-1]), np.abs(lows[1:] - closes[:-1])])
+    ranges = highs - lows
+    body_ratios = np.divide(np.abs(closes - opens), ranges, out=np.zeros_like(ranges), where=ranges > 0)
+    tr_sums = np.concatenate(([0.0], np.cumsum(true_ranges)))
+    ratio_sums = np.concatenate(([0.0], np.cumsum(body_ratios)))
+
+    count = len(candles)
+    determined = window_sizes <= count
+    start = count - np.minimum(window_sizes, count)
+    atr = (tr_sums[-1] - tr_sums[start]) / window_sizes
+    body_ratio_avg = (ratio_sums[-1] - ratio_sums[start]) / window_sizes
+    trendy = determined & (atr > logic.TRENDY_MIN_ATR) & (body_ratio_avg > logic.TRENDY_MIN_BODY_RATIO)
+    volatile = determined & ~trendy & (atr > logic.VOLATILE_MIN_ATR) & (body_ratio_avg < logic.VOLATILE_MAX_BODY_RATIO)
+    return trendy, volatile
+
+def _breakout_levels(candles: list, direction: int) -> tuple | None:
+    """The swing levels a BOS in `direction` would break: (level, breakout_high, breakout_low), or None."""
+    if len(candles) < 5:
+        return None
+    swing_points = calculations.find_swing_points(candles)
+    kind, opposite = ("high", "low") if direction == BULLISH else ("low", "high")
+    swings = [p for p in swing_points if p['type'] == kind]
+    if not swings:
+        return None
+    last_swing = swings[-1]
+    preceding = [p for p in swing_points if p['type'] == opposite and p['timestamp'] < last_swing['timestamp']]
+    if not preceding:
+        return None
+    if direction == BULLISH:
+        return last_swing['price'], last_swing['price'], preceding[-1]['price']
+    return last_swing['price'], preceding[-1]['price'], last_swing['price']
+
+def on_candle(user_state: dict, now: float | None = None):
+    """
+    Runs every config's market type and entry setup detection on a candle close.
+    Configs in their own cooldown are skipped, as the live controller is; configs holding a paper trade
+    keep it (the live controller can replace its candidate mid-trade, which a ledger can't represent).
+    """
+    if not user_state.get("baseline_set"):
+        return
+    configs = load_configs()
+    book = _get_book(user_state, configs)
+    if book is None:
+        return
+    now = now or time.time()
+    params = configs["params"]
+    candles = list(user_state["candles_5min_buffer"])
+    latest = {name: user_state[name][-1] if user_state[name] else None
+              for name in ("price_buffer", "delta_buffer", "gamma_buffer", "iv_buffer", "premium_buffer")}
+    latest_price, latest_premium = latest["price_buffer"] or 0, latest["premium_buffer"]
+    # The bias doesn't depend on settings; it is computed here because the live one is forced to Neutral in live cooldown
+    bias = logic.determine_bias(latest_price, latest["delta_buffer"], latest["gamma_buffer"], latest["iv_buffer"], user_state["baseline_values"])
+    ready = book.cooldown_until <= now
+
+    # Layer 1: a neutral bias resets the price-action state
+    if bias not in ("Bullish", "Bearish"):
+        book.looking_for_retest[ready] = False
+        book.bos_direction[ready] = 0
+        return
+    direction = BULLISH if bias == "Bullish" else BEARISH
+
+    # Layer 2: market type
+    trendy, volatile = _market_types(candles, params["market_type_window_size"])
+    ready &= trendy | volatile
+    new_setups = np.zeros(len(book.names), dtype=bool)
+    to_retest = np.zeros(len(book.names), dtype=bool)
+
+    # Layer 3a: Break of Structure
+    levels = _breakout_levels(candles, direction)
+    if levels:
+        level, breakout_high, breakout_low = levels
+        latest_candle = datetime.datetime.fromisoformat(candles[-1][0]).timestamp()
+        latest_close = candles[-1][4]
+        broken = latest_close > level + params["bos_buffer_points"] if direction == BULLISH else latest_close < level - params["bos_buffer_points"]
+        bos = ready & ~book.looking_for_retest & broken & (book.breakout_candle != latest_candle)
+        # Volatile: enter on the break. Trendy: wait for a retest of the breakout range.
+        new_setups |= bos & volatile
+        to_retest = bos & trendy
+        book.looking_for_retest[to_retest] = True
+        book.bos_direction[to_retest] = direction
+        book.breakout_high[to_retest] = breakout_high
+        book.breakout_low[to_retest] = breakout_low
+        book.breakout_candle[to_retest] = latest_candle
+
+    # Layer 3b: Retest (configs that just broke out look for it from the next candle)
+    retesting = ready & book.looking_for_retest & (book.bos_direction == direction) & ~new_setups & ~to_retest
+    high, low = book.breakout_high, book.breakout_low
+    retesting &= (high > 0) & (low > 0) & bool(latest_price)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        if direction == BULLISH:
+            invalidated = latest_price < low
+            pullback_percent = (high - latest_price) / (high - low) * 100
+        else:
+            invalidated = latest_price > high
+            pullback_percent = (latest_price - low) / (high - low) * 100
+        retested = ~invalidated & (high > low) & (pullback_percent >= params["retest_min_percent"]) & (pullback_percent <= params["retest_max_percent"])
+    reset = retesting & invalidated
+    book.looking_for_retest[reset] = False
+    book.bos_direction[reset] = 0
+    new_retests = retesting & retested
+    new_setups |= new_retests
+
+    # New pending setups, tied to the monitored contract like the live candidate
+    new_setups &= book.phase != ACTIVE
+    if latest_premium:
+        book.phase[new_setups] = PENDING
+        book.direction[new_setups] = direction
+        book.is_retest[new_setups] = new_retests[new_setups]
+        book.signal_premium[new_setups] = latest_premium
+        book.strike[new_setups] = user_state.get("monitored_strike") or np.nan
+
+# --- Every tick: Greek confirmation and exits ---
+
+def _contract_features(user_state: dict, strikes: np.ndarray, now: float) -> dict:
+    """Smoothed entry/exit Greeks and the latest premium of each contract, computed once per strike."""
+    chain = user_state.get("option_chain")
+    features = {name: np.full(len(strikes), np.nan) for name in ("delta_slope", "gamma_change", "iv_trend", "theta_change", "exit_iv_trend", "premium")}
+    # Contracts the live strategy follows already have their trends in this tick's features
+    tick_features = user_state.get("features")
+    tick_times = user_state["tick_time_buffer"]
+    if tick_features is not None and tick_features.tick_time != (tick_times[-1] if tick_times else None):
+        tick_features = None
+    for i, strike in enumerate(strikes):
+        contract = None if np.isnan(strike) else float(strike)
+        history = greek_series.contract_history(user_state, contract, now)
+        if tick_features is not None and tick_features.contract_greeks(contract, 30) is not None:
+            smoothed = {window: tick_features.contract_greeks(contract, window) for window in (30, 60)}
+        else:
+            smoothed = calculations.smoothed_greeks(history, (30, 60))
+        for name in ("delta_slope", "gamma_change", "iv_trend", "theta_change"):
+            features[name][i] = smoothed[30][name]
+        features["exit_iv_trend"][i] = smoothed[60]["iv_trend"]
+        index = chain.find_strike(strike) if chain is not None and not np.isnan(strike) else None
+        premium = chain.row(index)['call_ltp'] if index is not None else (history["premium_buffer"][-1] if history["premium_buffer"] else None)
+        features["premium"][i] = premium or np.nan
+    return features
+
+def on_tick(user_name: str, user_state: dict, now: float | None = None):
+    """Confirms pending setups with smoothed Greeks and checks paper trades for exits, for every config."""
+    configs = load_configs()
+    book = _get_book(user_state, configs)
+    if book is None:
+        return
+    now = now or time.time()
+    pending = (book.phase == PENDING) & (book.cooldown_until <= now)
+    active = book.phase == ACTIVE
+    if not (pending.any() or active.any()):
+        return
+    params = configs["params"]
+
+    # Contracts in play are few (usually one); compute their features once and spread them over the slots
+    in_play = pending | active
+    strikes, slot_contract = np.unique(book.strike[in_play], return_inverse=True)
+    per_contract = _contract_features(user_state, strikes, now)
+    features = {name: np.full(len(book.names), np.nan) for name in per_contract}
+    for name, values in per_contract.items():
+        features[name][in_play] = values[slot_contract]
+
+    # confirm_with_greeks
+    delta_slope, direction = features["delta_slope"], book.direction
+    greeks_agree = ((features["gamma_change"] >= params["entry_gamma_change_thresh"])
+                    & (features["iv_trend"] >= params["entry_iv_trend_thresh"])
+                    & (np.abs(features["theta_change"]) < params["entry_theta_max_spike"]))
+    delta_agrees = np.where(direction == BULLISH, delta_slope >= params["entry_delta_slope_thresh"], delta_slope <= -params["entry_delta_slope_thresh"])
+    approved = pending & greeks_agree & delta_agrees
+
+    # check_exit_conditions, on trades that were already open before this tick
+    premium = features["premium"]
+    has_premium = active & (premium > 0)
+    stop_hit = has_premium & (premium <= book.stop_loss)
+    target_hit = has_premium & ~stop_hit & (premium >= book.target)
+    iv_crush = has_premium & ~stop_hit & ~target_hit & (features["exit_iv_trend"] < params["exit_iv_crush_thresh"])
+    now_utc = datetime.datetime.utcfromtimestamp(now)
+    close_minute = logic.MARKET_CLOSE_UTC.hour * 60 + logic.MARKET_CLOSE_UTC.minute
+    end_of_day = has_premium & ~stop_hit & ~target_hit & ~iv_crush & (now_utc.hour * 60 + now_utc.minute + now_utc.second / 60 >= close_minute - params["eod_exit_minutes"])
+    exiting = stop_hit | target_hit | iv_crush | end_of_day
+
+    if approved.any():
+        entry = book.signal_premium[approved]
+        stop_points = entry * params["risk_percent"][approved] / 100
+        book.stop_loss[approved] = np.round(entry - stop_points, 2)
+        book.target[approved] = np.round(entry + stop_points * params["risk_reward_ratio"][approved], 2)
+        book.phase[approved] = ACTIVE
+        slots = np.flatnonzero(approved)
+        book.ledger_id[slots] = database.open_shadow_trades([{
+            "config_name": book.names[i],
+            "user_name": user_name,
+            "signal_type": f"{'RETEST' if book.is_retest[i] else 'BOS'}_{'BULLISH' if book.direction[i] == BULLISH else 'BEARISH'}",
+            "strike_price": None if np.isnan(book.strike[i]) else float(book.strike[i]),
+            "entry_price": float(book.signal_premium[i]),
+        } for i in slots])
+        print(f"[{user_name}] Shadow entries approved for: {', '.join(book.names[i] for i in slots)}")
+
+    if exiting.any():
+        exits = []
+        for i in np.flatnonzero(exiting):
+            if stop_hit[i]:
+                reason = f"StopLoss Hit at {premium[i]}"
+            elif target_hit[i]:
+                reason = f"Target Hit at {premium[i]}"
+            elif iv_crush[i]:
+                reason = f"Emergency Exit: IV Crush (Trend: {features['exit_iv_trend'][i]:.2f})"
+            else:
+                reason = "Time-based Exit (EOD)"
+            exits.append((int(book.ledger_id[i]), float(premium[i]), reason))
+        database.close_shadow_trades(exits)
+        book.phase[exiting] = IDLE
+        book.cooldown_until[exiting] = now + params["cooldown_minutes"][exiting] * 60
+        print(f"[{user_name}] Shadow exits for: {', '.join(book.names[i] for i in np.flatnonzero(exiting))}")
+
+# --- Overhead benchmark ---
+
+def _bench(config_count: int, rounds: int = 200):
+    """Times on_candle + on_tick with `config_count` configs on synthetic data, all with setups in play."""
+    from .state import get_default_user_state
+    configs = {"version": "bench", "names": tuple(f"bench_{i}" for i in range(config_count)),
+               "params": {key: np.full(config_count, float(value)) for key, value in PARAMS.items()}}
+    configs["params"]["market_type_window_size"] = np.arange(config_count) % 6 + 1
+    configs["params"]["bos_buffer_points"] = np.linspace(0, 20, config_count)
+    # Thresholds no setup can pass or trade can hit, so every round does the full work without touching the ledger
+    configs["params"]["entry_gamma_change_thresh"][:] = np.inf
+    configs["params"]["exit_iv_crush_thresh"][:] = -np.inf
+    configs["params"]["eod_exit_minutes"][:] = -np.inf
+    _configs.update(configs, version=database.get_data_version())  # Keep database reads out of the timing
+
+    user_state = get_default_user_state()
+    rng = np.random.default_rng(0)
+    start = time.time() - 3600
+    price = 25000.0
+    for i in range(40):
+        high, low = price + rng.uniform(5, 30), price - rng.uniform(5, 30)
+        close = rng.uniform(low, high)
+        user_state["candles_5min_buffer"].append([datetime.datetime.fromtimestamp(start + i * 300).isoformat(), price, high, low, close])
+        price = close
+    for i in range(30):
+        user_state["tick_time_buffer"].append(start + 3300 + i * 10)
+        for name in ("delta_buffer", "gamma_buffer", "theta_buffer", "iv_buffer", "premium_buffer"):
+            user_state[name].append(rng.uniform(0.1, 100))
+    user_state["monitored_strike"] = 25100.0
+    user_state["baseline_set"] = True
+    user_state["baseline_values"] = {"price": price - 100, "delta": 0, "gamma": 0, "iv": 0}
+
+    book = _get_book(user_state, configs)
+    book.phase[:] = np.arange(config_count) % 3  # A mix of idle, pending and active slots
+    book.signal_premium[:] = 100.0
+    book.stop_loss[:], book.target[:] = 0.0, np.inf
+    book.strike[:] = 25100.0
+
+    candle_ms, tick_ms = [], []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        on_candle(user_state, now=start + 3600)
+        candle_ms.append((time.perf_counter() - started) * 1000)
+        started = time.perf_counter()
+        on_tick("bench", user_state, now=start + 3600)
+        tick_ms.append((time.perf_counter() - started) * 1000)
+    print(f"{config_count} shadow configs: on_tick p50 {np.percentile(tick_ms, 50):.3f} ms, p95 {np.percentile(tick_ms, 95):.3f} ms; "
+          f"on_candle p50 {np.percentile(candle_ms, 50):.3f} ms, p95 {np.percentile(candle_ms, 95):.3f} ms")
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Measures the per-tick overhead of shadow configs.")
+    parser.add_argument("--bench", type=int, default=50, metavar="N", help="number of shadow configs")
+    args = parser.parse_args()
+    if args.bench < 1:
+        parser.error("--bench needs at least 1 config")
+    _bench(args.bench)
@@ -0,0 +1,100 @@
+import json
+import os
+import pickle
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+# How this process takes part in the engine:
+#   standalone - fetch/logic and the API in one process (the default, single uvicorn worker)
+#   producer   - runs the schedulers and publishes state snapshots (python -m backend.engine)
+#   consumer   - an API/WebSocket worker that serves read-only snapshots; run as many as needed
+ENGINE_ROLE = os.getenv("ENGINE_ROLE", "standalone")
+
+# Snapshots live in shared memory (/dev/shm) where available, so readers never touch the disk.
+_default_dir = Path("/dev/shm") if Path("/dev/shm").is_dir() else Path(tempfile.gettempdir())
+SHARED_STATE_DIR = Path(os.getenv("SHARED_STATE_DIR", _default_dir / "goo_engine"))
+SNAPSHOT_FILE = SHARED_STATE_DIR / "users.pickle"
+COMMANDS_DIR = SHARED_STATE_DIR / "commands"
+
+_published_version = 0
+_cache = {"mtime_ns": None, "snapshot": None}
+
+def _private_dir(directory: Path):
+    """Creates a shared state directory readable by this user only (commands carry access tokens)."""
+    for part in (SHARED_STATE_DIR, directory):
+        part.mkdir(mode=0o700, parents=True, exist_ok=True)
+        if part.stat().st_mode & 0o077:
+            os.chmod(part, 0o700)  # Created by an older version with the default umask
+
+def atomic_write(path: Path, data: bytes, mode: int = 0o600):
+    """Writes to a temp file in the same directory and renames it over `path`, so readers never see a partial file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, mode)
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def pickle_state(obj, retries: int = 3) -> bytes:
+    # Scheduler threads may append to a deque while it is being pickled; just try again.
+    for attempt in range(retries):
+        try:
+            return pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+        except RuntimeError:
+            if attempt == retries - 1:
+                raise
+            time.sleep(0.001)
+
+# --- Producer side ---
+
+def publish_users(users: dict):
+    """Publishes a snapshot of every user's state for the consumer workers."""
+    from .state import export_user_state
+    global _published_version
+    _published_version += 1
+    snapshot = {
+        "version": _published_version,
+        "published_at": time.time(),
+        "users": {name: export_user_state(user_state) for name, user_state in users.items()},
+    }
+    _private_dir(SNAPSHOT_FILE.parent)
+    atomic_write(SNAPSHOT_FILE, pickle_state(snapshot))
+
+def drain_commands() -> list:
+    """Returns (and removes) the commands posted by consumer workers, oldest first."""
+    if not COMMANDS_DIR.is_dir():
+        return []
+    commands = []
+    for path in sorted(COMMANDS_DIR.glob("*.json")):
+        try:
+            commands.append(json.loads(path.read_text()))
+        except (OSError, ValueError) as e:
+            print(f"Skipping unreadable engine command {path.name}: {e}")
+        path.unlink(missing_ok=True)
+    return commands
+
+# --- Consumer side ---
+
+def load_snapshot() -> dict | None:
+    """
+    Returns the latest published snapshot, or None if the producer hasn't published yet.
+    The file is only re-read when it has changed.
+    """
+    try:
+        mtime_ns = SNAPSHOT_FILE.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+    if mtime_ns != _cache["mtime_ns"]:
+        with open(SNAPSHOT_FILE, "rb") as f:
+            _cache["snapshot"] = pickle.load(f)
+        _cache["mtime_ns"] = mtime_ns
+    return _cache["snapshot"]
+
+def post_command(action: str, **payload):
+    """Queues a state-changing command (login, logout) for the producer."""
+    command = {"action": action, "posted_at": time.time(), **payload}
+    name = f"{time.time_ns()}_{uuid.uuid4().hex[:8]}.json"
+    _private_dir(COMMANDS_DIR)
+    atomic_write(COMMANDS_DIR / name, json.dumps(command).encode())
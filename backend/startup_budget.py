@@ -0,0 +1,82 @@
+"""
+Cold-start budget check: imports backend.main in a fresh interpreter and fails if the import takes
+too long, the process uses too much memory, or a heavy module that should load lazily was imported.
+
+    python -m backend.startup_budget
+    python -m backend.startup_budget --max-import-ms 800 --max-rss-mb 70 --runs 5
+
+Exits with status 1 when a budget is exceeded, so it can run in a deploy hook; tests/test_startup_budget.py
+checks the same budgets under pytest.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+# Budgets for a small Render instance; override with the flags or these environment variables.
+IMPORT_BUDGET_MS = float(os.getenv("STARTUP_IMPORT_BUDGET_MS", "1000"))
+RSS_BUDGET_MB = float(os.getenv("STARTUP_RSS_BUDGET_MB", "80"))
+# Optional or heavy modules that must not be imported just by starting the app.
+LAZY_MODULES = ("pyarrow", "msgpack", "brotli")
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import backend.main
+import_ms = (time.perf_counter() - started) * 1000
+rss_kb = 0
+with open("/proc/self/status") as f:
+    for line in f:
+        if line.startswith("VmRSS:"):
+            rss_kb = int(line.split()[1])
+print(json.dumps({"import_ms": import_ms, "rss_mb": rss_kb / 1024, "modules": sorted(sys.modules)}))
+"""
+
+def measure_once(repo_root: Path) -> dict:
+    """Imports the app in a new interpreter (no warm module cache in memory) and returns its measurements."""
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=repo_root, capture_output=True, text=True, check=True,
+    )
+    # The app prints startup warnings; the measurements are the last line
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def measure(runs: int = 3) -> dict:
+    """Imports the app `runs` times; returns the median import time and RSS, and the lazy modules that were imported."""
+    repo_root = Path(__file__).resolve().parent.parent
+    results = [measure_once(repo_root) for _ in range(runs)]
+    return {
+        "import_ms": sorted(result["import_ms"] for result in results)[runs // 2],
+        "rss_mb": sorted(result["rss_mb"] for result in results)[runs // 2],
+        "eager": [name for name in LAZY_MODULES if name in results[0]["modules"]],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Check backend.main's import time and baseline memory.")
+    parser.add_argument("--max-import-ms", type=float, default=IMPORT_BUDGET_MS)
+    parser.add_argument("--max-rss-mb", type=float, default=RSS_BUDGET_MB)
+    parser.add_argument("--runs", type=int, default=3, help="Imports to run; the median is checked")
+    args = parser.parse_args()
+
+    if args.runs < 1:
+        parser.error("--runs must be at least 1")
+    measured = measure(args.runs)
+    import_ms, rss_mb, eager = measured["import_ms"], measured["rss_mb"], measured["eager"]
+
+    print(f"import backend.main: {import_ms:.0f} ms (budget {args.max_import_ms:.0f} ms)")
+    print(f"baseline RSS:        {rss_mb:.1f} MB (budget {args.max_rss_mb:.0f} MB)")
+    failures = []
+    if import_ms > args.max_import_ms:
+        failures.append("import time over budget")
+    if rss_mb > args.max_rss_mb:
+        failures.append("RSS over budget")
+    if eager:
+        failures.append(f"imported eagerly: {', '.join(eager)}")
+    if failures:
+        print("FAIL: " + "; ".join(failures))
+        sys.exit(1)
+    print("OK")
+
+if __name__ == "__main__":
+    main()
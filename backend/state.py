@@ -1,5 +1,7 @@
 from collections import deque
 import copy
+import threading
+from .pipeline import get_default_latency_state, get_default_fetch_health, DEFAULT_POLL_INTERVAL_SECONDS
 
 BUFFER_SIZE = 30 
 
@@ -14,6 +16,7 @@ def get_default_user_state():
         "gamma_buffer": deque(maxlen=BUFFER_SIZE),
         "theta_buffer": deque(maxlen=BUFFER_SIZE),
         "iv_buffer": deque(maxlen=BUFFER_SIZE),
+        "tick_time_buffer": deque(maxlen=BUFFER_SIZE), # Epoch time of each premium/Greek sample
         "candles_5min_buffer": deque(maxlen=100),
         "bias": "Neutral",
         "market_type": "Undetermined",
@@ -25,7 +28,7 @@ def get_default_user_state():
         "baseline_timestamp": None,       # The exact time baseline was captured
         "baseline_values": {},            # Dict to hold Price, Delta, Gamma, IV at baseline
         "market_type_window_size": 3,     # Default to 3 (15-min window)
-        "option_chain_data": [],          # To store the full option chain for the UI
+        "option_chain": None,             # Latest chain_store.OptionChain (shared, read-only) for the UI and exits
         # --- New state for BOS/Retest Engine ---
         "price_action_state": {
             "status": "LOOKING_FOR_BOS",        # Current mode: LOOKING_FOR_BOS or LOOKING_FOR_RETEST
@@ -34,6 +37,24 @@ def get_default_user_state():
             "breakout_low": None,              # The low of the move that caused the BOS
             "breakout_candle_timestamp": None, # To avoid re-triggering on the same candle
         },
+        # --- Event-driven pipeline ---
+        "last_candle_bucket": None,       # 5-minute bucket of the last tick, to detect candle closes
+        "forming_candle": None,           # OHLC of the 5-minute candle being built from ticks
+        "poll_interval": DEFAULT_POLL_INTERVAL_SECONDS, # Current adaptive fetch interval in seconds
+        "fetch_health": get_default_fetch_health(), # Backoff, circuit breaker and time of the last good tick
+        "snapshot": None,                 # Latest immutable TickSnapshot, the only thing readers look at
+        "features": None,                 # Latest features.FeatureVector, computed once per tick for all consumers
+        "latency": get_default_latency_state(), # Per-stage latency samples in ms
+        # --- Active trade monitoring ---
+        "atm_strike": None,               # ATM strike of the last tick
+        "monitored_strike": None,         # The 2nd OTM call strike being monitored
+        "monitored_instrument_key": None, # Its Upstox instrument key, used for the streaming feed
+        "exit_greeks": {},                # Latest 60s smoothed Greeks used by exit checks
+        "exit_monitor": None,             # Streaming exit monitor for the active trade
+        "trade_lock": threading.Lock(),   # Ensures a trade is closed only once
+        "warmed_up": False,               # Set once history has been bulk-loaded on the first tick
+        "paper_broker": None,             # fills.PaperBroker holding the trade's unfilled paper orders
+        "shadow": None,                   # shadow.ShadowBook: state of the shadow configs evaluated alongside
     }
 
 # The global state now holds a dictionary of user-specific states.
@@ -44,6 +65,25 @@ app_state = {
     }
 }
 
+# Runtime objects that only make sense inside the process that created them.
+RUNTIME_KEYS = ("scheduler", "exit_monitor", "trade_lock")
+
+def export_user_state(user_state: dict, include_token: bool = False) -> dict:
+    """
+    Returns the picklable part of a user's state, for publishing to other processes.
+    The access token is left out unless explicitly requested.
+    """
+    exported = {key: value for key, value in user_state.items() if key not in RUNTIME_KEYS}
+    if not include_token:
+        exported["access_token"] = None
+    return exported
+
+def restore_user_state(exported: dict) -> dict:
+    """Rebuilds a full user state from an exported one, with fresh runtime objects."""
+    user_state = get_default_user_state()
+    user_state.update(exported)
+    return user_state
+
 def get_user_state(user_name: str):
     """
     Retrieves the state for a specific user, creating it if it doesn't exist.
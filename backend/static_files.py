@@ -0,0 +1,91 @@
+import mimetypes
+import os
+from email.utils import parsedate
+from fastapi import Request
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+# CRA puts a content hash in every file name under build/static, so those can be cached forever.
+HASHED_ASSET_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# index.html and the root files keep their names across builds; browsers revalidate them (ETag -> 304).
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+# Precompressed variants written at build time by backend.precompress, in order of preference.
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+def _accepted_encodings(accept_encoding: str) -> set:
+    accepted = set()
+    for part in accept_encoding.split(","):
+        name, _, params = part.partition(";")
+        quality = params.strip().removeprefix("q=")
+        try:
+            if params and float(quality) == 0:
+                continue  # Explicitly refused
+        except ValueError:
+            pass
+        accepted.add(name.strip().lower())
+    return accepted
+
+def _is_not_modified(response_headers, request_headers: Headers) -> bool:
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match:
+        return response_headers["etag"] in [tag.strip(" W/") for tag in if_none_match.split(",")]
+    if_modified_since = request_headers.get("if-modified-since")
+    if if_modified_since:
+        if_modified_since = parsedate(if_modified_since)
+        last_modified = parsedate(response_headers["last-modified"])
+        return bool(if_modified_since and last_modified and if_modified_since >= last_modified)
+    return False
+
+def precompressed_variant(full_path: str, accept_encoding: str) -> tuple | None:
+    """
+    Returns (path, stat, encoding) of the best precompressed copy of a file the client accepts,
+    or None. A copy older than the file itself (a rebuild without precompressing) is ignored.
+    """
+    accepted = _accepted_encodings(accept_encoding)
+    if not accepted:
+        return None
+    original_mtime = os.stat(full_path).st_mtime
+    for encoding, suffix in ENCODINGS:
+        if encoding not in accepted:
+            continue
+        try:
+            stat_result = os.stat(f"{full_path}{suffix}")
+        except FileNotFoundError:
+            continue
+        if stat_result.st_mtime >= original_mtime:
+            return f"{full_path}{suffix}", stat_result, encoding
+    return None
+
+def build_file_response(full_path: str, request_headers: Headers, cache_control: str,
+                        stat_result: os.stat_result | None = None, status_code: int = 200) -> Response:
+    """
+    Serves a build file, precompressed if possible, with ETag/Last-Modified and the given Cache-Control.
+    Answers 304 when the client's copy is current.
+    """
+    variant = precompressed_variant(full_path, request_headers.get("accept-encoding", ""))
+    if variant:
+        path, stat_result, encoding = variant
+        media_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+        response = FileResponse(path, status_code=status_code, stat_result=stat_result, media_type=media_type,
+                                headers={"Content-Encoding": encoding})
+    else:
+        response = FileResponse(full_path, status_code=status_code, stat_result=stat_result)
+    response.headers["Cache-Control"] = cache_control
+    response.headers["Vary"] = "Accept-Encoding"
+    if _is_not_modified(response.headers, request_headers):
+        return NotModifiedResponse(response.headers)
+    return response
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles for hashed build assets: serves .br/.gz copies by content negotiation and caches immutably."""
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope: Scope, status_code: int = 200) -> Response:
+        return build_file_response(str(full_path), Headers(scope=scope), HASHED_ASSET_CACHE_CONTROL,
+                                   stat_result=stat_result, status_code=status_code)
+
+def serve_build_file(request: Request, path: str) -> Response:
+    """Serves a non-hashed build file (index.html, manifest.json, ...) that browsers must revalidate."""
+    return build_file_response(path, request.headers, REVALIDATE_CACHE_CONTROL)
@@ -0,0 +1,97 @@
+import itertools
+import time
+from typing import NamedTuple
+from . import pipeline
+
+class TickSnapshot(NamedTuple):
+    """
+    An immutable, internally consistent view of one user's state as of a single tick.
+    The scheduler thread builds a new one after every tick and swaps it into user_state["snapshot"];
+    API handlers and WebSockets read that reference without locks or defensive copies.
+    """
+    version: int = 0
+    published_at: float = 0.0
+    prices: tuple = ()
+    deltas: tuple = ()
+    gammas: tuple = ()
+    thetas: tuple = ()
+    ivs: tuple = ()
+    tick_times: tuple = ()
+    candles: tuple = ()
+    option_chain: object = None  # chain_store.OptionChain
+    features: object = None      # features.FeatureVector of this tick
+    bias: str = "Neutral"
+    market_type: str = "Undetermined"
+    candidate_setup: dict | None = None
+    baseline_set: bool = False
+    baseline_values: dict = {}
+    last_exit_reason: str | None = None
+    cooldown_until: object = None
+    fetch_health: dict = {}
+
+    def latest(self, field: str, default=None):
+        """The newest value of a series (e.g. "prices"), or `default` before the first tick."""
+        values = getattr(self, field)
+        return values[-1] if values else default
+
+    def is_stale(self, now: float, max_age: float = pipeline.DEFAULT_MAX_TICK_AGE_SECONDS) -> bool:
+        return not self.fetch_health or pipeline.is_health_stale(self.fetch_health, now, max_age)
+
+EMPTY_SNAPSHOT = TickSnapshot()
+
+# Snapshot versions are unique across users, threads and restarts (they start from the clock).
+_versions = itertools.count(int(time.time() * 1000))
+
+def publish_tick_snapshot(user_state: dict) -> TickSnapshot:
+    """
+    Builds a snapshot from the user's live state and publishes it with a single reference assignment.
+    Must be called from the thread that writes the buffers (the tick pipeline).
+    """
+    candidate = user_state.get("candidate_setup")
+    snapshot = TickSnapshot(
+        version=next(_versions),
+        published_at=time.time(),
+        prices=tuple(user_state["price_buffer"]),
+        deltas=tuple(user_state["delta_buffer"]),
+        gammas=tuple(user_state["gamma_buffer"]),
+        thetas=tuple(user_state["theta_buffer"]),
+        ivs=tuple(user_state["iv_buffer"]),
+        tick_times=tuple(user_state["tick_time_buffer"]),
+        candles=tuple(user_state["candles_5min_buffer"]),
+        # Chains are immutable and shared, so the snapshot just references the tick's chain
+        option_chain=user_state.get("option_chain"),
+        features=user_state.get("features"),
+        bias=user_state.get("bias", "Neutral"),
+        market_type=user_state.get("market_type", "Undetermined"),
+        # The candidate is updated in place by the logic, so the snapshot keeps its own copy
+        candidate_setup=dict(candidate) if candidate else None,
+        baseline_set=user_state.get("baseline_set", False),
+        baseline_values=dict(user_state.get("baseline_values", {})),
+        last_exit_reason=user_state.get("last_exit_reason"),
+        cooldown_until=user_state.get("cooldown_until"),
+        fetch_health=dict(user_state["fetch_health"]),
+    )
+    user_state["snapshot"] = snapshot
+    return snapshot
+
+def publish_trade_update(user_state: dict) -> TickSnapshot:
+    """
+    Republishes the latest snapshot with only the trade fields refreshed. Used when a trade closes off
+    the tick pipeline (e.g. from the exit monitor), where the buffers may be mid-update.
+    """
+    candidate = user_state.get("candidate_setup")
+    snapshot = get_tick_snapshot(user_state)._replace(
+        version=next(_versions),
+        published_at=time.time(),
+        candidate_setup=dict(candidate) if candidate else None,
+        last_exit_reason=user_state.get("last_exit_reason"),
+        cooldown_until=user_state.get("cooldown_until"),
+    )
+    user_state["snapshot"] = snapshot
+    return snapshot
+
+def get_tick_snapshot(user_state: dict | None) -> TickSnapshot:
+    """Returns the user's latest published snapshot (an empty one before the first tick)."""
+    if not user_state:
+        return EMPTY_SNAPSHOT
+    return user_state.get("snapshot") or EMPTY_SNAPSHOT
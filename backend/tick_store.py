@@ -0,0 +1,317 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+import numpy as np
+from . import chain_store
+
+# Recorded ticks live in their own database so exports and history queries never contend with trade_logs.
+TICK_DATABASE_FILE = os.getenv("TICK_DATABASE_FILE", "tick_store.db")
+# Several users poll the same chain; record at most one chain per instrument in this interval.
+MIN_RECORD_INTERVAL_SECONDS = 5
+# Chains waiting to be written. When the writer falls behind, new chains are dropped instead of blocking the fetch.
+QUEUE_SIZE = 500
+
+# Per-side columns recorded for every strike.
+SIDE_FIELDS = ("ltp", "bid", "ask", "bid_qty", "ask_qty", "oi", "volume", "delta", "gamma", "theta", "iv")
+TICK_COLUMNS = ("ts", "instrument_key", "expiry", "strike", "underlying") + tuple(
+    f"{side}_{field}" for side in ("call", "put") for field in SIDE_FIELDS
+)
+
+# Pre-aggregated buckets kept for history queries (seconds, finest first). A bucket stores, per series, the
+# first, min, max and last value of every strike as float64 arrays (blobs), so a downsampled day of all
+# strikes reads a few hundred rows instead of a million ticks.
+ROLLUP_RESOLUTIONS = (60, 300)
+ROLLUP_SERIES = TICK_COLUMNS[4:]
+ROLLUP_STATS = ("first", "min", "max", "last")
+
+_queue = queue.Queue(maxsize=QUEUE_SIZE)
+_last_recorded = {}
+_writer_started = False
+_writer_lock = threading.Lock()
+
+def tick_column_type(name: str) -> str:
+    return 'TEXT' if name in ('instrument_key', 'expiry') else 'REAL'
+
+def get_tick_db_connection():
+    """Creates a connection to the tick store."""
+    conn = sqlite3.connect(TICK_DATABASE_FILE, timeout=10)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def init_tick_db():
+    """Creates the ticks table. WAL mode lets readers (exports, warm-up) run alongside the writer."""
+    conn = get_tick_db_connection()
+    conn.execute("PRAGMA journal_mode=WAL")
+    column_defs = ", ".join(f"{name} {tick_column_type(name)}" for name in TICK_COLUMNS)
+    conn.execute(f"CREATE TABLE IF NOT EXISTS ticks ({column_defs})")
+    # Columns added since the table was created (e.g. bid/ask depth) are added to older stores
+    existing = {row["name"] for row in conn.execute("PRAGMA table_info(ticks)")}
+    for name in TICK_COLUMNS:
+        if name not in existing:
+            conn.execute(f"ALTER TABLE ticks ADD COLUMN {name} REAL")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_ticks_strike_ts ON ticks (instrument_key, strike, ts)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_ticks_ts ON ticks (ts)")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS tick_rollups (resolution INTEGER, instrument_key TEXT, series TEXT, bucket REAL, "
+        "strikes BLOB, first BLOB, low BLOB, high BLOB, last BLOB, "
+        "PRIMARY KEY (resolution, instrument_key, series, bucket)) WITHOUT ROWID"
+    )
+    conn.commit()
+    conn.close()
+
+def chain_to_rows(chain) -> list:
+    """
+    Flattens a chain_store.OptionChain into one tick row per strike.
+    The tick columns are a subset of the chain's record fields; NaN is stored as NULL by SQLite.
+    """
+    prefix = (chain.fetched_at, chain.instrument_key, chain.expiry)
+    return [prefix + values for values in chain.records[list(TICK_COLUMNS[3:])].tolist()]
+
+def record_chain(chain):
+    """
+    Queues a full option chain (a chain_store.OptionChain) for recording.
+    Never blocks: the write happens on a background thread.
+    """
+    ts = chain.fetched_at
+    if ts - _last_recorded.get(chain.instrument_key, 0) < MIN_RECORD_INTERVAL_SECONDS:
+        return
+    _last_recorded[chain.instrument_key] = ts
+    _start_writer()
+    try:
+        _queue.put_nowait(chain_to_rows(chain))
+    except queue.Full:
+        print("Tick store writer is behind; dropping a chain.")
+
+class _Rollup:
+    """The bucket being formed for one resolution and instrument: per strike (rows) and series (columns) stats."""
+
+    def __init__(self, bucket: float, strikes: np.ndarray, stats: dict):
+        self.bucket = bucket
+        self.strikes = strikes
+        self.stats = stats  # stat -> (strike, series) array
+
+    def add(self, strikes: np.ndarray, values: np.ndarray):
+        missing = np.setdiff1d(strikes, self.strikes)
+        if missing.size:
+            new_strikes = np.union1d(self.strikes, missing)
+            index = np.searchsorted(new_strikes, self.strikes)
+            for stat, array in self.stats.items():
+                grown = np.full((len(new_strikes), len(ROLLUP_SERIES)), np.nan)
+                grown[index] = array
+                self.stats[stat] = grown
+            self.strikes = new_strikes
+        rows = np.searchsorted(self.strikes, strikes)
+        first, low, high, last = (self.stats[stat] for stat in ROLLUP_STATS)
+        first[rows] = np.where(np.isnan(first[rows]), values, first[rows])
+        low[rows] = np.fmin(low[rows], values)
+        high[rows] = np.fmax(high[rows], values)
+        last[rows] = np.where(np.isnan(values), last[rows], values)
+
+def _load_rollup_bucket(conn, resolution: int, instrument_key: str, bucket: float) -> _Rollup | None:
+    """Reads back a bucket that was being formed before a restart, so it is continued rather than overwritten."""
+    rows = conn.execute("SELECT series, strikes, first, low, high, last FROM tick_rollups "
+                        "WHERE resolution = ? AND instrument_key = ? AND bucket = ?", (resolution, instrument_key, bucket)).fetchall()
+    if not rows:
+        return None
+    strikes = np.frombuffer(rows[0][1])
+    stats = {stat: np.full((len(strikes), len(ROLLUP_SERIES)), np.nan) for stat in ROLLUP_STATS}
+    for row in rows:
+        if row[0] in ROLLUP_SERIES and len(row[1]) == strikes.nbytes:
+            for stat, blob in zip(ROLLUP_STATS, row[2:]):
+                stats[stat][:, ROLLUP_SERIES.index(row[0])] = np.frombuffer(blob)
+    return _Rollup(bucket, strikes, stats)
+
+def _update_rollups(conn, rows: list, rollups: dict):
+    """Adds tick rows (in time order) to the rollups being formed, then writes the touched buckets."""
+    upsert = ("INSERT OR REPLACE INTO tick_rollups (resolution, instrument_key, series, bucket, strikes, first, low, high, last) "
+              "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)")
+    values = np.array([row[4:] for row in rows], dtype=float)
+    strikes = np.array([row[3] for row in rows], dtype=float)
+    touched = {}
+    start = 0
+    for end in range(1, len(rows) + 1):
+        # One chain at a time: rows of the same instrument and time
+        if end < len(rows) and rows[end][:2] == rows[start][:2]:
+            continue
+        ts, instrument_key = rows[start][:2]
+        for resolution in ROLLUP_RESOLUTIONS:
+            bucket = ts // resolution * resolution
+            rollup = rollups.get((resolution, instrument_key))
+            if rollup is None or rollup.bucket != bucket:
+                rollup = _load_rollup_bucket(conn, resolution, instrument_key, bucket) or _Rollup(
+                    bucket, np.empty(0), {stat: np.empty((0, len(ROLLUP_SERIES))) for stat in ROLLUP_STATS})
+                rollups[(resolution, instrument_key)] = rollup
+            rollup.add(strikes[start:end], values[start:end])
+            touched[(resolution, instrument_key, bucket)] = rollup
+        start = end
+    conn.executemany(upsert, [
+        (resolution, instrument_key, series, bucket, rollup.strikes.tobytes())
+        + tuple(np.ascontiguousarray(rollup.stats[stat][:, column]).tobytes() for stat in ROLLUP_STATS)
+        for (resolution, instrument_key, bucket), rollup in touched.items()
+        for column, series in enumerate(ROLLUP_SERIES)
+    ])
+
+def _writer_loop():
+    conn = get_tick_db_connection()
+    insert = f"INSERT INTO ticks ({', '.join(TICK_COLUMNS)}) VALUES ({', '.join('?' * len(TICK_COLUMNS))})"
+    rollups = {}  # (resolution, instrument_key) -> _Rollup being formed
+    while True:
+        rows = _queue.get()
+        # Batch whatever else is already waiting into the same transaction
+        while not _queue.empty() and len(rows) < 10000:
+            rows.extend(_queue.get_nowait())
+        try:
+            conn.executemany(insert, rows)
+            _update_rollups(conn, rows, rollups)
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"Error writing ticks: {e}")
+
+def _start_writer():
+    global _writer_started
+    if _writer_started:
+        return
+    with _writer_lock:
+        if not _writer_started:
+            init_tick_db()
+            threading.Thread(target=_writer_loop, daemon=True, name="tick_store_writer").start()
+            _writer_started = True
+
+def load_strike_history(instrument_key: str, strike: float, since_ts: float) -> list:
+    """
+    Returns the recorded call-side ticks of one strike since `since_ts`, oldest first.
+    """
+    if not os.path.exists(TICK_DATABASE_FILE):
+        return []
+    conn = get_tick_db_connection()
+    try:
+        rows = conn.execute(
+            "SELECT ts, underlying, call_ltp, call_delta, call_gamma, call_theta, call_iv FROM ticks "
+            "WHERE instrument_key = ? AND strike = ? AND ts >= ? ORDER BY ts",
+            (instrument_key, strike, since_ts),
+        ).fetchall()
+    except sqlite3.OperationalError:
+        return []  # No ticks recorded yet
+    finally:
+        conn.close()
+    return [dict(row) for row in rows]
+
+def iter_chains(instrument_key: str, since_ts: float, until_ts: float = float("inf")):
+    """
+    Yields the recorded chains of an instrument from `since_ts`, oldest first, as chain_store.OptionChain
+    objects (fields that aren't recorded, like instrument keys and vega, are empty), for replays.
+    """
+    if not os.path.exists(TICK_DATABASE_FILE):
+        return
+    conn = get_tick_db_connection()
+    try:
+        cursor = conn.execute(
+            f"SELECT {', '.join(TICK_COLUMNS)} FROM ticks WHERE instrument_key = ? AND ts >= ? AND ts < ? ORDER BY ts, strike",
+            (instrument_key, since_ts, until_ts),
+        )
+        rows = []
+        for row in cursor:
+            if rows and row["ts"] != rows[0]["ts"]:
+                yield _rows_to_chain(rows)
+                rows = []
+            rows.append(row)
+        if rows:
+            yield _rows_to_chain(rows)
+    except sqlite3.OperationalError:
+        return  # No ticks recorded yet
+    finally:
+        conn.close()
+
+def iter_tick_rows(since_ts: float, until_ts: float = float("inf"), instrument_key: str | None = None,
+                   strike: float | None = None, chunk_rows: int = 5000):
+    """
+    Yields the recorded ticks (tuples in TICK_COLUMNS order) with since_ts <= ts < until_ts in chunks, oldest
+    first. Each chunk is a separate query that resumes after the last row (the ts index carries the rowid),
+    so memory stays flat whatever the range and no read transaction stays open between chunks.
+    """
+    if not os.path.exists(TICK_DATABASE_FILE):
+        return
+    filters, params = ["ts >= ?", "ts < ?"], [since_ts, until_ts]
+    if instrument_key:
+        filters.append("instrument_key = ?")
+        params.append(instrument_key)
+    if strike is not None:
+        filters.append("strike = ?")
+        params.append(strike)
+    query = (f"SELECT rowid, {', '.join(TICK_COLUMNS)} FROM ticks WHERE {' AND '.join(filters)} "
+             "AND (ts, rowid) > (?, ?) ORDER BY ts, rowid LIMIT ?")
+    last = (since_ts, 0)
+    while True:
+        conn = sqlite3.connect(TICK_DATABASE_FILE, timeout=10)
+        try:
+            rows = conn.execute(query, (*params, *last, chunk_rows)).fetchall()
+        except sqlite3.OperationalError:
+            return  # No ticks recorded yet
+        finally:
+            conn.close()
+        if not rows:
+            return
+        yield [row[1:] for row in rows]
+        last = (rows[-1][1], rows[-1][0])
+
+def rebuild_rollups():
+    """Recomputes the rollups from the recorded ticks (e.g. for ticks recorded before rollups existed)."""
+    init_tick_db()
+    conn = get_tick_db_connection()
+    conn.execute("DELETE FROM tick_rollups")
+    rollups = {}
+    count = 0
+    for rows in iter_tick_rows(0):
+        _update_rollups(conn, rows, rollups)
+        conn.commit()
+        count += len(rows)
+    conn.close()
+    print(f"Rebuilt tick rollups from {count} ticks.")
+
+def load_series(instrument_key: str, series: str, since_ts: float, until_ts: float, strike: float | None = None) -> list:
+    """Returns [(ts, strike, value)] of one recorded series, ordered by time. `series` must be a tick column."""
+    if not os.path.exists(TICK_DATABASE_FILE):
+        return []
+    conn = sqlite3.connect(TICK_DATABASE_FILE, timeout=10)  # Plain tuples: these can be many rows
+    try:
+        query = f"SELECT ts, strike, {series} FROM ticks WHERE instrument_key = ? AND ts >= ? AND ts < ?"
+        params = [instrument_key, since_ts, until_ts]
+        if strike is not None:
+            query += " AND strike = ?"
+            params.append(strike)
+        return conn.execute(query + " ORDER BY ts", params).fetchall()
+    except sqlite3.OperationalError:
+        return []
+    finally:
+        conn.close()
+
+def load_rollup(resolution: int, instrument_key: str, series: str, since_ts: float, until_ts: float) -> list:
+    """
+    Returns [(bucket, strikes, first, min, max, last)] of one series at a rollup resolution, ordered by bucket,
+    with each of the last five a float64 array over the bucket's strikes.
+    """
+    if not os.path.exists(TICK_DATABASE_FILE):
+        return []
+    conn = sqlite3.connect(TICK_DATABASE_FILE, timeout=10)
+    try:
+        rows = conn.execute(
+            "SELECT bucket, strikes, first, low, high, last FROM tick_rollups "
+            "WHERE resolution = ? AND instrument_key = ? AND series = ? AND bucket >= ? AND bucket < ? ORDER BY bucket",
+            (resolution, instrument_key, series, since_ts // resolution * resolution, until_ts),
+        ).fetchall()
+    except sqlite3.OperationalError:
+        return []
+    finally:
+        conn.close()
+    return [(row[0],) + tuple(np.frombuffer(blob) for blob in row[1:]) for row in rows]
+
+def _rows_to_chain(rows: list) -> chain_store.OptionChain:
+    records = np.zeros(len(rows), dtype=chain_store.CHAIN_DTYPE)
+    for name in chain_store.CHAIN_DTYPE.names:
+        if records.dtype[name].kind == "f":
+            records[name] = np.nan
+    for name in TICK_COLUMNS[3:]:
+        records[name] = [np.nan if row[name] is None else row[name] for row in rows]
+    return chain_store.OptionChain(rows[0]["instrument_key"], rows[0]["expiry"], rows[0]["ts"], records)
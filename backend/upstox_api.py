@@ -0,0 +1,160 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import requests
+
+DEFAULT_BASE_URL = "https://api-v2.upstox.com"
+# The underlying whose option chain the strategy trades.
+NIFTY_INSTRUMENT_KEY = "NSE_INDEX|Nifty 50"
+
+def base_url() -> str:
+    """
+    Returns the Upstox API base URL.
+    Set UPSTOX_API_BASE_URL (e.g. to a local backend.mock_upstox server) to run without live credentials.
+    """
+    return os.getenv("UPSTOX_API_BASE_URL", DEFAULT_BASE_URL).rstrip("/")
+
+def auth_headers(access_token: str | None = None) -> dict:
+    """Builds the standard Upstox request headers, with a bearer token if one is given."""
+    headers = {"Accept": "application/json"}
+    if access_token:
+        headers["Authorization"] = f"Bearer {access_token}"
+    return headers
+
+# --- Rate limiting ---
+# Upstox limits requests per access token across all endpoints (50/s, 500/min). Every outbound call
+# for a token draws from that token's bucket, whether it comes from the fetch job, the exit monitor or warm-up.
+RATE_LIMIT_PER_SECOND = float(os.getenv("UPSTOX_RATE_LIMIT_PER_SECOND", "8"))   # Sustained, stays under 500/min
+RATE_LIMIT_BURST = float(os.getenv("UPSTOX_RATE_LIMIT_BURST", "20"))
+# How long a caller may wait for a token before giving up on the request.
+RATE_LIMIT_MAX_WAIT_SECONDS = 2.0
+
+class RateLimited(requests.exceptions.RequestException):
+    """Raised when no request token became available in time."""
+
+class TokenBucket:
+    """A thread-safe token bucket: `rate` tokens per second, holding at most `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, max_wait: float = RATE_LIMIT_MAX_WAIT_SECONDS) -> bool:
+        """Takes one token, waiting up to `max_wait` seconds for it. Returns False if none became available."""
+        deadline = time.monotonic() + max_wait
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self.paused_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = max(self.paused_until - now, (1 - self.tokens) / self.rate)
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        """Stops handing out tokens for a while, e.g. after the server answered 429."""
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+def get_bucket(access_token: str | None) -> TokenBucket:
+    """Returns the shared bucket for an access token (unauthenticated calls share one bucket)."""
+    with _buckets_lock:
+        if access_token not in _buckets:
+            _buckets[access_token] = TokenBucket(RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST)
+        return _buckets[access_token]
+
+# --- Timeouts and hedging ---
+# Per-request socket timeout, so no call can hang a scheduler job indefinitely.
+REQUEST_TIMEOUT_SECONDS = float(os.getenv("UPSTOX_REQUEST_TIMEOUT_SECONDS", "5"))
+# Hard deadline for a hedged fetch, including the hedge.
+REQUEST_DEADLINE_SECONDS = float(os.getenv("UPSTOX_REQUEST_DEADLINE_SECONDS", "4"))
+# A hedge is sent once the first attempt is slower than the path's p95, but never sooner than this.
+HEDGE_MIN_DELAY_SECONDS = 0.25
+# Until this many latencies have been seen for a path, hedge after a fixed delay.
+HEDGE_MIN_SAMPLES = 20
+HEDGE_DEFAULT_DELAY_SECONDS = 1.0
+
+_latencies = {}
+_hedge_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="upstox_hedge")
+
+def _send(method, path: str, access_token: str | None, max_wait: float = RATE_LIMIT_MAX_WAIT_SECONDS, **kwargs) -> requests.Response:
+    bucket = get_bucket(access_token)
+    if not bucket.acquire(max_wait):
+        raise RateLimited(f"Upstox rate limit reached; skipped {path}")
+    kwargs.setdefault("timeout", REQUEST_TIMEOUT_SECONDS)
+    started = time.monotonic()
+    response = method(f"{base_url()}{path}", headers=auth_headers(access_token), **kwargs)
+    if response.status_code == 429:
+        retry_after = response.headers.get("Retry-After")
+        bucket.pause(float(retry_after) if retry_after and retry_after.isdigit() else 1.0)
+    elif response.status_code == 200:
+        _latencies.setdefault(path, deque(maxlen=200)).append(time.monotonic() - started)
+    return response
+
+def hedge_delay(path: str) -> float:
+    """Returns how long to wait for a request to a path before hedging it: its recent p95 latency."""
+    samples = sorted(_latencies.get(path, ()))
+    if len(samples) < HEDGE_MIN_SAMPLES:
+        return HEDGE_DEFAULT_DELAY_SECONDS
+    return max(HEDGE_MIN_DELAY_SECONDS, samples[int(0.95 * (len(samples) - 1))])
+
+def get_hedged(path: str, access_token: str | None = None, params: dict | None = None,
+               deadline: float = REQUEST_DEADLINE_SECONDS) -> requests.Response:
+    """
+    Sends a GET that must answer within `deadline` seconds. If the first attempt is slower than the
+    path's p95, an identical second request is sent and whichever answers first is used.
+    Raises requests.exceptions.Timeout when the deadline passes without a response.
+    """
+    started = time.monotonic()
+    attempts = [_hedge_pool.submit(_send, requests.get, path, access_token, params=params, timeout=deadline)]
+    done, _ = wait(attempts, timeout=min(hedge_delay(path), deadline))
+    if not done:
+        # The hedge only goes out if a request token is free right now; it must never queue behind the rate limit.
+        remaining = deadline - (time.monotonic() - started)
+        attempts.append(_hedge_pool.submit(_send, requests.get, path, access_token, max_wait=0, params=params, timeout=remaining))
+
+    pending = set(attempts)
+    last_error = None
+    while pending:
+        remaining = deadline - (time.monotonic() - started)
+        if remaining <= 0:
+            break
+        done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+        for attempt in done:
+            try:
+                return attempt.result()
+            except requests.exceptions.RequestException as e:
+                last_error = e  # e.g. the hedge was rate limited; keep waiting for the other attempt
+    if last_error and not pending:
+        raise last_error
+    raise requests.exceptions.Timeout(f"No response from {path} within {deadline:g}s")
+
+def get(path: str, access_token: str | None = None, params: dict | None = None, **kwargs) -> requests.Response:
+    """Sends a rate-limited GET request to an Upstox API path, e.g. '/option/chain'."""
+    return _send(requests.get, path, access_token, params=params, **kwargs)
+
+def post(path: str, access_token: str | None = None, data: dict | None = None, **kwargs) -> requests.Response:
+    """Sends a rate-limited POST request to an Upstox API path, e.g. '/login/authorization/token'."""
+    return _send(requests.post, path, access_token, data=data, **kwargs)
+
+def forget_token(access_token: str):
+    """Drops the bucket of a token that is no longer in use (on logout)."""
+    with _buckets_lock:
+        _buckets.pop(access_token, None)
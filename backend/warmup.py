@@ -0,0 +1,128 @@
+import datetime
+import time
+import urllib.parse
+import requests
+from . import pipeline
+from . import tick_store
+from . import upstox_api
+
+# Buffers pre-filled from the recorded tick store, and the tick column each one is filled from.
+GREEK_BUFFER_COLUMNS = {
+    "price_buffer": "underlying",
+    "premium_buffer": "call_ltp",
+    "delta_buffer": "call_delta",
+    "gamma_buffer": "call_gamma",
+    "theta_buffer": "call_theta",
+    "iv_buffer": "call_iv",
+    "tick_time_buffer": "ts",
+}
+# Only history this recent is used, so the buffers don't bridge a long gap (e.g. a lunch-time restart).
+MAX_HISTORY_AGE_SECONDS = 600
+
+def _bucket_start(t: datetime.datetime) -> datetime.datetime:
+    return t.replace(minute=t.minute - (t.minute % 5), second=0, microsecond=0)
+
+def _five_minute_buckets(one_minute_candles: list) -> dict:
+    """Groups Upstox 1-minute candles ([timestamp, open, high, low, close, volume, oi], any order) by 5-minute start."""
+    buckets = {}
+    for candle in sorted(one_minute_candles, key=lambda c: c[0]):
+        timestamp, candle_open, candle_high, candle_low, candle_close = candle[:5]
+        # Convert to the server's local time, the same clock process_5min_candle uses
+        t = datetime.datetime.fromisoformat(timestamp).astimezone().replace(tzinfo=None)
+        start = _bucket_start(t)
+        bucket = buckets.get(start)
+        if bucket is None:
+            buckets[start] = [candle_open, candle_high, candle_low, candle_close]
+        else:
+            bucket[1] = max(bucket[1], candle_high)
+            bucket[2] = min(bucket[2], candle_low)
+            bucket[3] = candle_close
+    return buckets
+
+def aggregate_candles(one_minute_candles: list, now: datetime.datetime) -> list:
+    """
+    Aggregates Upstox 1-minute candles into closed 5-minute candles in the candles_5min_buffer format, oldest first.
+    """
+    buckets = _five_minute_buckets(one_minute_candles)
+    current_start = _bucket_start(now)
+    candles = []
+    for start in sorted(buckets):
+        if start >= current_start:
+            continue  # Still forming; see forming_candle
+        # Live candles are labelled with the 5-minute mark at which they close (see process_5min_candle)
+        label = start + datetime.timedelta(minutes=5)
+        candles.append([label.isoformat()] + buckets[start])
+    return candles
+
+def forming_candle(one_minute_candles: list, now: datetime.datetime) -> dict | None:
+    """
+    The part of the current 5-minute candle before `now`, in the pipeline's forming_candle format.
+    Seeding the pipeline with it lets the candle a user logs in during close as a complete one.
+    """
+    start = _bucket_start(now)
+    bucket = _five_minute_buckets(one_minute_candles).get(start)
+    if bucket is None:
+        return None
+    bucket_start = start.timestamp()
+    return {
+        "bucket": pipeline.candle_bucket(bucket_start), "first_tick_at": bucket_start,
+        "open": bucket[0], "high": bucket[1], "low": bucket[2], "close": bucket[3],
+    }
+
+def fetch_intraday_candles(access_token: str, instrument_key: str) -> list:
+    """
+    Loads today's session in a single request to the Upstox intraday candle API
+    and returns its 1-minute candles.
+    """
+    path = f"/historical-candle/intraday/{urllib.parse.quote(instrument_key, safe='')}/1minute"
+    try:
+        response = upstox_api.get(path, access_token, timeout=10)
+    except requests.exceptions.RequestException as e:
+        print(f"Error fetching intraday candles for warm-up: {e}")
+        return []
+    if response.status_code != 200:
+        print(f"Error fetching intraday candles for warm-up: {response.text}")
+        return []
+    return response.json().get("data", {}).get("candles", [])
+
+def prefill_greek_buffers(user_state: dict, instrument_key: str, strike: float) -> int:
+    """
+    Prepends the monitored strike's recent recorded ticks to the price/premium/Greek buffers.
+    Returns the number of ticks loaded.
+    """
+    now = time.time()
+    history = tick_store.load_strike_history(instrument_key, strike, now - MAX_HISTORY_AGE_SECONDS)
+    # Skip the tick that was recorded by the fetch that triggered the warm-up; it's already in the buffers
+    history = [row for row in history if row["ts"] < now - 2]
+    if not history:
+        return 0
+    for buffer_name, column in GREEK_BUFFER_COLUMNS.items():
+        buffer = user_state[buffer_name]
+        live_values = list(buffer)
+        buffer.clear()
+        buffer.extend(row[column] for row in history)
+        buffer.extend(live_values)
+    return len(history)
+
+def warm_up_user(user_name: str, user_state: dict, instrument_key: str):
+    """
+    Runs once, on a user's first tick: bulk-loads today's 5-minute candles and the monitored strike's
+    recent Greek history, so candle-based logic and Greek smoothing don't have to wait for live data.
+    """
+    user_state["warmed_up"] = True
+    candles_loaded = 0
+    # A session restored from a snapshot already has its candles
+    if not user_state["candles_5min_buffer"]:
+        one_minute_candles = fetch_intraday_candles(user_state.get("access_token"), instrument_key)
+        now = datetime.datetime.now()
+        candles = aggregate_candles(one_minute_candles, now)
+        user_state["candles_5min_buffer"].extend(candles)
+        candles_loaded = len(candles)
+        # The current candle started before login; without its history the pipeline would drop it as partial
+        if user_state.get("forming_candle") is None:
+            user_state["forming_candle"] = forming_candle(one_minute_candles, now)
+
+    ticks_loaded = 0
+    if user_state.get("monitored_strike") is not None:
+        ticks_loaded = prefill_greek_buffers(user_state, instrument_key, user_state["monitored_strike"])
+    print(f"[{user_name}] Warm-up loaded {candles_loaded} 5-min candles and {ticks_loaded} recorded ticks.")
@@ -0,0 +1,78 @@
+"""
+Negotiated WebSocket encodings for the live dashboard stream.
+
+A client picks an encoding through the WebSocket subprotocol (Sec-WebSocket-Protocol):
+    goo.msgpack-delta.v1  binary MessagePack frames (needs the msgpack package on the server)
+    goo.json-delta.v1     JSON text frames
+    (none)                the original JSON payload, every field on every message, numbers as strings
+
+Both delta encodings send numbers natively and, after a first "full" message, only the fields that
+changed: {"t": "full" | "delta", "v": <snapshot version>, "d": {field: value, ...}}.
+Nothing is sent while nothing changes. Per-message deflate is negotiated by uvicorn's WebSocket
+implementation on top of any of these when the client offers it (browsers do).
+"""
+import importlib.util
+import json
+
+MSGPACK_DELTA = "goo.msgpack-delta.v1"
+JSON_DELTA = "goo.json-delta.v1"
+
+def supported_protocols() -> list:
+    # msgpack is optional (clients fall back to JSON deltas) and only imported once a client negotiates it
+    return ([MSGPACK_DELTA] if importlib.util.find_spec("msgpack") is not None else []) + [JSON_DELTA]
+
+def choose_protocol(offered: list) -> str | None:
+    """Returns the first subprotocol the client offered that the server supports, or None for the legacy stream."""
+    supported = supported_protocols()
+    for protocol in offered:
+        if protocol in supported:
+            return protocol
+    return None
+
+def _rounded(value, digits: int):
+    # More precision than the dashboard shows would only make unchanged values look changed
+    return round(value, digits) if isinstance(value, float) else value
+
+def live_fields(snapshot, exit_reason: str | None, now: float) -> dict:
+    """The dashboard's fields for one snapshot, as native values."""
+    return {
+        "nifty_price": _rounded(snapshot.latest("prices"), 2),
+        "delta": _rounded(snapshot.latest("deltas"), 6),
+        "gamma": _rounded(snapshot.latest("gammas"), 6),
+        "theta": _rounded(snapshot.latest("thetas"), 6),
+        "iv": _rounded(snapshot.latest("ivs"), 6),
+        "bias": snapshot.bias,
+        "market_type": snapshot.market_type,
+        "candidate_setup": snapshot.candidate_setup,
+        "data_stale": snapshot.is_stale(now),
+        "last_exit_reason": exit_reason,
+    }
+
+class DeltaEncoder:
+    """Encodes one connection's messages, remembering what the client already has."""
+
+    def __init__(self, protocol: str):
+        self.binary = protocol == MSGPACK_DELTA
+        if self.binary:
+            import msgpack
+            self._packb = msgpack.packb
+        self.sent = None
+
+    def reset(self):
+        """Forgets the client's state, so the next message is a full one (e.g. after a logout)."""
+        self.sent = None
+
+    def encode(self, fields: dict, version: int) -> bytes | str | None:
+        """Returns the next frame for these fields, or None if nothing changed."""
+        if self.sent is None:
+            message = {"t": "full", "v": version, "d": fields}
+            self.sent = dict(fields)
+        else:
+            changed = {key: value for key, value in fields.items() if self.sent.get(key) != value or key not in self.sent}
+            if not changed:
+                return None
+            message = {"t": "delta", "v": version, "d": changed}
+            self.sent.update(changed)
+        if self.binary:
+            return self._packb(message, default=str)
+        return json.dumps(message, separators=(",", ":"), default=str)
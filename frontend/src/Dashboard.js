@@ -6,6 +6,12 @@ import LiveMarketOverview from './LiveMarketOverview'; // Assuming this is a com
 import GreeksMonitor from './GreeksMonitor';
 import ActiveTradeBox from './ActiveTradeBox';
 
+// Compact stream: native numbers, and only the fields that changed since the last message
+const WS_PROTOCOL = 'goo.json-delta.v1';
+
+const formatNumber = (value, digits, placeholder) =>
+  typeof value === 'number' ? value.toFixed(digits) : (value ?? placeholder);
+
 const Dashboard = () => {
   // Placeholder state for all data
   const [status, setStatus] = useState({ bias: 'Neutral', market_type: 'Undetermined' });
@@ -30,7 +36,9 @@ const Dashboard = () => {
 
     const wsURL = `${wsBaseUrl}/ws/${userName}`; // This constructs ws:// or wss:// automatically
 
-    const ws = new WebSocket(wsURL);
+    const ws = new WebSocket(wsURL, [WS_PROTOCOL]);
+    // The latest value of every field; delta messages are merged into it
+    const live = {};
 
     ws.onopen = () => {
       console.log(`WebSocket connected for user: ${userName} at ${wsURL}`);
@@ -39,18 +47,27 @@ const Dashboard = () => {
 
     ws.onmessage = (event) => {
       try {
-        const data = JSON.parse(event.data);
+        const message = JSON.parse(event.data);
+        // An older backend that doesn't speak the delta protocol sends every field on every message
+        const changes = ws.protocol === WS_PROTOCOL ? message.d : message;
+        Object.assign(live, changes);
+        const data = live;
         setStatus({ bias: data.bias, market_type: data.market_type });
-        setMarket({ nifty_price: data.nifty_price });
-        setGreeks({ delta: data.delta, gamma: data.gamma, theta: data.theta, iv: data.iv });
+        setMarket({ nifty_price: formatNumber(data.nifty_price, 2, 'Fetching...') });
+        setGreeks({
+          delta: formatNumber(data.delta, 4, '--'),
+          gamma: formatNumber(data.gamma, 4, '--'),
+          theta: formatNumber(data.theta, 4, '--'),
+          iv: formatNumber(data.iv, 4, '--'),
+        });
   
         // New, simpler logic to show the final result of a closed trade
-        if (data.last_exit_reason) {
+        if (changes.last_exit_reason) {
           // If the backend sends a last_exit_reason, a trade was just closed.
-          setSignal({ type: 'CLOSED', status: data.last_exit_reason });
+          setSignal({ type: 'CLOSED', status: changes.last_exit_reason });
           // Clear the "CLOSED" message after 10 seconds
           setTimeout(() => setSignal(null), 10000);
-        } else {
+        } else if ('candidate_setup' in changes) {
           // Otherwise, just show the current candidate setup
           setSignal(data.candidate_setup);
         }
@@ -29,7 +29,9 @@ const Login = () => {
       return;
     }
 
-    const authUrl = `https://api-v2.upstox.com/login/authorization/dialog?client_id=${clientId}&redirect_uri=${redirectUri}&response_type=code&state=${user}`;
+    // REACT_APP_UPSTOX_BASE_URL can point the login at a local mock Upstox server (backend/mock_upstox.py)
+    const upstoxBaseUrl = process.env.REACT_APP_UPSTOX_BASE_URL || 'https://api-v2.upstox.com';
+    const authUrl = `${upstoxBaseUrl}/login/authorization/dialog?client_id=${clientId}&redirect_uri=${redirectUri}&response_type=code&state=${user}`;
     window.location.href = authUrl;
   };
 
@@ -0,0 +1,39 @@
+import os
+import socket
+import sys
+import threading
+import time
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend import mock_upstox
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+@pytest.fixture(scope="session")
+def mock_upstox_server():
+    """A backend.mock_upstox server on a free port, with no added latency or errors. Yields its base URL."""
+    import uvicorn
+    mock_upstox.config.update({"latency_ms": 0, "latency_jitter_ms": 0, "error_rate": 0})
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(mock_upstox.app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    deadline = time.monotonic() + 10
+    while not server.started:
+        assert time.monotonic() < deadline, "mock_upstox did not start"
+        time.sleep(0.01)
+    yield f"http://127.0.0.1:{port}"
+    server.should_exit = True
+
+@pytest.fixture
+def upstox(mock_upstox_server, monkeypatch):
+    """Points the backend at the mock server and clears the orders it received."""
+    monkeypatch.setenv("UPSTOX_API_BASE_URL", mock_upstox_server)
+    mock_upstox._orders.clear()
+    saved = dict(mock_upstox.config)
+    yield mock_upstox
+    mock_upstox.config.update(saved)
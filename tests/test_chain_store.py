@@ -0,0 +1,13 @@
+import datetime
+import pickle
+import pytest
+from backend import chain_store, mock_upstox
+
+def test_unpickled_chain_stays_read_only():
+    expiry = (datetime.date.today() + datetime.timedelta(days=7)).isoformat()
+    raw = mock_upstox.build_option_chain("NSE_INDEX|Nifty 50", expiry, 5)
+    chain = pickle.loads(pickle.dumps(chain_store.from_upstox("NSE_INDEX|Nifty 50", expiry, raw)))
+
+    assert len(chain) == 5 and not chain.records.flags.writeable
+    with pytest.raises(ValueError):
+        chain.records["call_ltp"][0] = 0.0
@@ -0,0 +1,115 @@
+import itertools
+import uuid
+import pytest
+from backend import execution
+from backend.state import app_state, get_default_user_state
+
+_log_ids = itertools.count(1000)
+
+@pytest.fixture
+def accounts(upstox, monkeypatch):
+    """Logs accounts in (on the mock and in app_state) by name; returns a function taking the names."""
+    monkeypatch.setitem(app_state, "users", {})
+    for name in ("_sessions", "_prepared", "_entered", "_entry_sends"):
+        monkeypatch.setattr(execution, name, {})
+
+    def log_in(*names, valid=True):
+        for name in names:
+            token = f"test-{uuid.uuid4().hex}"
+            if valid:
+                upstox._tokens[token] = name
+            user_state = app_state["users"].setdefault(name, get_default_user_state())
+            user_state["access_token"] = token
+    return log_in
+
+def _candidate() -> dict:
+    return {"log_id": next(_log_ids), "instrument_key": "NSE_FO|12345", "strike_price": 25100}
+
+def _settings(*names) -> dict:
+    return {"execution_accounts": ", ".join(names), "order_quantity": "75", "order_product": "I"}
+
+def _wait(futures: dict) -> dict:
+    return {account: future.result(timeout=10) for account, future in futures.items()}
+
+def _orders(upstox, candidate: dict, side: str) -> list:
+    return sorted(order["user_name"] for order in upstox._orders
+                  if order["tag"] == f"goo-{candidate['log_id']}" and order["transaction_type"] == side)
+
+def test_entry_and_exit_go_to_every_linked_account(upstox, accounts):
+    accounts("lead", "second", "third")
+    settings = _settings("lead", "second", "third")
+    candidate = _candidate()
+    execution.prepare(candidate, "BUY", settings)
+
+    assert _wait(execution.fire(candidate, "BUY", settings)) == {"lead": True, "second": True, "third": True}
+    assert _wait(execution.fire(candidate, "SELL", settings)) == {"lead": True, "second": True, "third": True}
+    assert _orders(upstox, candidate, "BUY") == ["lead", "second", "third"]
+    assert _orders(upstox, candidate, "SELL") == ["lead", "second", "third"]
+    assert all(order["quantity"] == 75 and order["order_type"] == "MARKET" for order in upstox._orders)
+
+def test_exit_skips_account_logged_out_at_entry(upstox, accounts):
+    accounts("lead", "late")
+    app_state["users"]["late"]["access_token"] = None
+    settings = _settings("lead", "late")
+    candidate = _candidate()
+
+    assert _wait(execution.fire(candidate, "BUY", settings)) == {"lead": True}
+    accounts("late")  # Logs in while the trade is open
+    assert _wait(execution.fire(candidate, "SELL", settings)) == {"lead": True}
+    assert _orders(upstox, candidate, "SELL") == ["lead"]
+
+def test_exit_skips_account_whose_entry_was_rejected(upstox, accounts):
+    accounts("lead")
+    accounts("expired", valid=False)  # The broker answers 401
+    settings = _settings("lead", "expired")
+    candidate = _candidate()
+
+    assert _wait(execution.fire(candidate, "BUY", settings)) == {"lead": True, "expired": False}
+    assert _wait(execution.fire(candidate, "SELL", settings)) == {"lead": True}
+    assert _orders(upstox, candidate, "SELL") == ["lead"]
+
+def test_exit_skips_account_whose_entry_failed_to_send(upstox, accounts, monkeypatch):
+    accounts("lead", "offline")
+    settings = _settings("lead", "offline")
+    candidate = _candidate()
+    execution.prepare(candidate, "BUY", settings)
+    # The offline account's connection fails
+    request = execution._prepared[(candidate["log_id"], "BUY")]["offline"]
+    request.url = "http://127.0.0.1:9/order/place"
+
+    assert _wait(execution.fire(candidate, "BUY", settings)) == {"lead": True, "offline": False}
+    assert _wait(execution.fire(candidate, "SELL", settings)) == {"lead": True}
+
+def test_exit_skips_account_linked_after_entry(upstox, accounts):
+    accounts("lead", "newcomer")
+    candidate = _candidate()
+
+    _wait(execution.fire(candidate, "BUY", _settings("lead")))
+    assert _wait(execution.fire(candidate, "SELL", _settings("lead", "newcomer"))) == {"lead": True}
+    assert _orders(upstox, candidate, "SELL") == ["lead"]
+
+def test_exit_still_closes_account_unlinked_after_entry(upstox, accounts):
+    accounts("lead", "leaver")
+    candidate = _candidate()
+
+    _wait(execution.fire(candidate, "BUY", _settings("lead", "leaver")))
+    assert _wait(execution.fire(candidate, "SELL", _settings("lead"))) == {"lead": True, "leaver": True}
+
+def test_exit_waits_for_entry_in_flight(upstox, accounts):
+    accounts("lead")
+    upstox.config.update({"latency_ms": 300, "latency_jitter_ms": 0})
+    settings = _settings("lead")
+    candidate = _candidate()
+
+    entries = execution.fire(candidate, "BUY", settings)
+    exits = execution.fire(candidate, "SELL", settings)  # Before the entry is acknowledged
+    assert not entries["lead"].done()
+    assert _wait(exits) == {"lead": True}
+    assert [order["transaction_type"] for order in upstox._orders] == ["BUY", "SELL"]
+
+def test_exit_without_entries_sends_nothing(upstox, accounts):
+    accounts("lead")
+    candidate = _candidate()
+
+    assert execution.fire(candidate, "SELL", _settings("lead")) == {}
+    assert upstox._orders == []
@@ -0,0 +1,179 @@
+import datetime
+import sys
+import threading
+import time
+import types
+import uuid
+import pytest
+from backend import database, exit_monitor, logic, market_data
+from backend.state import get_default_user_state
+
+# Polled over REST from the mock, where an index trades far above the simulated option premium
+INSTRUMENT_KEY = "NSE_INDEX|Nifty 50"
+
+class _MarketHours(datetime.datetime):
+    @classmethod
+    def utcnow(cls):
+        return cls.combine(datetime.date.today(), datetime.time(5, 0))
+
+def _wait_for(condition, timeout: float = 5) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+@pytest.fixture
+def feed(upstox, tmp_path, monkeypatch):
+    """A fresh simulated feed, fast polling, a scratch database and a clock inside market hours."""
+    monkeypatch.setattr(database, "DATABASE_FILE", str(tmp_path / "trading_log.db"))
+    database.init_db()
+    monkeypatch.setattr(logic, "datetime", types.SimpleNamespace(
+        datetime=_MarketHours, date=datetime.date, time=datetime.time, timedelta=datetime.timedelta))
+    monkeypatch.setattr(exit_monitor, "POLL_INTERVAL_SECONDS", 0.05)
+    monkeypatch.setattr(exit_monitor, "STREAM_STALE_SECONDS", 0.3)
+    simulated = market_data.SimulatedFeed(interval=0.02)
+    monkeypatch.setattr(market_data, "MARKET_DATA_FEED", "simulated")
+    monkeypatch.setattr(market_data, "_simulated_feed", simulated)
+    return simulated
+
+@pytest.fixture
+def trade(upstox):
+    """An open trade on a logged-in account; returns (user_state, exits) where exits records on_exit calls."""
+    token = f"test-{uuid.uuid4().hex}"
+    upstox._tokens[token] = "trader"
+    user_state = get_default_user_state()
+    user_state["access_token"] = token
+    user_state["candidate_setup"] = {"status": "ENTRY_APPROVED", "instrument_key": INSTRUMENT_KEY,
+                                     "signal_premium": 100.0, "stop_loss": 50.0, "target": 1000.0}
+    exits = []
+    lock = threading.Lock()
+
+    def on_exit(user_name, candidate, exit_reason):
+        with lock:
+            exits.append(exit_reason)
+        user_state["candidate_setup"] = None
+
+    exit_monitor.start_exit_monitor("trader", user_state, lambda *args: on_exit(*args))
+    yield user_state, exits
+    exit_monitor.stop_exit_monitor(user_state)
+
+def test_stream_drop_falls_back_to_polling_and_exits_once(feed, trade):
+    user_state, exits = trade
+    assert _wait_for(lambda: exit_monitor.is_streaming(user_state))
+    time.sleep(0.2)
+    assert exits == []  # The streamed premium stays between the stop loss and the target
+
+    feed.disconnect()
+    assert _wait_for(lambda: exits)
+    time.sleep(0.3)
+    assert len(exits) == 1
+    assert exits[0].startswith("Target Hit at") and float(exits[0].split()[-1].rstrip(".")) > 1000  # The polled price
+    assert not exit_monitor.is_streaming(user_state)
+
+def test_polling_hands_back_to_stream_after_reconnect(feed, trade, monkeypatch):
+    user_state, exits = trade
+    polls = []
+    monkeypatch.setattr(market_data, "fetch_ltp", lambda *args: polls.append(args) and None)
+    assert _wait_for(lambda: exit_monitor.is_streaming(user_state))
+
+    feed.disconnect()
+    assert _wait_for(lambda: len(polls) >= 3)
+    feed.reconnect()
+    assert _wait_for(lambda: exit_monitor.is_streaming(user_state))
+    polled = len(polls)
+    time.sleep(0.3)
+    assert len(polls) <= polled + 1  # At most one poll already under way
+
+    feed.set_price(INSTRUMENT_KEY, 10.0)
+    assert _wait_for(lambda: exits)
+    time.sleep(0.2)
+    assert len(exits) == 1 and exits[0].startswith("StopLoss Hit")
+
+def test_concurrent_exit_checks_report_one_exit(feed, trade):
+    user_state, exits = trade
+    monitor = user_state["exit_monitor"]
+    barrier = threading.Barrier(8)
+
+    def evaluate():
+        barrier.wait()
+        monitor._evaluate(10.0)
+
+    threads = [threading.Thread(target=evaluate) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(exits) == 1
+
+# --- Upstox stream reconnects ---
+
+class _FakeStreamer:
+    """Stands in for upstox_client.MarketDataStreamer; `opens` says whether each connect succeeds."""
+    created = []
+    opens = []
+
+    def __init__(self, api_client, instrument_keys, mode):
+        self.instrument_keys = instrument_keys
+        self.handlers = {}
+        _FakeStreamer.created.append(self)
+
+    def on(self, event, handler):
+        self.handlers[event] = handler
+
+    def connect(self):
+        succeeds = _FakeStreamer.opens.pop(0) if _FakeStreamer.opens else True
+        self.handlers["open" if succeeds else "error"]()
+
+    def disconnect(self):
+        pass
+
+    def subscribe(self, instrument_keys, mode):
+        pass
+
+    def unsubscribe(self, instrument_keys):
+        pass
+
+    def send(self, instrument_key, ltp):
+        self.handlers["message"]({"feeds": {instrument_key: {"ltpc": {"ltp": ltp}}}})
+
+@pytest.fixture
+def upstox_client(monkeypatch):
+    fake = types.SimpleNamespace(Configuration=lambda: types.SimpleNamespace(), ApiClient=lambda configuration: None,
+                                 MarketDataStreamer=_FakeStreamer)
+    monkeypatch.setitem(sys.modules, "upstox_client", fake)
+    monkeypatch.setattr(_FakeStreamer, "created", [])
+    monkeypatch.setattr(_FakeStreamer, "opens", [])
+    monkeypatch.setattr(market_data, "RECONNECT_MIN_SECONDS", 0.05)
+    monkeypatch.setattr(market_data, "RECONNECT_MAX_SECONDS", 0.2)
+    return _FakeStreamer
+
+def test_upstox_feed_reconnects_with_backoff(upstox_client):
+    updates = []
+    feed = market_data.UpstoxFeed("token")
+    feed.subscribe(INSTRUMENT_KEY, lambda key, ltp: updates.append(ltp))
+    assert _wait_for(feed.is_connected)
+
+    upstox_client.opens.extend([False, False])  # The next two attempts fail
+    upstox_client.created[-1].handlers["close"]()
+    assert not feed.is_connected()
+    assert _wait_for(feed.is_connected)
+    assert len(upstox_client.created) == 4
+    assert feed._reconnect_delay == 0.2  # Doubled on each attempt, up to the maximum
+
+    upstox_client.created[-1].send(INSTRUMENT_KEY, 101.5)
+    assert updates == [101.5]
+    assert feed._reconnect_delay == 0.05  # Updates flowing again: back to the minimum
+    feed.unsubscribe(INSTRUMENT_KEY)
+
+def test_upstox_feed_does_not_reconnect_after_disconnect(upstox_client):
+    feed = market_data.UpstoxFeed("token")
+    feed.subscribe(INSTRUMENT_KEY, lambda key, ltp: None)
+    assert _wait_for(feed.is_connected)
+    streamer = upstox_client.created[-1]
+
+    feed.unsubscribe(INSTRUMENT_KEY)
+    streamer.handlers["close"]()
+    time.sleep(0.2)
+    assert len(upstox_client.created) == 1 and not feed.is_connected()
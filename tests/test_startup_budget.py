@@ -0,0 +1,7 @@
+from backend import startup_budget
+
+def test_cold_start_within_budget():
+    measured = startup_budget.measure(runs=3)
+    assert measured["import_ms"] <= startup_budget.IMPORT_BUDGET_MS
+    assert measured["rss_mb"] <= startup_budget.RSS_BUDGET_MB
+    assert measured["eager"] == []
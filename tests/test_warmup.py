@@ -0,0 +1,53 @@
+import datetime
+import time
+import pytest
+from backend import pipeline, warmup
+from backend.state import get_default_user_state
+
+def _one_minute_candles(now: datetime.datetime, minutes: int) -> list:
+    """Upstox-shaped 1-minute candles for the last `minutes` minutes up to and including the current one, newest first."""
+    current = now.replace(second=0, microsecond=0).astimezone()
+    candles = []
+    for i in range(minutes):
+        price = 25000.0 + i
+        candles.append([(current - datetime.timedelta(minutes=i)).isoformat(), price, price + 5, price - 5, price + 1, 0, 0])
+    return candles
+
+@pytest.fixture
+def login(monkeypatch):
+    """Warms a user up from 20 minutes of 1-minute history; returns the user's state."""
+    now = datetime.datetime.now()
+    history = _one_minute_candles(now, 20)
+    monkeypatch.setattr(warmup, "fetch_intraday_candles", lambda access_token, instrument_key: history)
+    user_state = get_default_user_state()
+    warmup.warm_up_user("trader", user_state, "NSE_INDEX|Nifty 50")
+    return user_state
+
+def test_login_mid_bucket_seeds_the_forming_candle(login):
+    now = time.time()
+    candle = login["forming_candle"]
+    assert candle["bucket"] == pipeline.candle_bucket(now)
+    assert candle["first_tick_at"] == candle["bucket"] * pipeline.CANDLE_SECONDS
+    # Only closed buckets go into the candle buffer
+    last_label = datetime.datetime.fromisoformat(login["candles_5min_buffer"][-1][0])
+    assert last_label.timestamp() == candle["first_tick_at"]
+
+def test_candle_open_at_login_closes_as_complete(login):
+    seeded = dict(login["forming_candle"])
+    bucket_end = (seeded["bucket"] + 1) * pipeline.CANDLE_SECONDS
+
+    # The first live ticks, mid-bucket, then the first tick of the next bucket
+    for tick_time, price in ((time.time(), seeded["high"] + 10), (bucket_end - 1, seeded["close"])):
+        assert not pipeline.is_candle_close(login, tick_time)
+        pipeline.update_forming_candle(login, price, tick_time)
+    assert pipeline.is_candle_close(login, bucket_end + 1)
+
+    candle = login["forming_candle"]
+    assert pipeline.is_candle_complete(candle)
+    assert candle["open"] == seeded["open"] and candle["low"] == seeded["low"]
+    assert candle["high"] == seeded["high"] + 10
+
+def test_no_history_for_current_bucket_leaves_nothing_seeded():
+    now = datetime.datetime.now()
+    history = _one_minute_candles(now - datetime.timedelta(minutes=10), 5)
+    assert warmup.forming_candle(history, now) is None